@@ -1,7 +1,9 @@
+import asyncio
 from abc import ABC, abstractmethod
 from communication.generic_response import GenericResponse
 from config import Configurator
 from agents.agent_interfaces import AgentState
+from models.model_response import ModelResponseStream
 from prompts.prompts import DEFAULT_PROMPT
 
 
@@ -45,3 +47,45 @@ class AbstractAgent(ABC):
             An AgentResponse with the updated state and any output
         """
         pass
+
+    async def astart(self, input_content: str, **metadata) -> GenericResponse:
+        """
+        Coroutine version of start().
+
+        The default runs start() in the event loop's executor; agents backed
+        by async models should override it.
+        """
+        return await asyncio.to_thread(self.start, input_content, **metadata)
+
+    async def astep(self, state: AgentState) -> GenericResponse:
+        """
+        Coroutine version of step().
+
+        The default runs step() in the event loop's executor; agents backed
+        by async models should override it.
+        """
+        return await asyncio.to_thread(self.step, state)
+
+    def _stream_response(self, state: AgentState, stream: ModelResponseStream) -> GenericResponse:
+        """
+        Wrap a model stream in a GenericResponse.
+
+        The assistant message is only added to the history, and the response's
+        output only set, once the caller has drained response.stream. An error
+        part-way through ends the conversation the same way a failed step does.
+        """
+        response = GenericResponse(state=state, output="", is_done=False)
+
+        def deltas():
+            try:
+                yield from stream
+            except Exception as e:
+                response.output = f"Error generating response: {str(e)}"
+                response.is_done = True
+                state.add_message("system", response.output)
+                return
+            response.output = stream.response.output.strip()
+            state.add_message("assistant", response.output)
+
+        response.stream = deltas()
+        return response
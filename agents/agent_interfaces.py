@@ -7,9 +7,13 @@ including AgentInput, AgentState, and AgentResponse classes.
 
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Any, Optional, Union, Callable
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Union, Callable
 from communication.generic_request import GenericRequest
 
+if TYPE_CHECKING:
+    from agents.agent_scratchpad import Scratchpad
+    from agents.context_assembler import ContextAssembler
+
 
 class ActionType(Enum):
     """Types of actions an agent can take."""
@@ -26,6 +30,15 @@ class Message:
     role: str
     content: str
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # (content, tokens) as last measured by a ContextAssembler
+    token_cache: Optional[tuple] = field(default=None, compare=False, repr=False)
+
+@dataclass
+class SessionContext:
+    """Per-conversation working state, kept off the agent so one agent can serve many sessions."""
+    user_question: Optional[str] = None  # The question the current step answers
+    scratchpad: Optional["Scratchpad"] = None  # Tool results gathered in this conversation
+
 
 @dataclass
 class AgentState:
@@ -35,6 +48,8 @@ class AgentState:
     #next_action: AgentAction = field(default_factory=lambda: AgentAction.pending())
     working_memory: Dict[str, Any] = field(default_factory=dict)  # Agent's working memory
     metadata: Dict[str, Any] = field(default_factory=dict)  # Additional state information
+    context: Optional["ContextAssembler"] = None  # Fits history into a token budget; None sends it all
+    session: Optional[SessionContext] = None  # Agent-specific per-conversation state
 
     def add_message(self, role: str, content: str, **metadata):
         """Add a message to the conversation history."""
@@ -45,6 +60,8 @@ class AgentState:
         return self.history[-1] if self.history else None
     
     def get_messages_for_llm(self) -> List[Dict[str, str]]:
-        """Convert history to format expected by LLM APIs."""
+        """Convert history to format expected by LLM APIs, within the context budget if one is set."""
+        if self.context is not None:
+            return self.context.assemble(self.history)
         return [{"role": msg.role, "content": msg.content} for msg in self.history]
 
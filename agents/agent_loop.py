@@ -3,12 +3,22 @@ Agent loop runner for stateful agent framework.
 
 This module provides utilities for running agents in a turn-by-turn interactive loop,
 handling the execution of agent actions and managing the conversation flow.
+
+The coroutine methods (astart, arun_step, arun_turn, arun_until_done) serve
+many conversations on one event loop. A global limit caps how many steps run
+at once, and steps of the same session run one at a time in arrival order.
+Agents that only implement the blocking step() run in a thread pool.
 """
 
-from typing import Dict, Any, Optional, List
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from typing import Dict, Any, Hashable, Optional, List
 
 from agents.abstract_agent import AbstractAgent
 from agents.agent_interfaces import AgentState
+from agents.session_store import SessionStore
 from tools.registry import ToolRegistry
 from communication.generic_response import GenericResponse
 from communication.generic_request import GenericRequest
@@ -26,7 +36,10 @@ class AgentLoop:
         self, 
         agent: AbstractAgent,
         tool_registry: Optional[ToolRegistry] = None,
-        max_turns: int = 10
+        max_turns: int = 10,
+        max_concurrency: int = 64,
+        executor: Optional[Executor] = None,
+        session_store: Optional[SessionStore] = None
     ):
         """
         Initialize the agent loop.
@@ -35,10 +48,24 @@ class AgentLoop:
             agent: The agent to run in this loop
             tool_registry: A ToolRegistry instance (uses global registry if None)
             max_turns: Maximum number of turns to prevent infinite loops
+            max_concurrency: Most steps the coroutine methods run at once,
+                across all sessions
+            executor: Runs the blocking step() of agents without a native
+                astep(); defaults to a pool of max_concurrency threads
+            session_store: Keeps conversation states between achat() calls
         """
         self.agent = agent
         self.tool_registry = tool_registry
         self.max_turns = max_turns
+        self.max_concurrency = max_concurrency
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.session_store = session_store
+        # Created on first use so the loop can be built outside an event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+        # session key -> [lock, callers holding or waiting for it]
+        self._sessions: Dict[Hashable, list] = {}
+        self._running = 0
     
     def start(self, input_content: str, **metadata) -> GenericResponse:
         """
@@ -53,16 +80,19 @@ class AgentLoop:
         """
         return self.agent.start(input_content, **metadata)
     
-    def run_single_step(self, state: AgentState) -> GenericResponse:
+    def run_single_step(self, state: AgentState, stream: bool = False) -> GenericResponse:
         """
         Run a single step of the agent's lifecycle and process any resulting actions.
         
         Args:
             state: The current agent state
+            stream: Ask the agent to stream its answer (the agent must support it)
             
         Returns:
             The updated agent response
         """
+        if stream:
+            return self.agent.step(state, stream=True)
         response = self.agent.step(state)
         return response
     
@@ -96,16 +126,17 @@ class AgentLoop:
         
         return response
     
-    def run_interactive(self, initial_input: str) -> None:
+    def run_interactive(self, initial_input: str, stream: bool = False) -> None:
         """
         Run the agent in an interactive mode, accepting user input after each step.
         
         Args:
             initial_input: The initial input to start the conversation
+            stream: Print the agent's answers as they are generated
         """
         # Start the agent session
-        response = self.start(initial_input)
-        print(f"Agent: {response.output}")
+        response = self.start(initial_input, stream=True) if stream else self.start(initial_input)
+        self._print_response(response)
         
         # Continue interaction until the agent is done or we hit max_turns
         turn_count = 0
@@ -122,11 +153,190 @@ class AgentLoop:
             response.state.input = GenericRequest(content=user_input)
             
             # Run the agent step
-            response = self.run_single_step(response.state)
-            print(f"Agent: {response.output}")
+            response = self.run_single_step(response.state, stream=stream)
+            self._print_response(response)
             
             turn_count += 1
 
+    async def astart(self, input_content: str, session_id: Optional[Hashable] = None, **metadata) -> GenericResponse:
+        """
+        Coroutine version of start(), within the concurrency limit.
+
+        Args:
+            input_content: The initial input content
+            session_id: Key whose steps run in order; the new state is
+                tagged with it for later arun_step calls
+            metadata: Additional metadata for the input
+
+        Returns:
+            The agent's response after starting
+        """
+        async with self._turn(session_id):
+            response = await self._call(self.agent.astart, self.agent.start, input_content, **metadata)
+        if session_id is not None and response.state is not None:
+            response.state.metadata["session_id"] = session_id
+        return response
+
+    async def arun_step(self, state: AgentState, session_id: Optional[Hashable] = None) -> GenericResponse:
+        """
+        Coroutine version of run_single_step().
+
+        Steps with the same session key run one at a time, in the order they
+        were requested; others run concurrently up to max_concurrency.
+
+        Args:
+            state: The current agent state
+            session_id: Session key (defaults to state.metadata["session_id"],
+                then to the state object itself)
+
+        Returns:
+            The updated agent response
+        """
+        async with self._turn(self._session_key(state, session_id)):
+            return await self._call(self.agent.astep, self.agent.step, state)
+
+    async def arun_turn(self, state: AgentState, user_input: str,
+                        session_id: Optional[Hashable] = None) -> GenericResponse:
+        """
+        Add a user message to a conversation and run the agent on it.
+
+        The message is added once the session's earlier turns are done, so
+        messages sent in quick succession are answered in order.
+
+        Args:
+            state: The conversation state
+            user_input: The user's message
+            session_id: Session key (see arun_step)
+
+        Returns:
+            The agent's response
+        """
+        async with self._turn(self._session_key(state, session_id)):
+            state.add_message("user", user_input)
+            state.input = GenericRequest(content=user_input)
+            return await self._call(self.agent.astep, self.agent.step, state)
+
+    async def arun_until_done(self, input_content: str, session_id: Optional[Hashable] = None,
+                              **metadata) -> GenericResponse:
+        """
+        Coroutine version of run_until_done().
+
+        Args:
+            input_content: The initial input content
+            session_id: Session key (see arun_step)
+            metadata: Additional metadata for the input
+
+        Returns:
+            The final agent response
+        """
+        response = await self.astart(input_content, session_id=session_id, **metadata)
+
+        turn_count = 0
+        while not response.is_done and turn_count < self.max_turns:
+            response = await self.arun_step(response.state, session_id)
+            turn_count += 1
+
+            if turn_count >= self.max_turns and not response.is_done:
+                response.state.add_message(
+                    "system",
+                    f"Agent execution stopped after reaching maximum of {self.max_turns} turns."
+                )
+                response.is_done = True
+
+        return response
+
+    async def achat(self, session_id: Hashable, user_input: str, **metadata) -> GenericResponse:
+        """
+        Answer one message of a conversation kept in the session store.
+
+        The conversation is started on its first message and resumed from the
+        store (read back from disk if it was spilled) on later ones.
+
+        Args:
+            session_id: The conversation's key
+            user_input: The user's message
+            metadata: Additional metadata for a new conversation's input
+
+        Returns:
+            The agent's response
+        """
+        if self.session_store is None:
+            raise ValueError("achat() needs an AgentLoop with a session_store")
+        async with self._turn(session_id):
+            state = await asyncio.to_thread(self.session_store.get, session_id)
+            if state is None:
+                response = await self._call(self.agent.astart, self.agent.start, user_input, **metadata)
+                response.state.metadata["session_id"] = session_id
+            else:
+                state.add_message("user", user_input)
+                state.input = GenericRequest(content=user_input)
+                response = await self._call(self.agent.astep, self.agent.step, state)
+            await asyncio.to_thread(self.session_store.put, session_id, response.state)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Steps running now and sessions with a step running or waiting."""
+        return {"running": self._running, "sessions": len(self._sessions)}
+
+    def close(self) -> None:
+        """Shut down the thread pool the loop created, if any."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def _session_key(state: AgentState, session_id: Optional[Hashable]) -> Hashable:
+        if session_id is not None:
+            return session_id
+        return state.metadata.get("session_id", ("state", id(state)))
+
+    @asynccontextmanager
+    async def _turn(self, key: Optional[Hashable]):
+        """Hold the session's lock, then a global slot, for one step."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        entry = None
+        if key is not None:
+            entry = self._sessions.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first in, first out
+            async with entry[0] if entry else nullcontext(), self._slots:
+                self._running += 1
+                try:
+                    yield
+                finally:
+                    self._running -= 1
+        finally:
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._sessions[key]
+
+    async def _call(self, native, blocking, *args, **kwargs) -> GenericResponse:
+        # Agents that override the coroutine methods run on the event loop;
+        # the AbstractAgent defaults would only wrap the blocking method.
+        if getattr(type(self.agent), native.__name__) is not getattr(AbstractAgent, native.__name__):
+            return await native(*args, **kwargs)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent-loop")
+        call = contextvars.copy_context().run
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: call(blocking, *args, **kwargs)
+        )
+
+    def _print_response(self, response: GenericResponse) -> None:
+        """Print a response, incrementally if the agent returned a stream."""
+        if response.stream is None:
+            print(f"Agent: {response.output}")
+            return
+        print("Agent: ", end="", flush=True)
+        for delta in response.stream:
+            print(delta, end="", flush=True)
+        print()
+        if response.is_done:
+            print(response.output)
+
     def get_available_tools(self) -> List[str]:
         """
         Get a list of all available tools.
@@ -1,24 +1,110 @@
+import re
 from typing import List, Dict, Optional
 
+from models.token_counter import CHARS_PER_TOKEN, estimate_tokens
+
+DEFAULT_SCRATCHPAD_TOKENS = 3000
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]{3,}")
+_STOPWORDS = frozenset("the and for are was were this that with from what who how why when which does did "
+                       "can could would should you your about into than then them they their there has have".split())
+
+
+def _terms(text: str) -> set:
+    return {word for word in _WORD.findall(str(text).lower()) if word not in _STOPWORDS}
+
+
+def extract(text: str, question: Optional[str], max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    A short local extract of a tool result: its sentences most relevant to the question.
+
+    Sentences are ranked by how many of the question's terms they contain,
+    earlier sentences first on ties, and kept in their original order.
+
+    Args:
+        text: The tool output
+        question: The question being answered; without one the leading sentences are kept
+        max_tokens: Size of the extract
+        model: Model whose tokenizer to estimate with
+
+    Returns:
+        The extract
+    """
+    sentences = [sentence.strip() for sentence in _SENTENCE_END.split(str(text)) if sentence.strip()]
+    wanted = _terms(question or "")
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(wanted & _terms(sentences[i])), i))
+    kept, total = [], 0
+    for i in ranked:
+        tokens = estimate_tokens(sentences[i], model)
+        if total + tokens > max_tokens:
+            if not kept:  # a single long sentence is cut rather than dropped
+                kept.append(i)
+                sentences[i] = sentences[i][:max_tokens * CHARS_PER_TOKEN]
+            break
+        kept.append(i)
+        total += tokens
+    return " … ".join(sentences[i] for i in sorted(kept))
+
+
 class Scratchpad:
-    def __init__(self, cfg):
+    """
+    Tool results and notes gathered while answering, kept within a token budget.
+
+    Each tool result carries a token estimate. Calling the same tool with the
+    same input again replaces the earlier result. When the results exceed
+    max_tokens, the most recent and most relevant to user_question are kept
+    verbatim and the rest are cut down to short extracts; if that is still
+    too much, the lowest-ranked extracts are dropped.
+    """
+
+    def __init__(self, cfg, max_tokens: int = DEFAULT_SCRATCHPAD_TOKENS, extract_tokens: int = 150,
+                 recency_weight: float = 0.3, model: Optional[str] = None):
+        """
+        Args:
+            cfg: Configuration object
+            max_tokens: Budget for the tool results in the prompt
+            extract_tokens: Size of the extract an entry is compacted to
+            recency_weight: Weight of recency against relevance to the
+                question when ranking entries, between 0 and 1
+            model: Model whose tokenizer to estimate with
+        """
         self.cfg = cfg
+        self.max_tokens = max_tokens
+        self.extract_tokens = extract_tokens
+        self.recency_weight = recency_weight
+        self.model = model
         self.user_intent: Optional[str] = None
+        self.user_question: Optional[str] = None  # what relevance is judged against
         self.tool_results: List[Dict[str, str]] = []
         self.reasoning_steps: List[str] = []
         self.memory_context: Optional[str] = None
+        self.counts = {"deduplicated": 0, "compacted": 0, "dropped": 0}
 
     def add_tool_result(self, tool: str, input_text: str, output: str):
         self.cfg.logger.debug(f"Adding tool result: {tool} with input: {input_text} and output: {output}")
+        # The same call again returns fresher data; keep one copy, in the newest position
+        for i, result in enumerate(self.tool_results):
+            if result['tool'] == tool and result['input'] == input_text:
+                del self.tool_results[i]
+                self.counts["deduplicated"] += 1
+                break
         self.tool_results.append({
             'tool': tool,
             'input': input_text,
-            'output': output
+            'output': output,
+            'tokens': self._entry_tokens(tool, input_text, output),
+            'compacted': False,
         })
+        self._compact()
 
     def add_reasoning_step(self, step: str):
         self.reasoning_steps.append(step)
 
+    def token_count(self) -> int:
+        """Estimated tokens of the tool results."""
+        return sum(result['tokens'] for result in self.tool_results)
+
     def to_prompt_summary(self) -> str:
         summary = []
 
@@ -26,7 +112,8 @@ class Scratchpad:
             summary.append(f"User Intent: {self.user_intent}")
 
         for i, result in enumerate(self.tool_results):
-            summary.append(f"Tool {i+1}: {result['tool']} used with input: \"{result['input']}\"\nResult:\n{result['output']}")
+            label = "Result (excerpt)" if result.get('compacted') else "Result"
+            summary.append(f"Tool {i+1}: {result['tool']} used with input: \"{result['input']}\"\n{label}:\n{result['output']}")
 
         if self.reasoning_steps:
             summary.append("Reasoning Steps:\n" + '\n'.join(f"- {step}" for step in self.reasoning_steps))
@@ -37,3 +124,43 @@ class Scratchpad:
         res = '\n\n'.join(summary)
         self.cfg.logger.debug(f"Scratchpad Summary:\n{res}")
         return res
+
+    def _entry_tokens(self, tool: str, input_text: str, output: str) -> int:
+        # Output plus the "Tool n: ... used with input" framing
+        return 12 + estimate_tokens(f"{tool} {input_text}", self.model) + estimate_tokens(str(output), self.model)
+
+    def _compact(self) -> None:
+        if self.token_count() <= self.max_tokens:
+            return
+        ranked = self._ranked()
+        budget = self.max_tokens
+        for result in ranked:
+            if result['tokens'] > budget and not result['compacted']:
+                result['output'] = extract(result['output'], self.user_question, self.extract_tokens, self.model)
+                result['tokens'] = self._entry_tokens(result['tool'], result['input'], result['output'])
+                result['compacted'] = True
+                self.counts["compacted"] += 1
+            budget -= result['tokens']
+        # Still over budget: drop the lowest-ranked entries, never the last one left
+        dropped = set()
+        total = self.token_count()
+        for result in reversed(ranked[1:]):
+            if total <= self.max_tokens:
+                break
+            dropped.add(id(result))
+            total -= result['tokens']
+        if dropped:
+            self.tool_results = [result for result in self.tool_results if id(result) not in dropped]
+            self.counts["dropped"] += len(dropped)
+
+    def _ranked(self) -> List[Dict[str, str]]:
+        """Tool results, best first: a mix of recency and overlap with the question's terms."""
+        wanted = _terms(self.user_question or "")
+        last = max(1, len(self.tool_results) - 1)
+
+        def score(item):
+            position, result = item
+            relevance = len(wanted & _terms(f"{result['input']} {result['output']}")) / len(wanted) if wanted else 0.0
+            return self.recency_weight * position / last + (1 - self.recency_weight) * relevance
+
+        return [result for _, result in sorted(enumerate(self.tool_results), key=score, reverse=True)]
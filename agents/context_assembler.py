@@ -0,0 +1,209 @@
+"""
+Token-budgeted prompt assembly for long conversations.
+
+A ContextAssembler fits an AgentState's history into a token budget:
+
+    - leading system messages (the system prompt) are always kept,
+    - the most recent turns are kept verbatim, as many as the budget allows,
+    - older turns are folded into a rolling summary.
+
+Summaries are computed on a background thread, so a turn never waits for one:
+until a new summary is ready the previous one is used and the turns it does
+not cover yet are left out. Token counts are cached per message, so each turn
+only measures the messages added since the last one.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from models.metrics import component
+from models.token_counter import estimate_tokens
+
+DEFAULT_CONTEXT_TOKENS = 8000
+
+# Framing tokens added to every chat message
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# (previous summary, messages to fold in, target tokens) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]], int], str]
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    A local summarizer: the first sentence of each turn, newest kept first.
+
+    Args:
+        previous: The summary so far
+        messages: Turns to fold into the summary, oldest first
+        max_tokens: Target size of the summary
+
+    Returns:
+        The new summary
+    """
+    lines = [line for line in previous.splitlines() if line]
+    for message in messages:
+        content = " ".join(str(message.get("content", "")).split())
+        if content:
+            first_sentence = _SENTENCE_END.split(content, maxsplit=1)[0]
+            lines.append(f"{message['role']}: {first_sentence}")
+
+    # Drop the oldest lines until the summary fits
+    kept: List[str] = []
+    total = 0
+    for line in reversed(lines):
+        tokens = estimate_tokens(line)
+        if total + tokens > max_tokens:
+            break
+        kept.append(line)
+        total += tokens
+    return "\n".join(reversed(kept))
+
+
+def model_summarizer(model) -> Summarizer:
+    """
+    A summarizer that asks a model to extend the running summary.
+
+    Args:
+        model: The AbstractModel to summarize with (ideally a small, cheap one)
+
+    Returns:
+        A Summarizer for ContextAssembler
+    """
+    def summarize(previous: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        prompt = [
+            {"role": "system", "content":
+                f"Update the running summary of a conversation with the new turns. "
+                f"Keep facts, decisions and open questions. Use at most {max_tokens} tokens."},
+            {"role": "user", "content": f"Summary so far:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"},
+        ]
+        with component("context.summary"):
+            return model.generate_response(prompt).output.strip()
+
+    return summarize
+
+
+class ContextAssembler:
+    """
+    Builds the message list sent to the LLM for one conversation.
+
+    An assembler holds the rolling summary of its conversation, so each
+    AgentState gets its own instance.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        keep_recent: int = 4,
+        summary_tokens: int = 500,
+        summarizer: Optional[Summarizer] = None,
+        model: Optional[str] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            max_tokens: Budget for the assembled prompt
+            keep_recent: Latest messages always kept verbatim, even over budget
+            summary_tokens: Target size of the rolling summary (at most a
+                quarter of max_tokens)
+            summarizer: Folds old turns into the summary (local extraction by default)
+            model: Model whose tokenizer to estimate with
+            background: Summarize on a worker thread instead of inline
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = min(summary_tokens, max_tokens // 4)
+        self.summarizer = summarizer or extractive_summary
+        self.model = model
+        self.background = background
+        self.summary = ""
+        self.summarized = 0  # number of (unpinned) history messages the summary covers
+        self.logger = logging.getLogger(__name__)
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def message_tokens(self, message) -> int:
+        """Token estimate for a history Message, cached on the message."""
+        cached = message.token_cache
+        if cached is not None and cached[0] is message.content:
+            return cached[1]
+        tokens = MESSAGE_OVERHEAD + estimate_tokens(message.content, self.model)
+        message.token_cache = (message.content, tokens)
+        return tokens
+
+    def assemble(self, history: Sequence) -> List[Dict[str, str]]:
+        """
+        Fit a conversation history into the token budget.
+
+        Args:
+            history: The AgentState's Message list
+
+        Returns:
+            Messages in the format expected by LLM APIs
+        """
+        pinned = 0
+        while pinned < len(history) and history[pinned].role == "system":
+            pinned += 1
+        turns = history[pinned:]
+
+        with self._lock:
+            summary, summarized = self.summary, self.summarized
+        summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary} if summary else None
+
+        budget = self.max_tokens - sum(self.message_tokens(message) for message in history[:pinned])
+        if summary_message:
+            budget -= MESSAGE_OVERHEAD + estimate_tokens(summary_message["content"], self.model)
+
+        # Walk back from the newest turn while the budget lasts
+        start = len(turns)
+        while start > 0:
+            tokens = self.message_tokens(turns[start - 1])
+            if budget < tokens and len(turns) - start >= self.keep_recent:
+                break
+            budget -= tokens
+            start -= 1
+
+        if start > summarized:
+            self._summarize_until(turns, start)
+
+        messages = [{"role": message.role, "content": message.content} for message in history[:pinned]]
+        if summary_message and start > 0:
+            messages.append(summary_message)
+        messages.extend({"role": message.role, "content": message.content} for message in turns[start:])
+        return messages
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until any pending summary has been folded in."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def _summarize_until(self, turns: Sequence, end: int) -> None:
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return  # one summary at a time; the next turn picks up the rest
+            previous, begin = self.summary, self.summarized
+            new_turns = [{"role": message.role, "content": message.content} for message in turns[begin:end]]
+            if self.background:
+                self._pending = _executor.submit(self._fold, previous, new_turns, end)
+                return
+        self._fold(previous, new_turns, end)
+
+    def _fold(self, previous: str, new_turns: List[Dict[str, str]], end: int) -> None:
+        try:
+            summary = self.summarizer(previous, new_turns, self.summary_tokens)
+        except Exception as e:
+            self.logger.warning(f"Context summary failed: {e}")
+            return
+        with self._lock:
+            if end > self.summarized:
+                self.summary, self.summarized = summary, end
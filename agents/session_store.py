@@ -0,0 +1,274 @@
+"""
+Conversation state kept between requests.
+
+A SessionStore holds the live AgentState of recently active conversations in
+memory, within a byte budget, and spills the others to a SQLite file:
+
+    - when the resident sessions exceed max_bytes, the least recently used
+      are written to disk and dropped from memory;
+    - sessions idle for longer than idle_seconds are spilled as well;
+    - sessions idle for longer than expire_seconds are deleted outright.
+
+A spilled session is read back on its next get(), so only conversations that
+are actually resumed cost a disk read. Sizes are measured on a state's JSON
+encoding, which tracks the live objects closely enough to budget by; on disk
+the JSON is compressed. Session ids are stored by their str().
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from agents.agent_interfaces import AgentState, Message, SessionContext
+from agents.agent_scratchpad import Scratchpad
+from agents.context_assembler import ContextAssembler, Summarizer
+from communication.generic_request import GenericRequest
+
+
+def state_to_dict(state: AgentState) -> Dict[str, Any]:
+    """
+    A JSON-ready copy of an AgentState.
+
+    Args:
+        state: The state to encode
+
+    Returns:
+        A dict for state_from_dict()
+    """
+    data: Dict[str, Any] = {
+        "input": None if state.input is None else {"content": state.input.content, "metadata": state.input.metadata},
+        "history": [{"role": m.role, "content": m.content, "metadata": m.metadata} for m in state.history],
+        "working_memory": state.working_memory,
+        "metadata": state.metadata,
+        "context": None,
+        "session": None,
+    }
+    context = state.context
+    if context is not None:
+        with context._lock:
+            summary, summarized = context.summary, context.summarized
+        data["context"] = {"max_tokens": context.max_tokens, "keep_recent": context.keep_recent,
+                           "summary_tokens": context.summary_tokens, "model": context.model,
+                           "background": context.background, "summary": summary, "summarized": summarized}
+    session = state.session
+    if session is not None:
+        data["session"] = {"user_question": session.user_question, "scratchpad": None}
+        if session.scratchpad is not None:
+            data["session"]["scratchpad"] = scratchpad_to_dict(session.scratchpad)
+    return data
+
+
+def state_from_dict(data: Dict[str, Any], cfg, summarizer: Optional[Summarizer] = None) -> AgentState:
+    """
+    Rebuild an AgentState encoded by state_to_dict().
+
+    Args:
+        data: The encoded state
+        cfg: Configurator for the rebuilt scratchpad
+        summarizer: Summarizer for the rebuilt ContextAssembler (functions
+            are not stored; local extraction by default)
+
+    Returns:
+        The state
+    """
+    state = AgentState(
+        history=[Message(**message) for message in data["history"]],
+        working_memory=data["working_memory"],
+        metadata=data["metadata"],
+    )
+    if data["input"] is not None:
+        state.input = GenericRequest(**data["input"])
+    context = data["context"]
+    if context is not None:
+        state.context = ContextAssembler(context["max_tokens"], context["keep_recent"], context["summary_tokens"],
+                                         summarizer, context["model"], context["background"])
+        state.context.summary, state.context.summarized = context["summary"], context["summarized"]
+    session = data["session"]
+    if session is not None:
+        state.session = SessionContext(user_question=session["user_question"])
+        if session["scratchpad"] is not None:
+            state.session.scratchpad = scratchpad_from_dict(session["scratchpad"], cfg)
+    return state
+
+
+def scratchpad_to_dict(scratchpad: Scratchpad) -> Dict[str, Any]:
+    return {"max_tokens": scratchpad.max_tokens, "extract_tokens": scratchpad.extract_tokens,
+            "recency_weight": scratchpad.recency_weight, "model": scratchpad.model,
+            "user_intent": scratchpad.user_intent, "user_question": scratchpad.user_question,
+            "tool_results": scratchpad.tool_results, "reasoning_steps": scratchpad.reasoning_steps,
+            "memory_context": scratchpad.memory_context, "counts": scratchpad.counts}
+
+
+def scratchpad_from_dict(data: Dict[str, Any], cfg) -> Scratchpad:
+    scratchpad = Scratchpad(cfg, data["max_tokens"], data["extract_tokens"], data["recency_weight"], data["model"])
+    scratchpad.user_intent = data["user_intent"]
+    scratchpad.user_question = data["user_question"]
+    scratchpad.counts = data["counts"]
+    scratchpad.tool_results = data["tool_results"]
+    scratchpad.reasoning_steps = data["reasoning_steps"]
+    scratchpad.memory_context = data["memory_context"]
+    return scratchpad
+
+
+class SessionStore:
+    """
+    An LRU of live AgentStates under a byte budget, spilling to SQLite.
+
+    A single instance is safe to share between threads. get() returns the
+    live object, so changes made during a turn are kept; call put() after
+    the turn so its size is measured again.
+    """
+
+    def __init__(self, cfg, path: str, max_bytes: int = 64 * 1024 * 1024,
+                 idle_seconds: Optional[float] = None, expire_seconds: Optional[float] = None,
+                 summarizer: Optional[Summarizer] = None):
+        """
+        Initialize the store.
+
+        Args:
+            cfg: Configurator for rehydrated scratchpads
+            path: SQLite file spilled sessions are written to
+            max_bytes: Budget for the encoded size of resident sessions
+            idle_seconds: Spill sessions not used for this long, whatever the budget
+            expire_seconds: Delete sessions not used for this long
+            summarizer: Summarizer for rehydrated ContextAssemblers
+        """
+        self.cfg = cfg
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.expire_seconds = expire_seconds
+        self.summarizer = summarizer
+        self.counts = {"hits": 0, "loads": 0, "misses": 0, "spilled": 0, "expired": 0}
+        # session id -> [state, encoded size, last used]
+        self._resident: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state BLOB NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, session_id: Hashable) -> Optional[AgentState]:
+        """
+        Look up a session, reading it back from disk if it was spilled.
+
+        Args:
+            session_id: The session's key
+
+        Returns:
+            The live state, or None for an unknown or expired session
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._resident.get(session_id)
+            if entry is not None:
+                self._resident.move_to_end(session_id)
+                entry[2] = now
+                self.counts["hits"] += 1
+                return entry[0]
+
+            row = self._db.execute("SELECT state, used FROM sessions WHERE id = ?", (str(session_id),)).fetchone()
+            if row is None or self._expired(row[1], now):
+                self.counts["misses"] += 1
+                return None
+            encoded = zlib.decompress(row[0])
+            state = state_from_dict(json.loads(encoded), self.cfg, self.summarizer)
+            self.counts["loads"] += 1
+            self._admit(session_id, state, len(encoded), now)
+            return state
+
+    def put(self, session_id: Hashable, state: AgentState) -> None:
+        """
+        Store a session, or re-measure one after a turn.
+
+        Args:
+            session_id: The session's key
+            state: Its state
+        """
+        size = len(self._encode(state))  # outside the lock; encoding a long history takes a while
+        with self._lock:
+            self._admit(session_id, state, size, time.time())
+
+    def delete(self, session_id: Hashable) -> None:
+        """Forget a session, in memory and on disk."""
+        with self._lock:
+            entry = self._resident.pop(session_id, None)
+            if entry is not None:
+                self._resident_bytes -= entry[1]
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (str(session_id),))
+            self._db.commit()
+
+    def flush(self) -> None:
+        """Write every resident session to disk, keeping them in memory."""
+        with self._lock:
+            for session_id, (state, _, used) in self._resident.items():
+                self._write(session_id, state, used)
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident sessions and bytes, sessions on disk, and hit/load/spill counters."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.counts)
+            stats["resident"] = len(self._resident)
+            stats["resident_bytes"] = self._resident_bytes
+            stats["max_bytes"] = self.max_bytes
+            stats["on_disk"] = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        """Spill every resident session and close the file."""
+        if self._db is None:
+            return
+        self.flush()
+        with self._lock:
+            self._resident.clear()
+            self._resident_bytes = 0
+            self._db.close()
+            self._db = None
+
+    def _admit(self, session_id: Hashable, state: AgentState, size: int, now: float) -> None:
+        previous = self._resident.pop(session_id, None)
+        if previous is not None:
+            self._resident_bytes -= previous[1]
+        self._resident[session_id] = [state, size, now]
+        self._resident_bytes += size
+        # Spill the least recently used, but never the session just used
+        while self._resident_bytes > self.max_bytes and len(self._resident) > 1:
+            self._spill(next(iter(self._resident)))
+        self._db.commit()
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_seconds is None and self.expire_seconds is None:
+            return
+        # Expiring sessions are spilled first so the DELETE below catches them
+        limit = min(seconds for seconds in (self.idle_seconds, self.expire_seconds) if seconds is not None)
+        idle = [session_id for session_id, (_, _, used) in self._resident.items() if now - used > limit]
+        for session_id in idle:
+            self._spill(session_id)
+        if self.expire_seconds is not None:
+            expired = self._db.execute("DELETE FROM sessions WHERE used < ?", (now - self.expire_seconds,)).rowcount
+            self.counts["expired"] += expired
+        self._db.commit()
+
+    def _spill(self, session_id: Hashable) -> None:
+        state, size, used = self._resident.pop(session_id)
+        self._resident_bytes -= size
+        self._write(session_id, state, used)
+        self.counts["spilled"] += 1
+
+    def _write(self, session_id: Hashable, state: AgentState, used: float) -> None:
+        self._db.execute("INSERT OR REPLACE INTO sessions (id, state, used) VALUES (?, ?, ?)",
+                         (str(session_id), zlib.compress(self._encode(state), 1), used))
+
+    def _expired(self, used: float, now: float) -> bool:
+        return self.expire_seconds is not None and now - used > self.expire_seconds
+
+    @staticmethod
+    def _encode(state: AgentState) -> bytes:
+        return json.dumps(state_to_dict(state), default=str).encode("utf-8")
@@ -1,16 +1,42 @@
 from agents.abstract_agent import AbstractAgent
-from agents.agent_interfaces import AgentState, Message
+from agents.agent_interfaces import AgentState, Message, SessionContext
 from communication.generic_response import GenericResponse
 from communication.generic_request import GenericRequest
+from models.model_router import ModelRouter
+from models.metrics import component
 from models.openai_wrapper import OpenAIModel
 from prompts.prompts import DEFAULT_PROMPT, SOPHIA_PROMPT
 import agents.thinking_styles as thinking_styles
-from agents.agent_scratchpad import Scratchpad
-from agents.tool_selection_agent import ToolSelectionAgent
+from agents.agent_scratchpad import DEFAULT_SCRATCHPAD_TOKENS, Scratchpad
+from agents.context_assembler import DEFAULT_CONTEXT_TOKENS, ContextAssembler
+from agents.tool_selection_agent import MAX_TOOL_CALLS, ToolSelectionAgent, parse_tool_calls
 from tools.registry import ToolRegistry
 from tools.web_search_tool import WebSearchTool
 from tools.web_browsing_tool import WebBrowsingTool
-import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import asyncio
+import contextvars
+import threading
+import time
+
+# Runs speculative answer drafts next to the blocking tool selector
+_speculation_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="speculative-draft")
+
+
+class _ToolStart:
+    """Marked by a tool call once a worker picks it up, so its timeout counts from then."""
+
+    def __init__(self):
+        self.at = None
+        self._event = threading.Event()
+
+    def mark(self):
+        self.at = time.monotonic()
+        self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
 
 class SophiaAgent(AbstractAgent):
     """
@@ -18,22 +44,51 @@ class SophiaAgent(AbstractAgent):
     
     This agent processes messages one step at a time, maintaining conversation history
     and state between interactions.
+
+    Per-conversation state (the question and the scratchpad of tool results)
+    lives in state.session, and the model clients, tool registry and tool
+    selector are shared, so one agent can serve many conversations from
+    several threads or coroutines at once.
     """
-    def __init__(self, cfg, system_prompt=SOPHIA_PROMPT):
+    def __init__(self, cfg, system_prompt=SOPHIA_PROMPT, model=None, tool_selection_model=None,
+                 context_tokens=DEFAULT_CONTEXT_TOKENS, speculative=False,
+                 tool_preclassifier=None, tool_timeout=30.0,
+                 scratchpad_tokens=DEFAULT_SCRATCHPAD_TOKENS, tool_workers=8):
         """
         Initialize the agent.
         
         Args:
             system_prompt: The system prompt to use for the agent
+            model: Model for answers (defaults to OpenAIModel)
+            tool_selection_model: Model for the tool selector (defaults to
+                the answer model if that is a ModelRouter, otherwise a
+                temperature-0 OpenAIModel)
+            context_tokens: Token budget for the history sent to the model
+            speculative: Draft the no-tool answer while the tool selector
+                runs; the draft is used if no tool is selected and dropped
+                otherwise, saving a round trip on questions that need no tool
+            tool_preclassifier: Local fast path for tool selection (see
+                agents.tool_preclassifier)
+            tool_timeout: Seconds a tool call may run before it is
+                recorded as timed out (a tool's own `timeout` attribute wins)
+            scratchpad_tokens: Token budget for the tool results in the prompt;
+                older, less relevant results are compacted to extracts
+            tool_workers: Tool calls this agent runs at once; the pool is the
+                agent's own, so its hung tools cannot hold up other agents
         """
         super().__init__(cfg)
         self.prompt = system_prompt
-        self.model = OpenAIModel()
-        self._register_tools()
-        self.scratchpad = Scratchpad(cfg)
-        self.user_question = None
+        self.model = model if model else OpenAIModel()
+        self.context_tokens = context_tokens
+        self.speculative = speculative
+        self.speculation = {"used": 0, "discarded": 0}
+        self.tool_timeout = tool_timeout
+        self.scratchpad_tokens = scratchpad_tokens
+        self._tool_pool = ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._register_tools(tool_selection_model, tool_preclassifier)
                 
-    def _register_tools(self):
+    def _register_tools(self, tool_selection_model=None, tool_preclassifier=None):
         """
         Register the tools that this agent can use.
         """
@@ -42,86 +97,268 @@ class SophiaAgent(AbstractAgent):
         self.tool_registry = ToolRegistry(self.cfg)
         self.tool_registry.register_tool(web_search_tool)
         self.tool_registry.register_tool(web_browsing_tool)
-        self.tool_selector = ToolSelectionAgent(self.cfg, self.tool_registry)
+        if tool_selection_model is None and isinstance(self.model, ModelRouter):
+            tool_selection_model = self.model
+        self.tool_selector = ToolSelectionAgent(self.cfg, self.tool_registry, model=tool_selection_model,
+                                               preclassifier=tool_preclassifier)
   
-    def start(self, input_content: str, **metadata) -> GenericResponse:
+    def _new_state(self, input_content: str, metadata: dict) -> AgentState:
+        # Create a new state for this session
+        session = SessionContext(user_question=input_content, scratchpad=self._scratchpad())
+        state = AgentState(context=ContextAssembler(self.context_tokens, model=self.model.model), session=session)
+        sp_summary = session.scratchpad.to_prompt_summary()
+        prompt = self.prompt.replace("{user_question}", input_content).replace("{scratchpad}", sp_summary)
+        # Add the system prompt and initial user message
+        state.add_message("system", prompt)
+        
+        # Set the input for processing
+        state.input = GenericRequest(content=input_content, metadata=metadata)
+        return state
+
+    def start(self, input_content: str, stream: bool = False, **metadata) -> GenericResponse:
         """
         Start a new session.
         
         Args:
             input_content: The initial user input
+            stream: Whether to stream the answer (see step)
             metadata: Additional metadata for the session
             
         Returns:
             An AgentResponse with the initialized state
         """
-        # Create a new state for this session
-        state = AgentState()
-        sp_summary = self.scratchpad.to_prompt_summary()
-        prompt = self.prompt.replace("{user_question}", input_content).replace("{scratchpad}", sp_summary)
-        self.user_question = input_content
-        # Add the system prompt and initial user message
-        state.add_message("system", prompt)
-        
-        # Set the input for processing
-        state.input = GenericRequest(content=input_content, metadata=metadata)
-
         # Process this initial state
-        return self.step(state)
+        return self.step(self._new_state(input_content, metadata), stream=stream)
+
+    async def astart(self, input_content: str, **metadata) -> GenericResponse:
+        """
+        Coroutine version of start().
+        """
+        return await self.astep(self._new_state(input_content, metadata))
     
 
-    def step(self, state: AgentState) -> GenericResponse:
+    def step(self, state: AgentState, stream: bool = False) -> GenericResponse:
         """
         Process a single step in the conversation.
         
         Args:
             state: The current conversation state
+            stream: If True, the answer is returned as response.stream and
+                output/history are filled in once the stream is drained
             
         Returns:
             An AgentResponse with the updated state and agent's output
         """
         try:
+            if self.speculative and not stream:
+                return self._speculative_step(state)
+
             # Consider if tool selection is needed
             tool_response = self.tool_selector.start(state.input.content)
-            tool_json = json.loads(tool_response.output)
-            tool_name = tool_json['tool']
-
-            if tool_name != "none":
-                tool = self.tool_registry.get_tool(tool_json['tool'])
+            self._run_selected_tools(self._session(state), tool_response.output)
 
-                tool_request = GenericRequest(content=tool_json['input'])
-                tool_result = tool.run(tool_request)
-                # Add tool result to the scratchpad
-                self.cfg.logger.debug(f"Tool: {tool_name}, input: {tool_json['input']} result: {tool_result.output}")
-                self.scratchpad.add_tool_result(tool_name, tool_json['input'], tool_result.output)
-                
-            sp_summary = self.scratchpad.to_prompt_summary()
-            enriched_prompt = self.prompt.replace("{user_question}", state.input.content).replace("{scratchpad}", sp_summary)
-            self.cfg.logger.debug(f"Enriched prompt: {enriched_prompt}")
-            prompt_message = Message(role="system", content=enriched_prompt)
-            state.history[0] =prompt_message
-            # This selection should ultimately be dynamic
-            thinking_config = thinking_styles.ThinkingConfig(style=thinking_styles.ThinkStyle.REFLEX, max_iterations=3, cot=thinking_styles.CoTVisibility.EXPOSE)
-
-            response = thinking_styles.think(self.model, state, thinking_config, self.logger)
-            response_text = response.output
-            
-            # Update the state with the new assistant response
-            state.add_message("assistant", response_text)
-            
-            return GenericResponse(
-                state=state,
-                output=response_text,
-                is_done=False  # Conversation can continue
-            )
+            self._enrich_prompt(state)
+            with component("SophiaAgent"):
+                if stream:
+                    return self._stream_response(
+                        state, thinking_styles.think_stream(self.model, state, self._thinking_config(), self.logger)
+                    )
+                response = thinking_styles.think(self.model, state, self._thinking_config(), self.logger)
+            return self._respond(state, response.output)
             
         except Exception as e:
-            error_message = f"Error generating response: {str(e)}"
-            state.add_message("system", error_message)
-            
-            return GenericResponse(
-                state=state,
-                output=error_message,
-                is_done=True  # End conversation due to error
-            )
-   
+            return self._error(state, e)
+
+    async def astep(self, state: AgentState) -> GenericResponse:
+        """
+        Coroutine version of step(); tools still block, so they run in the executor.
+        """
+        try:
+            if self.speculative:
+                return await self._aspeculative_step(state)
+
+            tool_response = await self.tool_selector.astart(state.input.content)
+            await asyncio.to_thread(self._run_selected_tools, self._session(state), tool_response.output)
+
+            self._enrich_prompt(state)
+            with component("SophiaAgent"):
+                response = await thinking_styles.athink(self.model, state, self._thinking_config(), self.logger)
+            return self._respond(state, response.output)
+
+        except Exception as e:
+            return self._error(state, e)
+
+    def _speculative_step(self, state: AgentState) -> GenericResponse:
+        """
+        Run tool selection and the no-tool answer at the same time.
+
+        The draft answers a snapshot of the conversation taken on this thread,
+        so it never reads the state the rest of the step changes. A blocking
+        draft cannot be interrupted: when a tool is selected, a draft that has
+        not called the model yet skips the call, and one already waiting on it
+        finishes in the background and its answer is dropped.
+        """
+        self._enrich_prompt(state)
+        discarded = threading.Event()
+        draft = _speculation_pool.submit(contextvars.copy_context().run, self._draft, self._draft_state(state), discarded)
+        try:
+            tool_response = self.tool_selector.start(state.input.content)
+            needs_tool = self._needs_tool(tool_response.output)
+        except Exception:
+            discarded.set()
+            raise
+        if not needs_tool:
+            self._count("used")
+            return self._respond(state, draft.result().output)
+
+        discarded.set()
+        self._count("discarded")
+        self._run_selected_tools(self._session(state), tool_response.output)
+        self._enrich_prompt(state)
+        with component("SophiaAgent"):
+            response = thinking_styles.think(self.model, state, self._thinking_config(), self.logger)
+        return self._respond(state, response.output)
+
+    async def _aspeculative_step(self, state: AgentState) -> GenericResponse:
+        """
+        Coroutine version of _speculative_step(); an unneeded draft is cancelled.
+        """
+        self._enrich_prompt(state)
+        draft = asyncio.ensure_future(self._adraft(self._draft_state(state)))
+        try:
+            tool_response = await self.tool_selector.astart(state.input.content)
+            needs_tool = self._needs_tool(tool_response.output)
+        except BaseException:
+            draft.cancel()
+            raise
+        if not needs_tool:
+            self._count("used")
+            return self._respond(state, (await draft).output)
+
+        draft.cancel()
+        self._count("discarded")
+        await asyncio.to_thread(self._run_selected_tools, self._session(state), tool_response.output)
+        self._enrich_prompt(state)
+        with component("SophiaAgent"):
+            response = await thinking_styles.athink(self.model, state, self._thinking_config(), self.logger)
+        return self._respond(state, response.output)
+
+    @staticmethod
+    def _draft_state(state: AgentState) -> AgentState:
+        """A copy of the messages the model would see now, for a draft to read while the step goes on."""
+        messages = state.get_messages_for_llm()
+        return AgentState(input=state.input,
+                          history=[Message(role=message["role"], content=message["content"]) for message in messages])
+
+    def _draft(self, snapshot: AgentState, discarded: threading.Event):
+        if discarded.is_set():
+            return None  # a tool was selected before the draft got a worker
+        with component("SophiaAgent"), component("speculative"):
+            return thinking_styles.think(self.model, snapshot, self._thinking_config(), self.logger)
+
+    async def _adraft(self, snapshot: AgentState) -> GenericResponse:
+        with component("SophiaAgent"), component("speculative"):
+            return await thinking_styles.athink(self.model, snapshot, self._thinking_config(), self.logger)
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.speculation[outcome] += 1
+
+    @staticmethod
+    def _needs_tool(selection: str) -> bool:
+        return bool(parse_tool_calls(selection))
+
+    def _run_selected_tools(self, session: SessionContext, selection: str) -> None:
+        """
+        Run the tools chosen by the tool selector at the same time and record their results.
+
+        Results go into the scratchpad in the order the selector listed the
+        calls, whatever order they finish in. A call that fails or runs past
+        its timeout is recorded as an error; the timeout counts from when the
+        call starts running, and a call still queued behind busy workers after
+        that long is dropped. A timed-out tool cannot be interrupted, so it
+        finishes in the background and its result is dropped.
+
+        Args:
+            session: The conversation the results belong to
+            selection: The selector's JSON output
+        """
+        calls = parse_tool_calls(selection)[:MAX_TOOL_CALLS]
+        starts = [_ToolStart() for _ in calls]
+        futures = [self._tool_pool.submit(contextvars.copy_context().run, self._run_tool, tool_name, tool_input, start)
+                   for (tool_name, tool_input), start in zip(calls, starts)]
+        for (tool_name, tool_input), start, future in zip(calls, starts, futures):
+            timeout = self._tool_timeout(tool_name)
+            try:
+                output = self._tool_result(future, start, timeout)
+            except TimeoutError:
+                future.cancel()
+                output = f"Error: {tool_name} timed out after {timeout:g}s"
+            except Exception as e:
+                output = f"Error: {tool_name} failed: {e}"
+            self.cfg.logger.debug(f"Tool: {tool_name}, input: {tool_input} result: {output}")
+            session.scratchpad.add_tool_result(tool_name, tool_input, output)
+
+    @staticmethod
+    def _tool_result(future, start: _ToolStart, timeout: float) -> str:
+        if not start.wait(timeout):
+            raise TimeoutError  # still queued behind busy workers
+        return future.result(timeout=max(0.0, start.at + timeout - time.monotonic()))
+
+    def _run_tool(self, tool_name: str, tool_input, start: _ToolStart) -> str:
+        start.mark()
+        tool = self.tool_registry.get_tool(tool_name)
+        return tool.run(GenericRequest(content=tool_input)).output
+
+    def _tool_timeout(self, tool_name: str) -> float:
+        try:
+            tool = self.tool_registry.get_tool(tool_name)
+        except ValueError:
+            return self.tool_timeout  # _run_tool reports the unknown tool
+        return getattr(tool, "timeout", None) or self.tool_timeout
+
+    def _session(self, state: AgentState) -> SessionContext:
+        """The state's session, focused on the question of the current step."""
+        # States built elsewhere (or before sessions existed) get one on first use
+        if state.session is None:
+            state.session = SessionContext()
+        if state.session.scratchpad is None:
+            state.session.scratchpad = self._scratchpad()
+        # The scratchpad keeps results relevant to this question when it compacts
+        state.session.user_question = state.session.scratchpad.user_question = state.input.content
+        return state.session
+
+    def _scratchpad(self) -> Scratchpad:
+        return Scratchpad(self.cfg, max_tokens=self.scratchpad_tokens, model=self.model.model)
+
+    def _enrich_prompt(self, state: AgentState) -> None:
+        session = self._session(state)
+        sp_summary = session.scratchpad.to_prompt_summary()
+        enriched_prompt = self.prompt.replace("{user_question}", state.input.content).replace("{scratchpad}", sp_summary)
+        self.cfg.logger.debug(f"Enriched prompt: {enriched_prompt}")
+        prompt_message = Message(role="system", content=enriched_prompt)
+        state.history[0] =prompt_message
+
+    def _thinking_config(self) -> thinking_styles.ThinkingConfig:
+        # This selection should ultimately be dynamic
+        return thinking_styles.ThinkingConfig(style=thinking_styles.ThinkStyle.REFLEX, max_iterations=3, cot=thinking_styles.CoTVisibility.EXPOSE)
+
+    def _respond(self, state: AgentState, response_text: str) -> GenericResponse:
+        # Update the state with the new assistant response
+        state.add_message("assistant", response_text)
+        
+        return GenericResponse(
+            state=state,
+            output=response_text,
+            is_done=False  # Conversation can continue
+        )
+
+    def _error(self, state: AgentState, e: Exception) -> GenericResponse:
+        error_message = f"Error generating response: {str(e)}"
+        state.add_message("system", error_message)
+        
+        return GenericResponse(
+            state=state,
+            output=error_message,
+            is_done=True  # End conversation due to error
+        )
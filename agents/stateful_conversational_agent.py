@@ -7,7 +7,10 @@ It serves as an example of how to build agents with the new lifecycle model.
 
 from agents.abstract_agent import AbstractAgent
 from agents.agent_interfaces import AgentState
+from agents.context_assembler import DEFAULT_CONTEXT_TOKENS, ContextAssembler
 from communication.generic_response import GenericResponse
+from communication.generic_request import GenericRequest
+from models.metrics import component
 from models.openai_wrapper import OpenAIModel as OpenAIModel
 from prompts.prompts import DEFAULT_PROMPT
 
@@ -20,74 +23,100 @@ class StatefulConversationalAgent(AbstractAgent):
     and state between interactions.
     """
     
-    def __init__(self, model=None, system_prompt=DEFAULT_PROMPT):
+    def __init__(self, model=None, system_prompt=DEFAULT_PROMPT, context_tokens=DEFAULT_CONTEXT_TOKENS):
         """
         Initialize the stateful conversational agent.
         
         Args:
             system_prompt: The system prompt to use for the agent
+            context_tokens: Token budget for the history sent to the model
         """
         self.system_prompt = system_prompt
         self.model = model if model else OpenAIModel()
+        self.context_tokens = context_tokens
     
-    def start(self, input_content: str, **metadata) -> GenericResponse:
+    def _new_state(self, input_content: str, metadata: dict) -> AgentState:
+        # Create a new state for this session
+        state = AgentState(context=ContextAssembler(self.context_tokens, model=self.model.model))
+        
+        # Add the system prompt and initial user message
+        state.add_message("system", self.system_prompt)
+        state.add_message("user", input_content)
+        
+        # Set the input for processing
+        state.input = GenericRequest(content=input_content, metadata=metadata)
+        return state
+
+    def start(self, input_content: str, stream: bool = False, **metadata) -> GenericResponse:
         """
         Start a new conversation session.
         
         Args:
             input_content: The initial user input
+            stream: Whether to stream the answer (see step)
             metadata: Additional metadata for the session
             
         Returns:
             An AgentResponse with the initialized state
         """
-        # Create a new state for this session
-        state = AgentState()
-        
-        # Add the system prompt and initial user message
-        state.add_message("system", self.system_prompt)
-        state.add_message("user", input_content)
-        
-        # Set the input for processing
-        state.input = AgentInput(content=input_content, metadata=metadata)
-        
         # Process this initial state
-        return self.step(state)
+        return self.step(self._new_state(input_content, metadata), stream=stream)
+
+    async def astart(self, input_content: str, **metadata) -> GenericResponse:
+        """
+        Coroutine version of start().
+        """
+        return await self.astep(self._new_state(input_content, metadata))
     
-    def step(self, state: AgentState) -> GenericResponse:
+    def step(self, state: AgentState, stream: bool = False) -> GenericResponse:
         """
         Process a single step in the conversation.
         
         Args:
             state: The current conversation state
+            stream: If True, the answer is returned as response.stream and
+                output/history are filled in once the stream is drained
             
         Returns:
             An AgentResponse with the updated state and agent's output
         """
         try:
-            # Generate a response using the current history
-            response = self.model.generate_response(state.get_messages_for_llm())
-            response_text = response.output
-            
-            # Update the state with the new assistant response
-            state.add_message("assistant", response_text)
-            
-            # Set the next action to respond with the generated text
-            #state.next_action = AgentAction.respond(response_text)
-            
-            return GenericResponse(
-                state=state,
-                output=response_text,
-                is_done=False  # Conversation can continue
-            )
-            
+            with component("StatefulConversationalAgent"):
+                if stream:
+                    return self._stream_response(state, self.model.stream_response(state.get_messages_for_llm()))
+                # Generate a response using the current history
+                response = self.model.generate_response(state.get_messages_for_llm())
+            return self._respond(state, response.output)
         except Exception as e:
-            error_message = f"Error generating response: {str(e)}"
-            state.add_message("system", error_message)
-            
-            return GenericResponse(
-                state=state,
-                output=error_message,
-                is_done=True  # End conversation due to error
-            )
-   
+            return self._error(state, e)
+
+    async def astep(self, state: AgentState) -> GenericResponse:
+        """
+        Coroutine version of step().
+        """
+        try:
+            with component("StatefulConversationalAgent"):
+                response = await self.model.agenerate_response(state.get_messages_for_llm())
+            return self._respond(state, response.output)
+        except Exception as e:
+            return self._error(state, e)
+
+    def _respond(self, state: AgentState, response_text: str) -> GenericResponse:
+        # Update the state with the new assistant response
+        state.add_message("assistant", response_text)
+        
+        return GenericResponse(
+            state=state,
+            output=response_text,
+            is_done=False  # Conversation can continue
+        )
+
+    def _error(self, state: AgentState, e: Exception) -> GenericResponse:
+        error_message = f"Error generating response: {str(e)}"
+        state.add_message("system", error_message)
+        
+        return GenericResponse(
+            state=state,
+            output=error_message,
+            is_done=True  # End conversation due to error
+        )
@@ -11,10 +11,15 @@ It includes strategies like:
 """
 
 from __future__ import annotations
+import asyncio
+import json
 from enum import Enum
 from agents.agent_interfaces import AgentState
 from pydantic import BaseModel
 from models.abstract_model import AbstractModel
+from models.model_response import ModelResponseStream
+from models.metrics import component
+from models.model_router import ModelRouter, Purpose
 from communication.generic_response import GenericResponse
 from logging import Logger
 
@@ -40,7 +45,7 @@ class ThinkingConfig(BaseModel):
     temperature: float = 0.1
     max_iterations: int = 3
     cot: CoTVisibility = CoTVisibility.EXPOSE
-    model_name: str = "gpt-3.5-turbo"  # Default model, can be overridden
+    model_name: str | None = None  # Preferred answer model when llm_chat is a ModelRouter; None routes freely
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -70,12 +75,55 @@ def think(
     raise ValueError(f"Unknown style: {cfg.style}")
 
 
+async def athink(
+    llm_chat: AbstractModel,
+    state: AgentState,
+    cfg: ThinkingConfig,
+    logger: Logger
+    ) -> GenericResponse:
+    """
+    Coroutine version of think(); every LLM call goes through
+    llm_chat.agenerate_response so many conversations can share one event loop.
+    """
+    if cfg.style is ThinkStyle.REFLEX:
+        return await _areflex(llm_chat, state, cfg, logger)
+    if cfg.style is ThinkStyle.REACTIVE:
+        return await _areactive(llm_chat, state, cfg, logger)
+    if cfg.style is ThinkStyle.REFLECTIVE:
+        return await _areflective(llm_chat, state, cfg, logger)
+    raise ValueError(f"Unknown style: {cfg.style}")
+
+
+def think_stream(
+    llm_chat: AbstractModel,
+    state: AgentState,
+    cfg: ThinkingConfig,
+    logger: Logger
+    ) -> ModelResponseStream:
+    """
+    Streaming variant of think().
+
+    Only a REFLEX answer without hidden CoT can be streamed as it is generated;
+    the other styles post-process the full answer, so it is delivered as one delta.
+    """
+    if cfg.style is ThinkStyle.REFLEX and cfg.cot is not CoTVisibility.HIDDEN:
+        with component("reflex"):
+            return _routed(llm_chat, Purpose.REFLEX_ANSWER, cfg).stream_response(_reflex_messages(state, cfg))
+    return ModelResponseStream.of(think(llm_chat, state, cfg, logger).output)
+
+
+def _routed(llm_chat, purpose, cfg) -> AbstractModel:
+    """The model to use for one kind of call: a router view, or llm_chat itself."""
+    if isinstance(llm_chat, ModelRouter):
+        return llm_chat.for_purpose(purpose, preferred=cfg.model_name, temperature=cfg.temperature)
+    return llm_chat
+
+
 # ──────────────────────────────────────────────────────────────────────────────
-#  Strategy implementations
+#  Prompt construction (shared by the sync and async strategies)
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _reflex(llm_chat, state, cfg, logger) -> GenericResponse:
-    """Single pass; no chain-of-thought unless cfg.cot != NONE."""
+def _reflex_messages(state, cfg) -> list[dict]:
     system_prompt = "Answer the user concisely and accurately."
     if cfg.cot is CoTVisibility.HIDDEN:
         system_prompt = (
@@ -88,20 +136,18 @@ def _reflex(llm_chat, state, cfg, logger) -> GenericResponse:
 
     for message in state.get_messages_for_llm():
         messages.append(message)
+    return messages
+
 
-    raw = llm_chat.generate_response(messages)
+def _reflex_result(raw, state, cfg) -> GenericResponse:
     raw = raw.output.strip()
     if cfg.cot is CoTVisibility.HIDDEN:
         return GenericResponse(state=state, output=raw.split("⧉ANSWER⧉")[-1].strip())
     return GenericResponse(state=state, output=raw)
 
 
-def _reactive(llm_chat, state, cfg, logger) -> GenericResponse:
-    """
-    Simple ReAct loop:
-        Thought -> (optional) tool call -> Observation … finish.
-    """
-    messages = [
+def _reactive_messages(state) -> list[dict]:
+    return [
         {"role": "system", "content":
             "You can think and act in this loop:\n"
             "THOUGHT: ...\n"
@@ -111,78 +157,151 @@ def _reactive(llm_chat, state, cfg, logger) -> GenericResponse:
         {"role": "user", "content": state.input.content},
     ]
 
+
+def _reactive_observe(assistant, messages, state, logger):
+    """
+    Record one assistant turn of the ReAct loop.
+
+    Returns the final answer if the model finished, otherwise None after
+    appending any tool observation to messages.
+    """
+    messages.append({"role": "assistant", "content": assistant})
+
+    logger.debug(f"LLM response: {assistant}")
+
+    # finished?
+    if assistant.startswith("FINAL:"):
+        return assistant[len("FINAL:"):].strip()
+
+    # tool invocation?
+    if "ACTION:" in assistant:
+        try:
+            action_json = assistant.split("ACTION:")[1].strip()
+            action = json.loads(action_json)
+            result = state.tool_runner(action["name"], action["arguments"])
+
+            logger.debug(f"Tool result: {result}")
+
+            messages.append({"role": "system", "content":
+                f"OBSERVATION: {result}"})
+        except Exception as exc:
+            messages.append({"role": "system", "content":
+                f"OBSERVATION: tool_error: {exc}"})
+    return None
+
+
+_REACTIVE_FALLBACK = "I couldn't complete the task in time. Please try again."
+
+
+def _draft_messages(state) -> list[dict]:
+    return [
+        {"role": "system", "content":
+            "Think step-by-step, then output ⧉ANSWER⧉ and your final answer."},
+        {"role": "user", "content": state.input.content},
+    ]
+
+
+def _critique_messages(answer) -> list[dict]:
+    return [
+        {"role": "system", "content":
+            "You are a critic. Identify factual errors, missing info, tone issues. Expand the answer to be more helpful, if necessary."},
+        {"role": "assistant", "content": answer},
+        {"role": "user", "content": "List issues or reply NONE."},
+    ]
+
+
+def _revision_messages(answer, critique) -> list[dict]:
+    return [
+        {"role": "system", "content":
+            "Revise the answer so it addresses the critique. "
+            "Respond with the improved answer only."},
+        {"role": "assistant", "content": answer},
+        {"role": "user", "content": f"Critique:\n{critique}"},
+    ]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Strategy implementations
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _reflex(llm_chat, state, cfg, logger) -> GenericResponse:
+    """Single pass; no chain-of-thought unless cfg.cot != NONE."""
+    with component("reflex"):
+        raw = _routed(llm_chat, Purpose.REFLEX_ANSWER, cfg).generate_response(_reflex_messages(state, cfg))
+    return _reflex_result(raw, state, cfg)
+
+
+async def _areflex(llm_chat, state, cfg, logger) -> GenericResponse:
+    with component("reflex"):
+        raw = await _routed(llm_chat, Purpose.REFLEX_ANSWER, cfg).agenerate_response(_reflex_messages(state, cfg))
+    return _reflex_result(raw, state, cfg)
+
+
+def _reactive(llm_chat, state, cfg, logger) -> GenericResponse:
+    """
+    Simple ReAct loop:
+        Thought -> (optional) tool call -> Observation … finish.
+    """
+    messages = _reactive_messages(state)
+    llm_chat = _routed(llm_chat, Purpose.REACT_STEP, cfg)
+
     for _ in range(cfg.max_iterations):
-        assistant = llm_chat.generate_response(messages)
-        assistant = assistant.output.strip()
-        messages.append({"role": "assistant", "content": assistant})
-
-        logger.debug(f"LLM response: {assistant}")
-
-        # finished?
-        if assistant.startswith("FINAL:"):
-            return GenericResponse(
-                    state=state,
-                    output = assistant[len("FINAL:"):].strip(),
-            )
-
-        # tool invocation?
-        if "ACTION:" in assistant:
-            try:
-                action_json = assistant.split("ACTION:")[1].strip()
-                action = json.loads(action_json)
-                result = state.tool_runner(action["name"], action["arguments"])
-
-                logger.debug(f"Tool result: {result}")
-
-                messages.append({"role": "system", "content":
-                    f"OBSERVATION: {result}"})
-            except Exception as exc:
-                messages.append({"role": "system", "content":
-                    f"OBSERVATION: tool_error: {exc}"})
+        with component("reactive.step"):
+            assistant = llm_chat.generate_response(messages)
+        final = _reactive_observe(assistant.output.strip(), messages, state, logger)
+        if final is not None:
+            return GenericResponse(state=state, output=final)
 
     # fallback
-    return GenericResponse(
-        state=state,
-        output="I couldn't complete the task in time. Please try again.",
-    )
+    return GenericResponse(state=state, output=_REACTIVE_FALLBACK)
+
+
+async def _areactive(llm_chat, state, cfg, logger) -> GenericResponse:
+    messages = _reactive_messages(state)
+    llm_chat = _routed(llm_chat, Purpose.REACT_STEP, cfg)
+
+    for _ in range(cfg.max_iterations):
+        with component("reactive.step"):
+            assistant = await llm_chat.agenerate_response(messages)
+        # Tool runners are blocking, so observe off the event loop.
+        final = await asyncio.to_thread(
+            _reactive_observe, assistant.output.strip(), messages, state, logger
+        )
+        if final is not None:
+            return GenericResponse(state=state, output=final)
+
+    return GenericResponse(state=state, output=_REACTIVE_FALLBACK)
 
 
 def _reflective(llm_chat, state, cfg, logger) -> GenericResponse:
     """Draft ➔ self-critique ➔ optional revision.  ≤3 LLM calls."""
     # 1) Draft with hidden CoT
-    draft = llm_chat.generate_response(
-        [
-            {"role": "system", "content":
-                "Think step-by-step, then output ⧉ANSWER⧉ and your final answer."},
-            {"role": "user", "content": state.user_msg.content},
-        ],
-    )
-    
-    draft = draft.output
-    answer = draft.split("⧉ANSWER⧉")[-1].strip()
-
+    with component("reflective.draft"):
+        draft = _routed(llm_chat, Purpose.DRAFT, cfg).generate_response(_draft_messages(state))
+    answer = draft.output.split("⧉ANSWER⧉")[-1].strip()
 
     # 2) Critique
-    critique = llm_chat.generate_response(
-        [
-            {"role": "system", "content":
-                "You are a critic. Identify factual errors, missing info, tone issues. Expand the answer to be more helpful, if necessary."},
-            {"role": "assistant", "content": answer},
-            {"role": "user", "content": "List issues or reply NONE."},
-        ],
-    )
+    with component("reflective.critique"):
+        critique = _routed(llm_chat, Purpose.CRITIQUE, cfg).generate_response(_critique_messages(answer)).output.strip()
 
     # 3) Optional revision
     if critique != "NONE":
-        answer = llm_chat.generate_response(
-            [
-                {"role": "system", "content":
-                    "Revise the answer so it addresses the critique. "
-                    "Respond with the improved answer only."},
-                {"role": "assistant", "content": answer},
-                {"role": "user", "content": f"Critique:\n{critique}"},
-            ],
-        )
+        with component("reflective.revision"):
+            answer = _routed(llm_chat, Purpose.REVISION, cfg).generate_response(_revision_messages(answer, critique)).output
 
-    return GenericResponse(state=state, output=answer.output)
+    return GenericResponse(state=state, output=answer)
+
+
+async def _areflective(llm_chat, state, cfg, logger) -> GenericResponse:
+    with component("reflective.draft"):
+        draft = await _routed(llm_chat, Purpose.DRAFT, cfg).agenerate_response(_draft_messages(state))
+    answer = draft.output.split("⧉ANSWER⧉")[-1].strip()
+
+    with component("reflective.critique"):
+        critique = (await _routed(llm_chat, Purpose.CRITIQUE, cfg).agenerate_response(_critique_messages(answer))).output.strip()
+
+    if critique != "NONE":
+        with component("reflective.revision"):
+            answer = (await _routed(llm_chat, Purpose.REVISION, cfg).agenerate_response(_revision_messages(answer, critique))).output
 
+    return GenericResponse(state=state, output=answer)
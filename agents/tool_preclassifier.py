@@ -0,0 +1,267 @@
+"""
+A local fast path for tool selection.
+
+Most conversational turns need no tool, yet every step pays an LLM call to
+learn that. ToolPreclassifier decides on the CPU, in microseconds, when it is
+confident, and otherwise defers to the LLM selector:
+
+    - rules: a URL goes to WebBrowsingTool, recency words ("latest", "today",
+      "news") go to WebSearch, greetings and thanks need no tool;
+    - a small learned model: logistic regression over hashed character
+      n-grams, trained on the LLM selector's logged decisions.
+
+A decision is taken only at or above the confidence threshold. A sample of
+confident decisions can still be sent to the LLM (audit_rate) to measure
+agreement; stats() reports the deferral rate and agreement with the LLM.
+"""
+
+import json
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.local_embedder import hashed_ngram_matrix
+
+NO_TOOL = "none"
+BROWSE_TOOL = "WebBrowsingTool"
+SEARCH_TOOL = "WebSearch"
+
+_URL = re.compile(r"https?://[^\s<>\"')\]]+", re.IGNORECASE)
+_RECENT = re.compile(
+    r"\b(latest|today|tonight|yesterday|this (week|month|year)|right now|breaking|news|"
+    r"currently|recent(ly)?|up[- ]to[- ]date|as of|stock price|weather|score)\b",
+    re.IGNORECASE,
+)
+_SMALL_TALK = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|thx|ok(ay)?|cool|great|bye|good (morning|afternoon|evening|night))"
+    r"[\s!.,:)]*(sophia)?[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class ToolDecision:
+    """A tool choice made without the LLM."""
+    tool: str
+    input: Optional[str]
+    confidence: float
+    source: str  # "rule" or "model"
+
+    def to_json(self) -> str:
+        """The decision in the selector's output format."""
+        return json.dumps({"tool": self.tool, "input": self.input})
+
+
+def rule_decision(text: str) -> Optional[ToolDecision]:
+    """The tool the built-in rules pick for a question, if any."""
+    url = _URL.search(text)
+    if url:
+        return ToolDecision(BROWSE_TOOL, url.group(0).rstrip(".,;:!?"), 0.99, "rule")
+    if _SMALL_TALK.match(text):
+        return ToolDecision(NO_TOOL, None, 0.95, "rule")
+    if _RECENT.search(text):
+        return ToolDecision(SEARCH_TOOL, text.strip(), 0.9, "rule")
+    return None
+
+
+class ToolSelectionModel:
+    """
+    Multinomial logistic regression over hashed character n-grams.
+    """
+
+    def __init__(self, labels: Sequence[str], dim: int = 1024, weights: Optional[np.ndarray] = None,
+                 bias: Optional[np.ndarray] = None):
+        self.labels = list(labels)
+        self.dim = dim
+        self.weights = weights if weights is not None else np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.labels), dtype=np.float32)
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], dim: int = 1024, epochs: int = 300,
+            learning_rate: float = 0.5, l2: float = 1e-4) -> "ToolSelectionModel":
+        """
+        Train on questions and the tools chosen for them.
+
+        Args:
+            texts: The questions
+            labels: The tool chosen for each question ("none" for no tool)
+            dim: Number of hashed features
+            epochs: Full-batch gradient descent steps
+            learning_rate: Step size
+            l2: Weight decay
+
+        Returns:
+            The trained model
+        """
+        classes = sorted(set(labels))
+        if len(classes) < 2:
+            raise ValueError("Training needs decisions for at least two tools")
+        features = hashed_ngram_matrix(list(texts), dim)
+        targets = np.zeros((len(labels), len(classes)), dtype=np.float32)
+        targets[np.arange(len(labels)), [classes.index(label) for label in labels]] = 1.0
+
+        model = cls(classes, dim)
+        for _ in range(epochs):
+            error = (model._probabilities(features) - targets) / len(labels)
+            model.weights -= learning_rate * (features.T @ error + l2 * model.weights)
+            model.bias -= learning_rate * error.sum(axis=0)
+        return model
+
+    @classmethod
+    def from_log(cls, path: str, **fit_options) -> "ToolSelectionModel":
+        """Train on the decisions a ToolPreclassifier logged to a JSONL file."""
+        texts, labels = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    texts.append(record["question"])
+                    labels.append(record["tool"])
+        return cls.fit(texts, labels, **fit_options)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """The most likely tool for a question and its probability."""
+        probabilities = self._probabilities(hashed_ngram_matrix([text], self.dim))[0]
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path: str) -> None:
+        np.savez(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels), dim=self.dim)
+
+    @classmethod
+    def load(cls, path: str) -> "ToolSelectionModel":
+        with np.load(path) as data:
+            return cls([str(label) for label in data["labels"]], int(data["dim"]), data["weights"], data["bias"])
+
+    def _probabilities(self, features: np.ndarray) -> np.ndarray:
+        logits = features @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class ToolPreclassifier:
+    """
+    Decides tool selection locally when confident and defers to the LLM otherwise.
+    """
+
+    def __init__(self, model: Optional[ToolSelectionModel] = None, threshold: float = 0.9,
+                 use_rules: bool = True, audit_rate: float = 0.0, log_path: Optional[str] = None,
+                 seed: Optional[int] = None):
+        """
+        Initialize the pre-classifier.
+
+        Args:
+            model: Learned model for questions the rules do not cover
+            threshold: Confidence needed to decide without the LLM
+            use_rules: Whether to apply the built-in rules
+            audit_rate: Fraction of confident decisions still sent to the LLM,
+                to measure agreement
+            log_path: JSONL file the LLM's decisions are appended to, as
+                training data for ToolSelectionModel.from_log
+            seed: Seed for audit sampling
+        """
+        self.model = model
+        self.threshold = threshold
+        self.use_rules = use_rules
+        self.audit_rate = audit_rate
+        self.log_path = log_path
+        self.counts = {"calls": 0, "rule": 0, "model": 0, "deferred": 0,
+                       "audited": 0, "audit_agreed": 0, "deferred_compared": 0, "deferred_agreed": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def guess(self, text: str, tools: Optional[Iterable[str]] = None) -> Optional[ToolDecision]:
+        """
+        The best local guess for a question, however confident.
+
+        Args:
+            text: The question
+            tools: Names of the registered tools; guesses for other tools are dropped
+
+        Returns:
+            The guess, or None if nothing applies
+        """
+        available = set(tools) if tools is not None else None
+        candidates = []
+        if self.use_rules:
+            candidates.append(rule_decision(text))
+        if self.model is not None:
+            tool, confidence = self.model.predict(text)
+            candidates.append(self._model_decision(text, tool, confidence))
+        for decision in candidates:
+            if decision is not None and (available is None or decision.tool == NO_TOOL or decision.tool in available):
+                return decision
+        return None
+
+    def classify(self, text: str, tools: Optional[Iterable[str]] = None) -> Tuple[Optional[ToolDecision], Optional[ToolDecision]]:
+        """
+        Decide a question locally, or defer it.
+
+        Args:
+            text: The question
+            tools: Names of the registered tools
+
+        Returns:
+            (decision, guess): decision is set when the LLM is not needed;
+            otherwise guess is the local guess to compare with the LLM's
+            answer in observe()
+        """
+        guess = self.guess(text, tools)
+        confident = guess is not None and guess.confidence >= self.threshold
+        with self._lock:
+            self.counts["calls"] += 1
+            if confident and self._rng.random() >= self.audit_rate:
+                self.counts[guess.source] += 1
+                return guess, None
+            if confident:
+                self.counts["audited"] += 1
+            else:
+                self.counts["deferred"] += 1
+        return None, guess
+
+    def observe(self, text: str, guess: Optional[ToolDecision], tool: str) -> None:
+        """
+        Record the LLM selector's decision for a question that was not decided locally.
+
+        Args:
+            text: The question
+            guess: The guess classify() returned with it
+            tool: The tool the LLM selector chose ("none" for no tool)
+        """
+        if guess is not None:
+            audited = guess.confidence >= self.threshold
+            prefix = "audit" if audited else "deferred"
+            with self._lock:
+                if not audited:
+                    self.counts["deferred_compared"] += 1
+                self.counts[f"{prefix}_agreed"] += guess.tool == tool
+        if self.log_path:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"question": text, "tool": tool}) + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        """Decision counts, the deferral rate and agreement with the LLM selector."""
+        with self._lock:
+            counts = dict(self.counts)
+        calls = counts["calls"]
+        counts["deferral_rate"] = counts["deferred"] / calls if calls else 0.0
+        counts["agreement"] = counts["audit_agreed"] / counts["audited"] if counts["audited"] else None
+        counts["deferred_agreement"] = (counts["deferred_agreed"] / counts["deferred_compared"]
+                                        if counts["deferred_compared"] else None)
+        return counts
+
+    def _model_decision(self, text: str, tool: str, confidence: float) -> Optional[ToolDecision]:
+        # The model only names the tool; its input must be derivable from the question
+        if tool == NO_TOOL:
+            return ToolDecision(NO_TOOL, None, confidence, "model")
+        if tool == SEARCH_TOOL:
+            return ToolDecision(SEARCH_TOOL, text.strip(), confidence, "model")
+        if tool == BROWSE_TOOL:
+            url = _URL.search(text)
+            return ToolDecision(BROWSE_TOOL, url.group(0), confidence, "model") if url else None
+        return None
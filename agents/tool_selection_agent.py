@@ -2,9 +2,34 @@ from agents.abstract_agent import AbstractAgent
 from agents.agent_interfaces import AgentState
 from communication.generic_response import GenericResponse
 from communication.generic_request import GenericRequest
+from agents.tool_preclassifier import ToolPreclassifier
+from models.model_router import ModelRouter, Purpose
+from models.metrics import component
 from models.openai_wrapper import OpenAIModel
+from models.response_cache import ResponseCache
 from prompts.prompts import TOOL_SELECTION_PROMPT
 from tools.registry import ToolRegistry
+from typing import Any, List, Optional, Tuple
+import json
+
+# Most tool calls a single selection may ask for
+MAX_TOOL_CALLS = 4
+
+
+def parse_tool_calls(selection: str) -> List[Tuple[str, Any]]:
+    """
+    Parse the selector's output into (tool, input) calls, in the order given.
+
+    Args:
+        selection: One JSON tool call, or a JSON array of them
+
+    Returns:
+        The calls, without "none" entries
+    """
+    parsed = json.loads(selection)
+    calls = parsed if isinstance(parsed, list) else [parsed]
+    return [(call['tool'], call.get('input')) for call in calls
+            if call.get('tool') and str(call['tool']).lower() != "none"]
 
 
 class ToolSelectionAgent(AbstractAgent):
@@ -15,22 +40,45 @@ class ToolSelectionAgent(AbstractAgent):
     and state between interactions.
     """
     
-    def __init__(self, config, tool_registry: ToolRegistry): 
+    def __init__(self, config, tool_registry: ToolRegistry, response_cache: Optional[ResponseCache] = None, model=None,
+                 preclassifier: Optional[ToolPreclassifier] = None):
         """
         Initialize the agent.
         
         Args:
             system_prompt: The system prompt to use for the agent
+            response_cache: Cache for selector calls; selection runs at
+                temperature 0, so repeated questions can be answered from it
+            model: Model to select tools with instead of the default OpenAIModel;
+                a ModelRouter routes selection calls to its cheapest fast model
+            preclassifier: Local fast path that decides confident cases
+                without calling the model
         """
         super().__init__(config)
         self.tool_registry = tool_registry
         tool_descriptions = self.tool_registry.get_all_tools_description()
 
-        self.prompt = TOOL_SELECTION_PROMPT.format(tools=tool_descriptions)
+        self.prompt = TOOL_SELECTION_PROMPT.format(tools=tool_descriptions, max_calls=MAX_TOOL_CALLS)
 
-        self.model = OpenAIModel(temperature=0.0)
+        if isinstance(model, ModelRouter):
+            model = model.for_purpose(Purpose.TOOL_SELECTION, temperature=0.0)
+        self.model = model if model else OpenAIModel(temperature=0.0, response_cache=response_cache)
+        self.preclassifier = preclassifier
                 
 
+    def _new_state(self, input_content: str, metadata: dict) -> AgentState:
+        # Create a new state for this session
+        state = AgentState()
+        
+        # Add the system prompt and initial user message
+        state.add_message("system", self.prompt)
+        state.add_message("user", input_content)
+        
+        # Set the input for processing
+        state.user_msg = GenericRequest(content=input_content, metadata=metadata)
+        state.input = GenericRequest(content=input_content, metadata=metadata)
+        return state
+
     def start(self, input_content: str, **metadata) -> GenericResponse:
         """
         Start a new session.
@@ -42,18 +90,14 @@ class ToolSelectionAgent(AbstractAgent):
         Returns:
             An AgentResponse with the initialized state
         """
-        # Create a new state for this session
-        state = AgentState()
-        
-        # Add the system prompt and initial user message
-        state.add_message("system", self.prompt)
-        state.add_message("user", input_content)
-        
-        # Set the input for processing
-        state.user_msg = GenericRequest(content=input_content, metadata=metadata)
-        state.input = GenericRequest(content=input_content, metadata=metadata)
         # Process this initial state
-        return self.step(state)
+        return self.step(self._new_state(input_content, metadata))
+
+    async def astart(self, input_content: str, **metadata) -> GenericResponse:
+        """
+        Coroutine version of start().
+        """
+        return await self.astep(self._new_state(input_content, metadata))
     
     def step(self, state: AgentState) -> GenericResponse:
         """
@@ -66,34 +110,63 @@ class ToolSelectionAgent(AbstractAgent):
             An AgentResponse with the updated state and agent's output
         """
         try:
+            decision, guess = self._preclassify(state)
+            if decision is not None:
+                return self._respond(state, decision.to_json())
             # This selection should ultimately be dynamic
-            response = self.model.generate_response(state.get_messages_for_llm())
+            with component("ToolSelectionAgent"):
+                response = self.model.generate_response(state.get_messages_for_llm())
+            self._observe(state, guess, response.output)
+            return self._respond(state, response.output)
+        except Exception as e:
+            return self._error(state, e)
 
-            response_text = response.output
+    async def astep(self, state: AgentState) -> GenericResponse:
+        """
+        Coroutine version of step().
+        """
+        try:
+            decision, guess = self._preclassify(state)
+            if decision is not None:
+                return self._respond(state, decision.to_json())
+            with component("ToolSelectionAgent"):
+                response = await self.model.agenerate_response(state.get_messages_for_llm())
+            self._observe(state, guess, response.output)
+            return self._respond(state, response.output)
+        except Exception as e:
+            return self._error(state, e)
 
+    def _preclassify(self, state: AgentState):
+        if self.preclassifier is None:
+            return None, None
+        return self.preclassifier.classify(state.input.content, self.tool_registry.list_tools())
 
-            # Update the state with the new assistant response
-            state.add_message("assistant", response_text)
-            
-            # Set the next action to respond with the generated text
-            #state.next_action = AgentAction.respond(
-            #    content=response_text,
-            #    metadata={"thinking_style": thinking_config.style.name}
-            #)
-            
-            return GenericResponse(
-                state=state,
-                output=response_text,
-                is_done=False  # Conversation can continue
-            )
-            
-        except Exception as e:
-            error_message = f"Error generating response: {str(e)}"
-            state.add_message("system", error_message)
-            
-            return GenericResponse(
-                state=state,
-                output=error_message,
-                is_done=True  # End conversation due to error
-            )
-   
+    def _observe(self, state: AgentState, guess, selection: str) -> None:
+        if self.preclassifier is None:
+            return
+        try:
+            calls = parse_tool_calls(selection)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return  # the selector failed; nothing to learn from
+        # The local classifier learns the first (most important) tool
+        self.preclassifier.observe(state.input.content, guess, calls[0][0] if calls else "none")
+
+    def _respond(self, state: AgentState, response_text: str) -> GenericResponse:
+        # Update the state with the new assistant response
+        state.add_message("assistant", response_text)
+        
+        return GenericResponse(
+            state=state,
+            output=response_text,
+            is_done=False  # Conversation can continue
+        )
+
+    def _error(self, state: AgentState, e: Exception) -> GenericResponse:
+        error_message = f"Error generating response: {str(e)}"
+        state.add_message("system", error_message)
+        
+        return GenericResponse(
+            state=state,
+            output=error_message,
+            is_done=True  # End conversation due to error
+        )
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark the agent framework against the offline FakeModel.
+
+Runs a number of multi-turn conversations through StatefulConversationalAgent,
+first one after another on the blocking path and then concurrently on one
+event loop through AgentLoop's coroutine methods, and reports throughput and
+per-step latency. With --latency 0 the numbers are pure framework overhead.
+
+    python -m benchmarks.agent_loop_benchmark --conversations 200 --turns 5 --latency 0.05 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from agents.agent_loop import AgentLoop
+from agents.stateful_conversational_agent import StatefulConversationalAgent
+from models.fake_model import FakeModel, LatencyDistribution
+
+
+def _agent(args) -> StatefulConversationalAgent:
+    latency = LatencyDistribution(args.distribution, args.latency, args.spread)
+    return StatefulConversationalAgent(model=FakeModel(latency=latency, seed=args.seed))
+
+
+def run_sync(args) -> list:
+    agent = _agent(args)
+    step_times = []
+    for c in range(args.conversations):
+        started = time.perf_counter()
+        response = agent.start(f"conversation {c} turn 0")
+        step_times.append(time.perf_counter() - started)
+        for turn in range(1, args.turns):
+            response.state.add_message("user", f"conversation {c} turn {turn}")
+            started = time.perf_counter()
+            response = agent.step(response.state)
+            step_times.append(time.perf_counter() - started)
+    return step_times
+
+
+async def run_async(args) -> list:
+    loop = AgentLoop(_agent(args), max_concurrency=args.concurrency)
+    step_times = []
+
+    async def conversation(c):
+        started = time.perf_counter()
+        response = await loop.astart(f"conversation {c} turn 0", session_id=c)
+        step_times.append(time.perf_counter() - started)
+        for turn in range(1, args.turns):
+            started = time.perf_counter()
+            response = await loop.arun_turn(response.state, f"conversation {c} turn {turn}")
+            step_times.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[conversation(c) for c in range(args.conversations)])
+    return step_times
+
+
+def report(name: str, elapsed: float, step_times: list) -> None:
+    step_times = sorted(step_times)
+    p99 = step_times[min(len(step_times) - 1, int(len(step_times) * 0.99))]
+    print(
+        f"{name:>6}: {len(step_times)} steps in {elapsed:.3f}s "
+        f"({len(step_times) / elapsed:,.0f} steps/s), "
+        f"step p50 {statistics.median(step_times) * 1e3:.3f}ms p99 {p99 * 1e3:.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent framework benchmark on the fake model backend")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean simulated model latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.5, help="Distribution spread (sigma for lognormal)")
+    parser.add_argument("--distribution", default="lognormal", choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1000, help="AgentLoop's limit on concurrent steps")
+    parser.add_argument("--skip-sync", action="store_true", help="Only run the concurrent async pass")
+    args = parser.parse_args()
+
+    if not args.skip_sync:
+        started = time.perf_counter()
+        step_times = run_sync(args)
+        report("sync", time.perf_counter() - started, step_times)
+
+    started = time.perf_counter()
+    step_times = asyncio.run(run_async(args))
+    report("async", time.perf_counter() - started, step_times)
+
+
+if __name__ == "__main__":
+    main()
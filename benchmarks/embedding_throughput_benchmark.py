@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare embedding throughput of the local CPU embedder and the remote API.
+
+Embeds a synthetic corpus of conversation-sized texts with
+HashedNgramEmbedder, once in-process and once on the process pool, and,
+when OPENAI_API_KEY is set, a smaller sample through OpenAIModel.
+
+    python -m benchmarks.embedding_throughput_benchmark --texts 100000 --remote-texts 2000
+"""
+
+import argparse
+import os
+import random
+import time
+
+from models.local_embedder import HashedNgramEmbedder
+
+_WORDS = ("memory agent recall search answer question tool context model token "
+          "summary history user assistant web result page index vector store").split()
+
+
+def _corpus(count: int, words: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(words)) + f" #{i}" for i in range(count)]
+
+
+def measure(model, texts: list) -> float:
+    """Texts embedded per second."""
+    started = time.perf_counter()
+    model.generate_embeddings(texts)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vs remote embedding throughput")
+    parser.add_argument("--texts", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=40, help="Words per text")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--remote-texts", type=int, default=2000,
+                        help="Texts sent to the remote API (needs OPENAI_API_KEY; 0 skips)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts, args.words, args.seed)
+    results = {
+        "local (1 process)": measure(HashedNgramEmbedder(dim=args.dim, workers=1), texts),
+    }
+    if args.workers > 1:
+        pooled = HashedNgramEmbedder(dim=args.dim, workers=args.workers)
+        pooled.generate_embeddings(texts[:pooled.parallel_threshold])  # start the workers
+        results[f"local ({args.workers} processes)"] = measure(pooled, texts)
+    if args.remote_texts and os.environ.get("OPENAI_API_KEY"):
+        from models.openai_wrapper import OpenAIModel
+        results["remote (OpenAI)"] = measure(OpenAIModel(), texts[:args.remote_texts])
+    elif args.remote_texts:
+        print("OPENAI_API_KEY is not set; skipping the remote path")
+
+    for name, rate in results.items():
+        print(f"{name:>22}: {rate:12,.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Measure the memory retained by model responses over a long session.
+
+Builds one provider Response object per turn from a realistic Responses API
+payload and keeps the resulting ModelResponse alive, as agent state does, for
+three layouts:
+
+    legacy    the old dict-based ModelResponse holding the provider object
+    compact   ModelResponse as built by OpenAIModel (slots, no raw payload)
+    keep_raw  compact plus a lazy raw loader (OpenAIModel(keep_raw=True))
+
+    python -m benchmarks.response_memory_benchmark --turns 10000
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from openai.types.responses import Response
+
+from models.openai_wrapper import OpenAIModel
+
+
+class LegacyModelResponse:
+    """The ModelResponse layout before slots: every field in an instance dict."""
+
+    def __init__(self, data, metadata=None, output=None):
+        self.data = data
+        self.output = output
+        self.metadata = metadata if metadata is not None else {}
+
+
+def _payload(turn: int, words: int) -> dict:
+    text = " ".join(f"word{(turn * 31 + i) % 997}" for i in range(words))
+    return {
+        "id": f"resp_{turn:032x}",
+        "object": "response",
+        "created_at": 1_700_000_000 + turn,
+        "model": "gpt-4o-2024-08-06",
+        "status": "completed",
+        "error": None,
+        "incomplete_details": None,
+        "instructions": None,
+        "max_output_tokens": None,
+        "metadata": {},
+        "output": [{
+            "type": "message",
+            "id": f"msg_{turn:032x}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "previous_response_id": None,
+        "reasoning": {"effort": None, "summary": None},
+        "store": True,
+        "temperature": 0.7,
+        "text": {"format": {"type": "text"}},
+        "tool_choice": "auto",
+        "tools": [],
+        "top_p": 1.0,
+        "truncation": "disabled",
+        "usage": {
+            "input_tokens": 250 + turn % 50,
+            "input_tokens_details": {"cached_tokens": 0, "cache_write_tokens": 0},
+            "output_tokens": words,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": 250 + turn % 50 + words,
+        },
+        "user": None,
+    }
+
+
+def _legacy(model: OpenAIModel, response_obj: Response):
+    return LegacyModelResponse(data=response_obj, output=response_obj.output_text)
+
+
+def _compact(model: OpenAIModel, response_obj: Response):
+    return model._response(response_obj, response_obj.output_text)
+
+
+def measure(turns: int, words: int, build, model: OpenAIModel) -> int:
+    """Bytes still allocated after building and retaining one response per turn."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    history = []
+    for turn in range(turns):
+        history.append(build(model, Response.model_validate(_payload(turn, words))))
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del history
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retained memory of model responses over a session")
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--words", type=int, default=60, help="Words per generated answer")
+    args = parser.parse_args()
+
+    cases = [
+        ("legacy", _legacy, OpenAIModel()),
+        ("compact", _compact, OpenAIModel()),
+        ("keep_raw", _compact, OpenAIModel(keep_raw=True)),
+    ]
+    results = {}
+    for name, build, model in cases:
+        results[name] = measure(args.turns, args.words, build, model)
+
+    for name, retained in results.items():
+        print(
+            f"{name:>8}: {retained / 2 ** 20:8.2f} MiB retained over {args.turns} turns "
+            f"({retained / args.turns:,.0f} B/turn, {retained / results['legacy']:.1%} of legacy)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,18 +14,49 @@ from agents.stateful_conversational_agent import StatefulConversationalAgent
 from agents.agent_loop import AgentLoop
 from agents.abstract_agent import AbstractAgent
 from agents.sophia_agent import SophiaAgent
+from models.fake_model import FakeModel, LatencyDistribution
+from models.model_router import ModelRouter
+from models.failover_model import FailoverModel
+from models.openai_wrapper import OpenAIModel
 
 logger = None
-def get_available_agents(cfg: Configurator) -> Dict[str, Callable[[], AbstractAgent]]:
+def get_available_agents(cfg: Configurator, fake_latency: float = 0.0) -> Dict[str, Callable[[], AbstractAgent]]:
     """
     Get a dictionary of available agent factories.
     
+    Args:
+        fake_latency: Mean simulated latency (seconds) for the "fake" agent
+    
     Returns:
         A mapping of agent names to factory functions
     """
     return {
-        "conversational": lambda: StatefulConversationalAgent(cfg),
-        "sophia": lambda: SophiaAgent(cfg)
+        "conversational": lambda: StatefulConversationalAgent(),
+        "sophia": lambda: SophiaAgent(cfg),
+        # Sophia with each call routed to the cheapest model that can handle it
+        "sophia-routed": lambda: SophiaAgent(cfg, model=ModelRouter()),
+        # Sophia drafting the no-tool answer while the tool selector runs
+        "sophia-speculative": lambda: SophiaAgent(cfg, speculative=True),
+        # Sophia failing over to a second model when the primary's circuit opens
+        "sophia-failover": lambda: SophiaAgent(
+            cfg,
+            model=FailoverModel([OpenAIModel(model="gpt-4o-mini"), OpenAIModel(model="gpt-3.5-turbo")]),
+            tool_selection_model=FailoverModel([
+                OpenAIModel(model="gpt-4o-mini", temperature=0.0),
+                OpenAIModel(model="gpt-3.5-turbo", temperature=0.0),
+            ]),
+        ),
+        # Sophia on offline fake models: no tools are selected and answers echo
+        # the prompt, so framework overhead can be measured without an API key
+        "fake": lambda: SophiaAgent(
+            cfg,
+            model=FakeModel(latency=LatencyDistribution("lognormal", fake_latency, 0.5)),
+            tool_selection_model=FakeModel(
+                default='{"tool": "none", "input": null}',
+                latency=LatencyDistribution("lognormal", fake_latency, 0.5),
+                temperature=0.0,
+            ),
+        ),
     }
 
 
@@ -46,6 +77,18 @@ def main():
         action="store_true",
         help="Run in interactive mode"
     )    
+    parser.add_argument(
+        "--stream", "-s",
+        action="store_true",
+        help="Print the agent's answers as they are generated (interactive mode)"
+    )
+ 
+    parser.add_argument(
+        "--fake-latency",
+        type=float,
+        default=0.0,
+        help="Mean simulated latency in seconds for each call made by the fake agent"
+    )
  
     parser.add_argument(
         "input",
@@ -69,7 +112,7 @@ def main():
     cfg.logger.debug(f"Running in {cfg.env_name} environment")
     
     # Create the selected agent
-    agent_factory = get_available_agents(cfg)[args.agent]
+    agent_factory = get_available_agents(cfg, fake_latency=args.fake_latency)[args.agent]
     agent = agent_factory()
     
     # Create an agent loop
@@ -86,7 +129,7 @@ def main():
         
         # Start the interactive loop
         if initial_input.lower() not in ["exit", "quit"]:
-            loop.run_interactive(initial_input)
+            loop.run_interactive(initial_input, stream=args.stream)
     else:
         # Single response mode
         if not args.input:
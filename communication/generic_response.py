@@ -1,10 +1,12 @@
 from agents.agent_interfaces import AgentState
+from typing import Iterable, Optional
 """
 Class for standardizing responses in the Sophia app
 """
 class GenericResponse:
-    def __init__(self, state: AgentState = None, output: str = "", is_done: bool = False):
+    def __init__(self, state: AgentState = None, output: str = "", is_done: bool = False, stream: Optional[Iterable[str]] = None):
         self.output = output
         self.state = state
         self.is_done = is_done
-
+        # When set, output is filled in once the caller has drained the stream
+        self.stream = stream
@@ -10,7 +10,7 @@ from pymilvus import Milvus, DataType, IndexType, CollectionSchema, FieldSchema,
 
 class MilvusWrapper:
     # This connection needs to be made lazy
-    def __init__(self, host=None, port=None, collection_name=None):
+    def __init__(self, host=None, port=None, collection_name=None, dimension=1536):
         # Use centralized config for default values
         self._config = get_config()
         self.connected = False
@@ -18,11 +18,12 @@ class MilvusWrapper:
         self.collection = None
         self.port = port or self._config.get("milvus_port", "19530")
         self.host = host or self._config.get("milvus_host", "standalone")
+        self.dimension = dimension
 
     def make_connection(self):
         connections.connect(host=self.host, port=self.port)
         if not utility.has_collection(self.collection_name):
-            self.collection = self.create_collection()
+            self.collection = self.create_collection(self.dimension)
         else:
             self.collection = Collection(self.collection_name)
         self.collection.load()
@@ -60,7 +61,7 @@ class MilvusWrapper:
         # Insert the vector into the collection
         record = {
             "id": id,
-            "embeddings": vector,
+            "embeddings": [float(x) for x in vector],
         }
 
         try:
@@ -70,11 +71,19 @@ class MilvusWrapper:
             return result
         except Exception as e:
             config.logger.debug(f"Milvus exception: {e}")
-    def insert_vectors(self, vectors):
+    def insert_vectors(self, vectors, ids):
+        config.logger.debug(f"Inserting {len(ids)} vectors into collection {self.collection_name}")
         if not self.connected:
             self.make_connection()
-        # Insert the vectors into the collection
-        return self.client.insert(self.collection_name, records=vectors)
+        # Insert the vectors into the collection with a single flush
+        records = [{"id": id, "embeddings": [float(x) for x in vector]} for vector, id in zip(vectors, ids)]
+
+        try:
+            result = self.collection.insert(records)
+            self.collection.flush()
+            return result
+        except Exception as e:
+            config.logger.debug(f"Milvus exception: {e}")
 
     def search_vectors(self, query_vector, top_k=10):
         if not self.connected:
@@ -26,6 +26,12 @@ class MongoWrapper:
         except Exception as e:
             print(f"Insert Exception: {e}")
 
+    def insert_interactions(self, interactions):
+        try:
+            return self.collection.insert_many(interactions)
+        except Exception as e:
+            print(f"Insert Exception: {e}")
+
     def preprocess_data(self, data_list):
         for doc in data_list:
             # Convert ObjectID to string
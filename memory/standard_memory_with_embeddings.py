@@ -1,21 +1,72 @@
 from data.milvus_wrapper import MilvusWrapper
-from models.static_openai_wrapper import StaticOpenAIModel
+from models.embedding_batcher import EmbeddingBatcher
+from models.local_embedder import HashedNgramEmbedder
+from models.openai_wrapper import OpenAIModel
 from memory.AbstractMemoryStore import AbstractMemoryStore
 from memory.standard_memory import StandardMemory
 import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_remote_embedder = None
+
+def shared_remote_embedder():
+    # One batcher for every store, so concurrent sessions' records share upstream calls
+    global _remote_embedder
+    if _remote_embedder is None:
+        _remote_embedder = EmbeddingBatcher(OpenAIModel())
+    return _remote_embedder
+
+# Embedding backends selectable by name
+EMBEDDERS = {
+    "openai": shared_remote_embedder,
+    # Local CPU embeddings, for internal recall indexes built in bulk
+    "local": HashedNgramEmbedder,
+}
 
 class StandardMemoryWithEmbeddings(AbstractMemoryStore):
-    def __init__(self, embeddings_store=None):
+    def __init__(self, embeddings_store=None, embedding_model=None):
+       """
+       embedding_model is an AbstractModel or a name from EMBEDDERS. A local
+       embedder gets its own collection, since its vectors differ in size
+       and meaning from the remote model's.
+       """
        self.memory = StandardMemory() 
-       if not embeddings_store:
-           self.embeddings_store = MilvusWrapper() 
+       if embedding_model is None or isinstance(embedding_model, str):
+           embedding_model = EMBEDDERS[embedding_model or "openai"]()
+       self.embedding_model = embedding_model
+       self.embeddings_store = embeddings_store if embeddings_store else self._default_store()
+
+    def _default_store(self):
+        dim = getattr(self.embedding_model, "dim", None)
+        if dim is None:
+            return MilvusWrapper()
+        collection = "sophia_" + self.embedding_model.embedding_model.replace("-", "_")
+        return MilvusWrapper(collection_name=collection, dimension=dim)
         
     def record(self, data):
         id = self.memory.record(data)
-        text = f"{data['input_message']}\n{data['output_message']}"
-        embedding = StaticOpenAIModel.generate_embedding(text)
+        embedding = self.embedding_model.generate_embedding(self._embedding_text(data))
         result = self.embeddings_store.insert_vector(embedding, str(id))
         return id
 
+    def record_many(self, data_list):
+        # One insert and one batched embedding call for the whole list,
+        # rather than a round trip per interaction
+        result = self.memory.data_store.insert_interactions(data_list)
+        if result is None:
+            # insert_interactions reports the database error and returns None;
+            # nothing was stored, so nothing is embedded either
+            logger.error(f"Could not record {len(data_list)} interactions; skipping their embeddings")
+            return None
+        ids = [str(id) for id in result.inserted_ids]
+        embeddings = self.embedding_model.generate_embeddings([self._embedding_text(data) for data in data_list])
+        self.embeddings_store.insert_vectors(embeddings, ids)
+        return result.inserted_ids
+
+    def _embedding_text(self, data):
+        return f"{data['input_message']}\n{data['output_message']}"
+
     def query(self, query):
         pass
@@ -4,8 +4,8 @@ from memory.standard_memory_with_embeddings import StandardMemoryWithEmbeddings
 import config
 
 class StandardMemoryWithEmbeddingsAndKG(AbstractMemoryStore):
-    def __init__(self):
-        self.memory = StandardMemoryWithEmbeddings()
+    def __init__(self, embedding_model=None):
+        self.memory = StandardMemoryWithEmbeddings(embedding_model=embedding_model)
         self.kg_memory = KGMemory()
         
     def record(self, data):
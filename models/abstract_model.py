@@ -2,29 +2,440 @@
 Provides a unified interface for interacting with different LLM models.
 """
 
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
+import numpy as np
 from abc import ABC, abstractmethod
-from models.model_response import ModelResponse
-from typing import Any
+from models.model_response import ModelResponse, ModelResponseStream
+from models.embedding_cache import EmbeddingCache
+from models.hedging import Hedger
+from models.metrics import CallRecord, track_call
+from models.rate_limiter import RateLimiter, get_rate_limiter
+from models.response_cache import ResponseCache
+from models.single_flight import get_single_flight
+from models.token_counter import estimate_message_tokens, estimate_tokens
+from typing import Any, List, Optional
 class AbstractModel(ABC):
     """
     Abstract base class for LLM model interfaces.
+
+    The public generate/stream methods apply the call policies shared by every
+    backend (response caching, single-flight coalescing of identical
+    deterministic requests, hedging, rate limiting) and delegate the actual provider call to
+    the underscored hooks, which is all a backend has to implement. Every
+    call is measured; see models.metrics.
     """
-    def __init__(self, temperature: float = 0.7, model="gpt-3.5-turbo") -> None:
+
+    # Composite models that call other AbstractModels leave metrics to them
+    records_metrics = True
+
+    def __init__(
+        self,
+        temperature: float = 0.7,
+        model="gpt-3.5-turbo",
+        response_cache: Optional[ResponseCache] = None,
+        embedding_model: str = "text-embedding-3-small",
+        embedding_cache: Optional[EmbeddingCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce: bool = True,
+        hedger: Optional[Hedger] = None,
+    ) -> None:
         """
         Initialize the model with a temperature setting.
 
         :param temperature: Controls the randomness of the model's output.
+        :param response_cache: Opt-in cache consulted before every call.
+        :param embedding_model: Default model for embedding calls.
+        :param embedding_cache: Opt-in cache consulted before every embedding call.
+        :param rate_limiter: Limiter for this instance; defaults to the
+            process-wide one from configure_rate_limiter(), if any.
+        :param coalesce: Share one upstream call between concurrent identical
+            requests when the temperature is 0.
+        :param hedger: Opt-in hedging of slow calls when the temperature is 0.
         """
         self.model = model
         self.temperature = temperature
-    @abstractmethod
-    def generate_response(self, messages, model) -> ModelResponse:
+        self.response_cache = response_cache
+        self.embedding_model = embedding_model
+        self.embedding_cache = embedding_cache
+        self.rate_limiter = rate_limiter
+        self.coalesce = coalesce
+        self.hedger = hedger
+
+    def request_key(self, messages) -> str:
+        """
+        Content address of a request: a hash of (model, temperature, messages).
+
+        :param messages: The conversation the request would send.
+        :return: A hex digest identifying the request.
+        """
+        payload = json.dumps([self.model, self.temperature, messages], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generate_response(self, messages) -> ModelResponse:
         """
         Generate text based on the provided prompt.
 
-        :param prompt: The input text to generate a response for.
-        :param kwargs: Additional parameters for text generation.
-        :return: Generated text as a string.
+        :param messages: The conversation to generate a response for.
+        :return: The model's response, with a metrics block in its metadata.
+        """
+        if not self.records_metrics:
+            return self._generate(messages)
+        with track_call(self.model, "generate") as call:
+            response = self._generate(messages)
+        return self._measured(call, messages, response)
+
+    async def agenerate_response(self, messages) -> ModelResponse:
+        """
+        Coroutine version of generate_response.
+
+        :param messages: The conversation to generate a response for.
+        :return: The model's response, with a metrics block in its metadata.
+        """
+        if not self.records_metrics:
+            return await self._agenerate(messages)
+        with track_call(self.model, "generate") as call:
+            response = await self._agenerate(messages)
+        return self._measured(call, messages, response)
+
+    def stream_response(self, messages) -> ModelResponseStream:
+        """
+        Generate a response as a stream of text deltas.
+
+        :param messages: The conversation to generate a response for.
+        :return: A stream whose `response` holds the assembled ModelResponse once drained.
+        """
+        if not self.records_metrics:
+            return self._stream(messages)
+        with track_call(self.model, "stream") as call:  # records a failure to open the stream
+            stream = self._stream(messages)
+        return self._tracked_stream(call, messages, stream)
+
+    def _tracked_stream(self, call: CallRecord, messages, stream: ModelResponseStream) -> ModelResponseStream:
+        """
+        Measure a stream when its consumer is done with it.
+
+        A drained stream is measured like a generated response. One that
+        fails part-way is recorded with the exception's type, and one that is
+        closed, or dropped before it was drained, as "abandoned".
+        """
+        settled = threading.Lock()
+
+        def failed(error: str) -> None:
+            if settled.acquire(blocking=False):
+                call.finish(error=error)
+
+        def deltas():
+            try:
+                yield from stream
+            except Exception as e:
+                failed(type(e).__name__)
+                raise
+            except GeneratorExit:
+                failed("abandoned")
+                stream.close()
+                raise
+
+        def finalize(_output: str) -> ModelResponse:
+            response = stream.response
+            if settled.acquire(blocking=False):
+                first = stream.first_delta_at
+                self._measured(call, messages, response, ttfb=first - call.started if first else None)
+            return response
+
+        tracked = ModelResponseStream(deltas(), finalize=finalize)
+        weakref.finalize(tracked, failed, "abandoned")
+        return tracked
+
+    # Response caching and single-flight coalescing
+
+    def _generate(self, messages) -> ModelResponse:
+        if self.response_cache is None and not self._coalesces():
+            return self._call_generate(messages)
+        key = self.request_key(messages)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        if not self._coalesces():
+            return self._fetch(messages, key)
+        response, shared = get_single_flight().do(self._flight_key(key), lambda: self._fetch(messages, key))
+        return _mark_coalesced(response) if shared else response
+
+    async def _agenerate(self, messages) -> ModelResponse:
+        if self.response_cache is None and not self._coalesces():
+            return await self._acall_generate(messages)
+        key = self.request_key(messages)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        if not self._coalesces():
+            return await self._afetch(messages, key)
+        response, shared = await get_single_flight().ado(self._flight_key(key), lambda: self._afetch(messages, key))
+        return _mark_coalesced(response) if shared else response
+
+    def _stream(self, messages) -> ModelResponseStream:
+        if self.response_cache is None:
+            return self._call_stream(messages)
+        key = self.request_key(messages)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return ModelResponseStream([cached.output], finalize=lambda _output: cached)
+        stream = self._call_stream(messages)
+        stream.add_done_callback(lambda response: self.response_cache.put(key, response))
+        return stream
+
+    def _coalesces(self) -> bool:
+        # Only deterministic requests are interchangeable
+        return self.coalesce and self.temperature == 0
+
+    def _flight_key(self, key: str) -> str:
+        return f"{type(self).__qualname__}:{key}"
+
+    def _cached(self, key: str) -> Optional[ModelResponse]:
+        return self.response_cache.get(key) if self.response_cache is not None else None
+
+    def _fetch(self, messages, key: str) -> ModelResponse:
+        response = self._call_generate(messages)
+        if self.response_cache is not None:
+            self.response_cache.put(key, response)
+        return response
+
+    async def _afetch(self, messages, key: str) -> ModelResponse:
+        response = await self._acall_generate(messages)
+        if self.response_cache is not None:
+            self.response_cache.put(key, response)
+        return response
+
+    def _measured(self, call: CallRecord, messages, response: ModelResponse,
+                  ttfb: Optional[float] = None) -> ModelResponse:
+        usage = response.usage
+        if usage is not None:
+            input_tokens, output_tokens = usage.input_tokens, usage.output_tokens
+        else:
+            input_tokens = estimate_message_tokens(messages, self.model)
+            output_tokens = estimate_tokens(str(response.output or ""), self.model)
+        metadata = response.metadata
+        metadata["metrics"] = call.finish(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            usage_estimated=usage is None,
+            ttfb=ttfb,
+            cached=metadata.get("cached", False),
+            coalesced=metadata.get("coalesced", False),
+            finish_reason=response.finish_reason,
+        )
+        return response
+
+    # Backend calls, hedged and rate limited when configured
+
+    def _limiter(self) -> Optional[RateLimiter]:
+        return self.rate_limiter if self.rate_limiter is not None else get_rate_limiter()
+
+    def _call_generate(self, messages) -> ModelResponse:
+        started = time.monotonic()
+        if self._hedges():
+            # The limiter admits the call once; the hedger then times only
+            # the backend, so queueing for the limiter never triggers a hedge
+            generate = lambda: self.hedger.call(self.model, lambda: self._generate_response(messages))
+        else:
+            generate = lambda: self._generate_response(messages)
+        return _timed(self._limited_generate(generate, messages), started)
+
+    async def _acall_generate(self, messages) -> ModelResponse:
+        started = time.monotonic()
+        if self._hedges():
+            generate = lambda: self.hedger.acall(self.model, lambda: self._agenerate_response(messages))
+        else:
+            generate = lambda: self._agenerate_response(messages)
+        return _timed(await self._alimited_generate(generate, messages), started)
+
+    def _hedges(self) -> bool:
+        # A hedge duplicates the request, so both answers must be acceptable
+        return self.hedger is not None and self.temperature == 0
+
+    def _limited_generate(self, generate, messages) -> ModelResponse:
+        limiter = self._limiter()
+        if limiter is None:
+            return generate()
+        return limiter.call(generate, estimate_message_tokens(messages, self.model), usage_of=_total_tokens)
+
+    async def _alimited_generate(self, generate, messages) -> ModelResponse:
+        limiter = self._limiter()
+        if limiter is None:
+            return await generate()
+        return await limiter.acall(generate, estimate_message_tokens(messages, self.model), usage_of=_total_tokens)
+
+    def _call_stream(self, messages) -> ModelResponseStream:
+        limiter = self._limiter()
+        if limiter is not None:
+            limiter.wait_for_capacity(estimate_message_tokens(messages, self.model))
+        return self._stream_response(messages)
+
+    def _call_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        limiter = self._limiter()
+        if limiter is None:
+            return self._generate_embeddings(texts, model)
+        return limiter.call(
+            lambda: self._generate_embeddings(texts, model),
+            sum(estimate_tokens(text, model) for text in texts),
+        )
+
+    async def _acall_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        limiter = self._limiter()
+        if limiter is None:
+            return await self._agenerate_embeddings(texts, model)
+        return await limiter.acall(
+            lambda: self._agenerate_embeddings(texts, model),
+            sum(estimate_tokens(text, model) for text in texts),
+        )
+
+    @abstractmethod
+    def _generate_response(self, messages) -> ModelResponse:
+        """
+        Call the backend for a single response.
+
+        :param messages: The conversation to generate a response for.
+        :return: The model's response.
         """
         pass
 
+    async def _agenerate_response(self, messages) -> ModelResponse:
+        """
+        Call the backend from a coroutine.
+
+        The default runs the blocking call in the event loop's executor so that
+        backends without a native async client can still be awaited.
+        """
+        return await asyncio.to_thread(self._generate_response, messages)
+
+    def _stream_response(self, messages) -> ModelResponseStream:
+        """
+        Call the backend for a streamed response.
+
+        The default yields the complete output of _generate_response as a single
+        delta; backends that support incremental output should override it.
+        """
+        response = self._generate_response(messages)
+        return ModelResponseStream([response.output], finalize=lambda _output: response)
+
+    def generate_embedding(self, text: str, model: Optional[str] = None) -> np.ndarray:
+        """
+        Generate an embedding vector for the given text.
+
+        :param text: The text to embed.
+        :param model: Embedding model to use instead of the default.
+        :return: The embedding as a float32 vector.
+        """
+        return self.generate_embeddings([text], model)[0]
+
+    async def agenerate_embedding(self, text: str, model: Optional[str] = None) -> np.ndarray:
+        """
+        Coroutine version of generate_embedding.
+
+        :param text: The text to embed.
+        :param model: Embedding model to use instead of the default.
+        :return: The embedding as a float32 vector.
+        """
+        return (await self.agenerate_embeddings([text], model))[0]
+
+    def generate_embeddings(self, texts: List[str], model: Optional[str] = None) -> np.ndarray:
+        """
+        Generate embeddings for many texts.
+
+        :param texts: The texts to embed.
+        :param model: Embedding model to use instead of the default.
+        :return: A float32 matrix with one row per text, in input order.
+        """
+        model = model or self.embedding_model
+        if not self.records_metrics:
+            return self._embed(texts, model)
+        with track_call(model, "embed") as call:
+            matrix = self._embed(texts, model)
+        call.finish(input_tokens=sum(estimate_tokens(text, model) for text in texts), usage_estimated=True)
+        return matrix
+
+    async def agenerate_embeddings(self, texts: List[str], model: Optional[str] = None) -> np.ndarray:
+        """
+        Coroutine version of generate_embeddings.
+
+        :param texts: The texts to embed.
+        :param model: Embedding model to use instead of the default.
+        :return: A float32 matrix with one row per text, in input order.
+        """
+        model = model or self.embedding_model
+        if not self.records_metrics:
+            return await self._aembed(texts, model)
+        with track_call(model, "embed") as call:
+            matrix = await self._aembed(texts, model)
+        call.finish(input_tokens=sum(estimate_tokens(text, model) for text in texts), usage_estimated=True)
+        return matrix
+
+    def _embed(self, texts: List[str], model: str) -> np.ndarray:
+        if self.embedding_cache is None:
+            return self._call_embeddings(texts, model)
+        matrix, hits = self.embedding_cache.get_many(model, texts)
+        missing = np.flatnonzero(~hits)
+        if len(missing):
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._call_embeddings(missing_texts, model)
+            self.embedding_cache.put_many(model, missing_texts, fresh)
+            matrix = self._merge_embeddings(matrix, len(texts), missing, fresh)
+        return matrix
+
+    async def _aembed(self, texts: List[str], model: str) -> np.ndarray:
+        if self.embedding_cache is None:
+            return await self._acall_embeddings(texts, model)
+        matrix, hits = self.embedding_cache.get_many(model, texts)
+        missing = np.flatnonzero(~hits)
+        if len(missing):
+            missing_texts = [texts[i] for i in missing]
+            fresh = await self._acall_embeddings(missing_texts, model)
+            self.embedding_cache.put_many(model, missing_texts, fresh)
+            matrix = self._merge_embeddings(matrix, len(texts), missing, fresh)
+        return matrix
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        """
+        Call the backend for a batch of embeddings.
+
+        :param texts: The texts to embed.
+        :param model: The embedding model to use.
+        :return: A float32 matrix with one row per text, in input order.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support embeddings")
+
+    async def _agenerate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        """
+        Call the backend for a batch of embeddings from a coroutine.
+
+        The default runs the blocking call in the event loop's executor.
+        """
+        return await asyncio.to_thread(self._generate_embeddings, texts, model)
+
+    @staticmethod
+    def _merge_embeddings(cached: Optional[np.ndarray], count: int, missing: np.ndarray, fresh: np.ndarray) -> np.ndarray:
+        if cached is None:
+            cached = np.empty((count, fresh.shape[1]), dtype=np.float32)
+        cached[missing] = fresh
+        return cached
+
+
+def _timed(response: ModelResponse, started: float) -> ModelResponse:
+    if response.latency is None:
+        response.latency = time.monotonic() - started
+    return response
+
+
+def _total_tokens(response: ModelResponse) -> Optional[int]:
+    return response.usage.total_tokens if response.usage else None
+
+
+def _mark_coalesced(response: ModelResponse) -> ModelResponse:
+    # Followers get their own copy so per-caller metadata stays separate
+    response = response.copy()
+    response.metadata["coalesced"] = True
+    return response
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Offline batch jobs: run a JSONL file of model requests and write the results as JSONL.
+
+Each input line is one request:
+
+    {"custom_id": "turn-17", "messages": [{"role": "user", "content": "..."}]}
+
+(OpenAI batch-file lines, with the messages under "body", are read as well),
+or a record that a --task turns into a request, e.g. for --task feedback:
+
+    {"custom_id": "turn-17", "query": "...", "response": "...", "conversation_history": "..."}
+
+Each output line holds custom_id, output, usage, finish_reason and error.
+
+Results are appended and flushed as they finish, and the output file is the
+checkpoint: a killed job, started again with the same arguments, skips every
+request that succeeded in it and retries the ones that failed. Upload-style backends also record the batch jobs they
+submitted in a state file next to the output, so a restart polls those jobs
+instead of submitting them again.
+
+Backends:
+
+    ModelBackend        runs the requests through an AbstractModel with bounded concurrency
+    OpenAIBatchBackend  uploads them to the OpenAI Batch API and polls for the results
+    LocalBatchBackend   a local stand-in for an upload backend, for tests and dry runs
+
+    python -m models.batch_runner requests.jsonl results.jsonl --task summary --concurrency 16
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse
+from prompts.prompts import FEEDBACK_AGENT_PROMPT, KG_PROMPT, SUMMARY_PROMPT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    messages: List[dict]
+
+
+Emit = Callable[[Dict[str, Any]], None]
+
+
+def _feedback(record: dict) -> List[dict]:
+    # The prompt FeedbackDaemon.evaluate_completion sends
+    prompt = FEEDBACK_AGENT_PROMPT.format(
+        query=record["query"], response=record["response"],
+        conversation_history=record.get("conversation_history", ""))
+    return [{"role": "system", "content": prompt}]
+
+
+def _summary(record: dict) -> List[dict]:
+    return list(record["messages"]) + [{"role": "system", "content": SUMMARY_PROMPT}]
+
+
+def _cypher(record: dict) -> List[dict]:
+    # The final prompt of TextToCypherDaemon.generate_cypher
+    prompt = KG_PROMPT.format(user_input=record["text"], existing_data=record.get("existing_data", ""))
+    return [{"role": "system", "content": prompt}]
+
+
+# Builders that turn an input record into the messages of a request
+TASKS: Dict[str, Callable[[dict], List[dict]]] = {
+    "feedback": _feedback,
+    "summary": _summary,
+    "cypher": _cypher,
+}
+
+
+def read_requests(path: str, task: Optional[str] = None) -> Iterator[BatchRequest]:
+    """
+    Read the requests of a JSONL file.
+
+    :param path: The input file.
+    :param task: Name of a TASKS builder for the records, or None if they hold messages.
+    """
+    build = TASKS[task] if task else None
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = str(record.get("custom_id", f"line-{number}"))
+            if build is not None:
+                messages = build(record)
+            else:
+                body = record.get("body", record)
+                messages = body.get("messages") or body.get("input")
+            if not messages:
+                raise ValueError(f"{path}:{number} has no messages")
+            yield BatchRequest(custom_id, messages)
+
+
+def result_record(custom_id: str, response: Optional[ModelResponse] = None,
+                  error: Optional[str] = None) -> Dict[str, Any]:
+    """An output line for a finished request."""
+    usage = response.usage if response is not None else None
+    return {
+        "custom_id": custom_id,
+        "output": response.output if response is not None else None,
+        "usage": {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens} if usage else None,
+        "finish_reason": response.finish_reason if response is not None else None,
+        "error": error,
+    }
+
+
+class Checkpoint:
+    """
+    Backend state kept in a JSON file and replaced atomically on every save.
+    With no path it is kept in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.data: Dict[str, Any] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(temporary, self.path)
+
+
+class BatchBackend(ABC):
+    """Runs a batch of requests and reports each result as it arrives."""
+
+    @abstractmethod
+    def run(self, requests: List[BatchRequest], emit: Emit, checkpoint: Checkpoint) -> None:
+        """
+        Run the requests.
+
+        :param requests: The requests not finished by an earlier run.
+        :param emit: Called with the output record of every finished request.
+        :param checkpoint: Backend state that survives a restart; call save() after changing it.
+        """
+        pass
+
+
+class ModelBackend(BatchBackend):
+    """Runs the requests through a model, a bounded number at a time."""
+
+    def __init__(self, model: AbstractModel, concurrency: int = 8):
+        self.model = model
+        self.concurrency = concurrency
+
+    def run(self, requests: List[BatchRequest], emit: Emit, checkpoint: Checkpoint) -> None:
+        asyncio.run(self._arun(requests, emit))
+
+    async def _arun(self, requests: List[BatchRequest], emit: Emit) -> None:
+        # asyncio.run gives every run an event loop of its own, so it needs its own client too
+        async with _async_client_scope():
+            await self._arun_all(requests, emit)
+
+    async def _arun_all(self, requests: List[BatchRequest], emit: Emit) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def one(request: BatchRequest) -> None:
+            async with slots:
+                try:
+                    response = await self.model.agenerate_response(request.messages)
+                except Exception as e:
+                    emit(result_record(request.custom_id, error=f"{type(e).__name__}: {e}"))
+                    return
+            emit(result_record(request.custom_id, response))
+
+        await asyncio.gather(*(one(request) for request in requests))
+
+
+def _async_client_scope():
+    try:
+        from models.client_registry import async_client_scope
+    except ImportError:  # without the OpenAI SDK no model uses the shared clients
+        return contextlib.nullcontext()
+    return async_client_scope()
+
+
+class UploadBatchBackend(BatchBackend):
+    """
+    Base for services that take a whole file of requests and return the results later.
+
+    Submitted jobs are recorded in the checkpoint, so after a restart they are
+    polled rather than submitted again.
+    """
+
+    def __init__(self, max_requests: int = 50_000, poll_interval: float = 30.0):
+        """
+        :param max_requests: Most requests per submitted job.
+        :param poll_interval: Seconds between polls of unfinished jobs.
+        """
+        self.max_requests = max_requests
+        self.poll_interval = poll_interval
+
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Upload requests as one job and return its id."""
+        pass
+
+    @abstractmethod
+    def fetch(self, job_id: str, custom_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """The output records of a finished job, or None while it is still running."""
+        pass
+
+    def run(self, requests: List[BatchRequest], emit: Emit, checkpoint: Checkpoint) -> None:
+        jobs: Dict[str, List[str]] = checkpoint.data.setdefault("jobs", {})
+        submitted = {custom_id for custom_ids in jobs.values() for custom_id in custom_ids}
+        fresh = [request for request in requests if request.custom_id not in submitted]
+        for start in range(0, len(fresh), self.max_requests):
+            chunk = fresh[start:start + self.max_requests]
+            job_id = self.submit(chunk)
+            jobs[job_id] = [request.custom_id for request in chunk]
+            checkpoint.save()
+            logger.info(f"Submitted batch job {job_id} with {len(chunk)} requests")
+
+        while jobs:
+            for job_id in list(jobs):
+                results = self.fetch(job_id, jobs[job_id])
+                if results is None:
+                    continue
+                for record in results:
+                    emit(record)
+                del jobs[job_id]
+                checkpoint.save()
+            if jobs:
+                time.sleep(self.poll_interval)
+
+
+class LocalBatchBackend(UploadBatchBackend):
+    """
+    An upload backend that runs its jobs with a local model.
+
+    Job files live in a directory, as they would on a remote service; a job
+    whose worker died with an earlier process is started again when polled.
+    """
+
+    def __init__(self, model: AbstractModel, directory: str, concurrency: int = 8, **kwargs):
+        kwargs.setdefault("poll_interval", 0.05)
+        super().__init__(**kwargs)
+        self.model = model
+        self.directory = directory
+        self.concurrency = concurrency
+        self._workers: Dict[str, threading.Thread] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        job_id = f"local-{uuid.uuid4().hex}"
+        with open(self._path(job_id, "input"), "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps({"custom_id": request.custom_id, "messages": request.messages}) + "\n")
+        self._start(job_id)
+        return job_id
+
+    def fetch(self, job_id: str, custom_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        output = self._path(job_id, "output")
+        if os.path.exists(output):
+            with open(output, encoding="utf-8") as f:
+                return [json.loads(line) for line in f]
+        worker = self._workers.get(job_id)
+        if worker is None or not worker.is_alive():
+            self._start(job_id)
+        return None
+
+    def _start(self, job_id: str) -> None:
+        worker = threading.Thread(target=self._work, args=(job_id,), name=f"batch-{job_id}", daemon=True)
+        self._workers[job_id] = worker
+        worker.start()
+
+    def _work(self, job_id: str) -> None:
+        records = []
+        ModelBackend(self.model, self.concurrency).run(
+            list(read_requests(self._path(job_id, "input"))), records.append, Checkpoint())
+        temporary = f"{self._path(job_id, 'output')}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(temporary, self._path(job_id, "output"))
+
+    def _path(self, job_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{kind}.jsonl")
+
+
+class OpenAIBatchBackend(UploadBatchBackend):
+    """Runs the requests through the OpenAI Batch API (Responses endpoint)."""
+
+    def __init__(self, model: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                 completion_window: str = "24h", **kwargs):
+        super().__init__(**kwargs)
+        self.model = model
+        self.temperature = temperature
+        self.completion_window = completion_window
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        from models.client_registry import get_client
+        lines = [json.dumps({
+            "custom_id": request.custom_id,
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": {"model": self.model, "input": request.messages, "temperature": self.temperature},
+        }) for request in requests]
+        client = get_client()
+        uploaded = client.files.create(file=("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+                                       purpose="batch")
+        batch = client.batches.create(input_file_id=uploaded.id, endpoint="/v1/responses",
+                                      completion_window=self.completion_window)
+        return batch.id
+
+    def fetch(self, job_id: str, custom_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        from openai.types.responses import Response
+        from models.client_registry import get_client
+        from models.model_response import Usage
+        client = get_client()
+        batch = client.batches.retrieve(job_id)
+        if batch.status not in ("completed", "failed", "expired", "cancelled"):
+            return None
+        records = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                body = (item.get("response") or {}).get("body")
+                if item.get("error") or not body or body.get("error"):
+                    error = item.get("error") or (body or {}).get("error") or "no response"
+                    records[item["custom_id"]] = result_record(item["custom_id"], error=json.dumps(error))
+                    continue
+                response_obj = Response.model_validate(body)
+                usage = response_obj.usage
+                details = response_obj.incomplete_details
+                records[item["custom_id"]] = result_record(item["custom_id"], ModelResponse(
+                    output=response_obj.output_text,
+                    usage=Usage(usage.input_tokens, usage.output_tokens) if usage else None,
+                    finish_reason=details.reason if details else response_obj.status,
+                ))
+        # Requests the service never answered (the job expired or failed) are reported as errors
+        for custom_id in custom_ids:
+            records.setdefault(custom_id, result_record(custom_id, error=f"batch {batch.status}"))
+        return list(records.values())
+
+
+class BatchRunner:
+    """Runs a JSONL file of requests through a backend, resuming from its output file."""
+
+    def __init__(self, backend: BatchBackend, output_path: str, state_path: Optional[str] = None):
+        """
+        :param backend: Where the requests run.
+        :param output_path: Results file; also the record of which requests succeeded.
+        :param state_path: Backend checkpoint file (defaults to output_path + ".state.json").
+        """
+        self.backend = backend
+        self.output_path = output_path
+        self.state_path = state_path or f"{output_path}.state.json"
+
+    def completed(self) -> set:
+        """
+        custom_ids that succeeded in the output file.
+
+        Failed requests, and a line cut short by a kill, are dropped from the
+        file so that they run again.
+        """
+        done = set()
+        if not os.path.exists(self.output_path):
+            return done
+        kept = []
+        changed = False
+        with open(self.output_path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    custom_id = record["custom_id"]
+                except (ValueError, KeyError):
+                    changed = True
+                    break
+                if record.get("error"):
+                    changed = True
+                    continue
+                done.add(custom_id)
+                kept.append(line)
+        if changed:
+            temporary = f"{self.output_path}.tmp"
+            with open(temporary, "wb") as f:
+                f.writelines(kept)
+            os.replace(temporary, self.output_path)
+        return done
+
+    def run(self, requests: Iterable[BatchRequest]) -> Dict[str, int]:
+        """
+        Run every request that has not succeeded in the output file.
+
+        :return: Counts of skipped, succeeded and failed requests.
+        """
+        done = self.completed()
+        counts = {"skipped": 0, "succeeded": 0, "failed": 0}
+        pending = []
+        for request in requests:
+            if request.custom_id in done:
+                counts["skipped"] += 1
+                continue
+            pending.append(request)
+            done.add(request.custom_id)  # duplicates in the input run once
+        written = set()
+        lock = threading.Lock()
+
+        with open(self.output_path, "a", encoding="utf-8") as out:
+            def emit(record: Dict[str, Any]) -> None:
+                with lock:
+                    if record["custom_id"] in written:
+                        return
+                    written.add(record["custom_id"])
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    counts["failed" if record.get("error") else "succeeded"] += 1
+
+            if pending:
+                self.backend.run(pending, emit, Checkpoint(self.state_path))
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)  # every job has been collected
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of model requests")
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("output", help="JSONL file for the results; rerun to resume")
+    parser.add_argument("--task", choices=sorted(TASKS), help="Build requests from records of this kind")
+    parser.add_argument("--backend", choices=["model", "openai-batch", "local-batch"], default="model")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.backend == "openai-batch":
+        backend = OpenAIBatchBackend(args.model, args.temperature, poll_interval=args.poll_interval)
+    else:
+        from models.openai_wrapper import OpenAIModel
+        model = OpenAIModel(model=args.model, temperature=args.temperature)
+        if args.backend == "local-batch":
+            backend = LocalBatchBackend(model, f"{args.output}.jobs", args.concurrency)
+        else:
+            backend = ModelBackend(model, args.concurrency)
+
+    counts = BatchRunner(backend, args.output).run(read_requests(args.input, args.task))
+    print(f"{counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} already done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Process-wide registry of pooled API clients.
+
+Every model instance gets its clients from here instead of building its own,
+so a burst of agent steps reuses warm keep-alive (and, where the `h2` package
+is installed, HTTP/2) connections rather than paying a new TLS handshake per
+call. Pool size, keep-alive and timeouts are set once with configure_clients().
+
+Calls that go through a RateLimiter should use the clients returned with
+retries=False: the limiter already retries 429s and 5xx with backoff, and SDK
+retries underneath it would multiply attempts and hide the 429s its adaptive
+concurrency limit backs off on. Those clients share the same connection pool.
+
+The shared async client belongs to one event loop. Code that runs an event
+loop of its own (asyncio.run in a worker thread, say) wraps it in
+async_client_scope(), so its calls get a client of their own.
+"""
+
+import contextlib
+import contextvars
+import importlib.util
+import threading
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import httpx
+import openai
+
+
+@dataclass(frozen=True)
+class ClientSettings:
+    """Connection pool and timeout settings shared by all clients."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0  # seconds an idle connection is kept open
+    timeout: float = 60.0  # default per-call timeout, in seconds
+    connect_timeout: float = 5.0
+    http2: Optional[bool] = None  # None: use HTTP/2 when `h2` is installed
+    max_retries: int = 2
+    api_key: Optional[str] = None  # None: read OPENAI_API_KEY
+    base_url: Optional[str] = None
+
+    def use_http2(self) -> bool:
+        if self.http2 is not None:
+            return self.http2
+        return importlib.util.find_spec("h2") is not None
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+_lock = threading.Lock()
+_settings = ClientSettings()
+_client: Optional[openai.OpenAI] = None
+_async_client: Optional[openai.AsyncOpenAI] = None
+_no_retry_client: Optional[openai.OpenAI] = None
+_no_retry_async_client: Optional[openai.AsyncOpenAI] = None
+# Async clients of the innermost async_client_scope(), by `retries`
+_scoped_async_clients: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "scoped_async_clients", default=None)
+
+
+def configure_clients(**overrides) -> ClientSettings:
+    """
+    Change the shared client settings.
+
+    Clients created under the old settings are closed; the next call to
+    get_client()/get_async_client() builds new ones.
+
+    Args:
+        overrides: ClientSettings fields to change
+
+    Returns:
+        The settings now in effect
+    """
+    global _settings
+    with _lock:
+        _settings = replace(_settings, **overrides)
+    reset_clients()
+    return _settings
+
+
+def get_settings() -> ClientSettings:
+    return _settings
+
+
+def get_client(retries: bool = True) -> openai.OpenAI:
+    """
+    Return the shared blocking client, creating it on first use.
+
+    Args:
+        retries: False for a client on the same pool that never retries,
+            for calls a RateLimiter retries itself
+    """
+    global _client, _no_retry_client
+    with _lock:
+        if _client is None:
+            _client = openai.OpenAI(
+                api_key=_settings.api_key,
+                base_url=_settings.base_url,
+                timeout=_settings.timeouts(),
+                max_retries=_settings.max_retries,
+                http_client=openai.DefaultHttpxClient(
+                    limits=_settings.limits(),
+                    http2=_settings.use_http2(),
+                    timeout=_settings.timeouts(),
+                ),
+            )
+        if retries:
+            return _client
+        if _no_retry_client is None:
+            _no_retry_client = _client.with_options(max_retries=0)
+        return _no_retry_client
+
+
+def get_async_client(retries: bool = True) -> openai.AsyncOpenAI:
+    """
+    Return the shared async client, or the one of the enclosing
+    async_client_scope(), creating it on first use.
+
+    The async pool belongs to the event loop that first uses it, so a process
+    should drive all async model calls from one loop, or give other loops
+    their own client with async_client_scope().
+
+    Args:
+        retries: False for a client on the same pool that never retries,
+            for calls a RateLimiter retries itself
+    """
+    global _async_client, _no_retry_async_client
+    scoped = _scoped_async_clients.get()
+    with _lock:
+        if scoped is not None:
+            if True not in scoped:
+                scoped[True] = _new_async_client()
+            if not retries and False not in scoped:
+                scoped[False] = scoped[True].with_options(max_retries=0)
+            return scoped[retries]
+        if _async_client is None:
+            _async_client = _new_async_client()
+        if retries:
+            return _async_client
+        if _no_retry_async_client is None:
+            _no_retry_async_client = _async_client.with_options(max_retries=0)
+        return _no_retry_async_client
+
+
+@contextlib.asynccontextmanager
+async def async_client_scope():
+    """
+    Give the async calls made inside the block an async client of their own.
+
+    The client is built on first use, from the current settings, and closed
+    when the block exits. Tasks started inside the block inherit it.
+    """
+    clients: dict = {}
+    token = _scoped_async_clients.set(clients)
+    try:
+        yield
+    finally:
+        _scoped_async_clients.reset(token)
+        if True in clients:
+            await clients[True].close()  # the no-retry copy shares its pool
+
+
+def _new_async_client() -> openai.AsyncOpenAI:
+    return openai.AsyncOpenAI(
+        api_key=_settings.api_key,
+        base_url=_settings.base_url,
+        timeout=_settings.timeouts(),
+        max_retries=_settings.max_retries,
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=_settings.limits(),
+            http2=_settings.use_http2(),
+            timeout=_settings.timeouts(),
+        ),
+    )
+
+
+def reset_clients() -> None:
+    """Close the blocking client and forget all shared clients."""
+    global _client, _async_client, _no_retry_client, _no_retry_async_client
+    with _lock:
+        client, _client = _client, None
+        _no_retry_client = None
+        _no_retry_async_client = None
+        # The async client can only be closed from its own event loop; dropping
+        # the reference lets its pool be collected.
+        _async_client = None
+    if client is not None:
+        client.close()
@@ -0,0 +1,187 @@
+"""
+Micro-batching of concurrent embedding requests.
+
+An EmbeddingBatcher wraps an AbstractModel. Embedding requests that arrive
+within max_delay of each other (or until max_batch texts have queued) are
+merged into one upstream generate_embeddings call, and each caller gets its
+rows back through a future. Callers pay at most max_delay of extra latency;
+in exchange, many one-text requests from concurrent sessions become a few
+batched ones, which cuts request count and rate-limit pressure.
+
+Requests of max_batch texts or more are already batches and go straight
+through, as do empty ones. Text generation is passed to the wrapped model
+unchanged.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse, ModelResponseStream
+
+
+class _Request:
+    __slots__ = ("texts", "model", "future", "arrived")
+
+    def __init__(self, texts: List[str], model: str):
+        self.texts = texts
+        self.model = model
+        self.future: Future = Future()
+        self.arrived = time.monotonic()
+
+
+_STOP = object()
+
+
+class EmbeddingBatcher(AbstractModel):
+    """
+    An AbstractModel that merges concurrent embedding calls into batches.
+    """
+
+    records_metrics = False  # the batched upstream call is measured
+
+    def __init__(self, model: AbstractModel, max_batch: int = 64, max_delay: float = 0.005,
+                 max_in_flight: int = 4):
+        """
+        Initialize the batcher.
+
+        :param model: The model that makes the batched calls.
+        :param max_batch: Texts that close a batch early.
+        :param max_delay: Longest a request waits for others to join it, in seconds.
+        :param max_in_flight: Batched upstream calls allowed at once.
+        """
+        super().__init__(temperature=model.temperature, model=model.model,
+                         embedding_model=model.embedding_model, coalesce=False)
+        self.inner = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._calls = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed-batch")
+        self._dispatcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, texts: List[str], model: Optional[str] = None) -> Future:
+        """
+        Queue texts for the next batch.
+
+        :param texts: The texts to embed.
+        :param model: Embedding model to use instead of the default.
+        :return: A future for the float32 matrix of the texts' embeddings.
+        """
+        request = _Request(list(texts), model or self.embedding_model)
+        with self._lock:
+            self.requests += 1
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._run, name="embed-dispatcher", daemon=True)
+                self._dispatcher.start()
+        self._queue.put(request)
+        return request.future
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests received, upstream batches sent and the mean batch size."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            }
+
+    def close(self) -> None:
+        """Stop the dispatcher once the queued requests are sent."""
+        with self._lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is not None:
+            self._queue.put(_STOP)
+            dispatcher.join()
+        self._calls.shutdown(wait=True)
+
+    def _limiter(self):
+        return None  # the wrapped model limits its own calls
+
+    def _generate_response(self, messages) -> ModelResponse:
+        return self.inner.generate_response(messages)
+
+    async def _agenerate_response(self, messages) -> ModelResponse:
+        return await self.inner.agenerate_response(messages)
+
+    def _stream_response(self, messages) -> ModelResponseStream:
+        return self.inner.stream_response(messages)
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        if not texts or len(texts) >= self.max_batch:
+            return self.inner.generate_embeddings(texts, model)
+        return self.submit(texts, model).result()
+
+    async def _agenerate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        if not texts or len(texts) >= self.max_batch:
+            return await self.inner.agenerate_embeddings(texts, model)
+        return await asyncio.wrap_future(self.submit(texts, model))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            size = len(first.texts)
+            deadline = first.arrived + self.max_delay
+            stopping = False
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._dispatch(batch)
+            if stopping:
+                return
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        by_model: Dict[str, List[_Request]] = {}
+        for request in batch:
+            by_model.setdefault(request.model, []).append(request)
+        for model, requests in by_model.items():
+            self._calls.submit(self._call, model, requests)
+
+    def _call(self, model: str, requests: List[_Request]) -> None:
+        # A cancelled caller (e.g. a timed-out coroutine) has no one to resolve for;
+        # the rest can no longer be cancelled, so resolving them cannot fail
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+        # Each distinct text is embedded once per batch
+        unique: Dict[str, int] = {}
+        for request in requests:
+            for text in request.texts:
+                unique.setdefault(text, len(unique))
+        try:
+            matrix = self.inner.generate_embeddings(list(unique), model)
+        except Exception as e:
+            self.logger.warning(f"Batched embedding call for {len(requests)} requests failed: {e}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.texts += len(unique)
+        for request in requests:
+            request.future.set_result(matrix[[unique[text] for text in request.texts]])
@@ -0,0 +1,223 @@
+"""
+Persistent embedding cache backed by memory-mapped files.
+
+Keys live in a growable array of 32-byte digests (`keys.bin`) and vectors in
+a parallel float32 matrix per embedding dimension (`vectors.<dim>.f32`), all
+opened with np.memmap so a restart maps millions of cached vectors without
+reading or parsing them. Only the key digests are scanned on open to rebuild
+the in-memory index. Each model's dimension is recorded on its first put, so
+models of different sizes can share one cache; a slot's row is only ever
+written in its own model's matrix, and the other matrices stay sparse on disk.
+
+A key is sha256(model, sha256(text)). Once the cache holds max_entries
+vectors, new entries replace old ones using the CLOCK (second chance)
+policy: slots that were hit since the hand last passed them are kept.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+KEY_BYTES = 32
+
+
+class EmbeddingCache:
+    """
+    A size-bounded on-disk cache of embedding vectors.
+
+    A single instance is safe to share between model instances and threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, initial_capacity: int = 1024):
+        """
+        Open (or create) a cache directory.
+
+        :param path: Directory holding the cache files.
+        :param max_entries: Maximum number of vectors kept.
+        :param initial_capacity: Rows allocated when the cache is created.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta = self._read_meta()
+        self.dims: Dict[str, int] = meta.get("dims", {})
+        self._capacity: int = meta.get("capacity", min(initial_capacity, max_entries))
+        self._size: int = meta.get("size", 0)
+        self._hand: int = meta.get("hand", 0)
+
+        self._keys = self._map(self._keys_path, np.uint8, (self._capacity, KEY_BYTES))
+        self._vectors: Dict[int, np.memmap] = {
+            dim: self._map(self._vectors_path(dim), np.float32, (self._capacity, dim)) for dim in set(self.dims.values())
+        }
+        self._referenced = np.zeros(self._capacity, dtype=bool)
+
+        raw = self._keys[:self._size].tobytes()
+        self._index: Dict[bytes, int] = {
+            raw[slot * KEY_BYTES:(slot + 1) * KEY_BYTES]: slot for slot in range(self._size)
+        }
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        """The cache key for a text embedded with the given model."""
+        text_digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return hashlib.sha256(model.encode("utf-8") + b"\0" + text_digest).digest()
+
+    def get_many(self, model: str, texts: List[str]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        Look up several texts at once.
+
+        :return: A (len(texts), dim) float32 matrix holding the cached rows (or
+            None if nothing has been cached for the model yet) and a boolean hit mask.
+        """
+        keys = [self.key(model, text) for text in texts]
+        hits = np.zeros(len(texts), dtype=bool)
+        with self._lock:
+            dim = self.dims.get(model)
+            if dim is None:
+                self.misses += len(texts)
+                return None, hits
+            vectors = self._vectors[dim]
+            matrix = np.empty((len(texts), dim), dtype=np.float32)
+            for i, key in enumerate(keys):
+                slot = self._index.get(key)
+                if slot is not None:
+                    matrix[i] = vectors[slot]
+                    self._referenced[slot] = True
+                    hits[i] = True
+            found = int(hits.sum())
+            self.hits += found
+            self.misses += len(texts) - found
+        return matrix, hits
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Store embeddings for several texts.
+
+        :param vectors: A (len(texts), dim) matrix in the same order as texts.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        with self._lock:
+            dim = self.dims.setdefault(model, int(vectors.shape[1]))
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {model}'s cached dimension {dim}")
+            if dim not in self._vectors:
+                self._vectors[dim] = self._map(self._vectors_path(dim), np.float32, (self._capacity, dim))
+
+            for text, vector in zip(texts, vectors):
+                key = self.key(model, text)
+                slot = self._index.get(key)
+                if slot is None:
+                    slot = self._allocate_slot()
+                    self._index[key] = slot
+                # Vector before key, so a slot is never labelled with a key it does not hold yet
+                self._vectors[dim][slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._write_meta()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        matrix, hits = self.get_many(model, [text])
+        return matrix[0] if hits[0] else None
+
+    def put(self, model: str, text: str, vector) -> None:
+        self.put_many(model, [text], np.asarray([vector], dtype=np.float32))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._size,
+                "capacity": self._capacity,
+            }
+
+    def flush(self) -> None:
+        """Write mapped pages back to disk."""
+        with self._lock:
+            self._keys.flush()
+            for vectors in self._vectors.values():
+                vectors.flush()
+            self._write_meta()
+
+    def close(self) -> None:
+        self.flush()
+        self._keys = None
+        self._vectors = {}
+
+    def _allocate_slot(self) -> int:
+        if self._size < self._capacity:
+            slot = self._size
+            self._size += 1
+            return slot
+        if self._capacity < self.max_entries:
+            self._grow(min(self._capacity * 2, self.max_entries))
+            return self._allocate_slot()
+
+        # Full: advance the clock hand past recently used slots
+        while self._referenced[self._hand]:
+            self._referenced[self._hand] = False
+            self._hand = (self._hand + 1) % self._capacity
+        slot = self._hand
+        self._hand = (self._hand + 1) % self._capacity
+        del self._index[self._keys[slot].tobytes()]
+        self.evictions += 1
+        return slot
+
+    def _grow(self, capacity: int) -> None:
+        self._keys.flush()
+        self._keys = self._map(self._keys_path, np.uint8, (capacity, KEY_BYTES))
+        for dim, vectors in self._vectors.items():
+            vectors.flush()
+            self._vectors[dim] = self._map(self._vectors_path(dim), np.float32, (capacity, dim))
+        self._referenced = np.concatenate([self._referenced, np.zeros(capacity - self._capacity, dtype=bool)])
+        self._capacity = capacity
+
+    @staticmethod
+    def _map(path: str, dtype, shape) -> np.memmap:
+        # Extend (never shrink) the backing file to the requested shape
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.path, "keys.bin")
+
+    def _vectors_path(self, dim: int) -> str:
+        return os.path.join(self.path, f"vectors.{dim}.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _read_meta(self) -> dict:
+        if not os.path.exists(self._meta_path):
+            return {}
+        with open(self._meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self) -> None:
+        meta = {"dims": self.dims, "capacity": self._capacity, "size": self._size, "hand": self._hand}
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
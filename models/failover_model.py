@@ -0,0 +1,330 @@
+"""
+Failover across several model backends, guarded by circuit breakers.
+
+FailoverModel tries its backends in order, skipping any whose circuit breaker
+is open. A breaker watches a sliding window of its backend's calls and opens
+when too many of them fail or are too slow. While it is open, calls go
+straight to the next backend instead of waiting on one that is down. After a
+cool-down it lets a few probe calls through (half-open) and closes again once
+they succeed.
+
+Typical backends are a primary deployment, a second deployment or region, and
+a local stand-in model of last resort.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse, ModelResponseStream
+from models.rate_limiter import status_code
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"  # calls flow normally
+    OPEN = "open"  # calls are rejected until the cool-down ends
+    HALF_OPEN = "half_open"  # a few probe calls test whether the backend recovered
+
+
+class CircuitBreaker:
+    """
+    Tracks one backend's error rate and latency over its recent calls.
+    """
+
+    def __init__(
+        self,
+        name: str = "backend",
+        window: int = 50,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 3,
+    ):
+        """
+        Initialize the breaker.
+
+        :param name: Label used in logs and health reports.
+        :param window: Number of recent calls considered.
+        :param min_calls: Calls needed in the window before the breaker can open.
+        :param error_rate: Failure fraction that opens the breaker.
+        :param slow_call_seconds: Calls slower than this count as slow (None: ignore latency).
+        :param slow_call_rate: Slow-call fraction that opens the breaker.
+        :param open_seconds: Cool-down before probing a tripped backend.
+        :param half_open_probes: Successful probes needed to close again.
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def allow(self) -> bool:
+        """Whether a call may go to this backend now; a True in half-open state claims a probe."""
+        with self._lock:
+            if self.state is BreakerState.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = BreakerState.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                self.logger.info(f"Circuit {self.name} half-open; probing")
+            if self.state is BreakerState.HALF_OPEN:
+                if self._probes_in_flight + self._probe_successes >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self, latency: float) -> None:
+        slow = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight -= 1
+                if slow:
+                    self._trip("slow probe")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = BreakerState.CLOSED
+                    self._outcomes.clear()
+                    self.logger.info(f"Circuit {self.name} closed")
+                return
+            self._outcomes.append((False, slow))
+            self._check()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight -= 1
+                self._trip("failed probe")
+                return
+            self._outcomes.append((True, False))
+            self._check()
+
+    def release(self) -> None:
+        """Give back a claimed probe without recording an outcome."""
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "name": self.name,
+                "state": self.state.value,
+                "calls": calls,
+                "error_rate": sum(failed for failed, _ in self._outcomes) / calls if calls else 0.0,
+                "slow_rate": sum(slow for _, slow in self._outcomes) / calls if calls else 0.0,
+                "times_opened": self.times_opened,
+            }
+
+    def _check(self) -> None:
+        calls = len(self._outcomes)
+        if self.state is not BreakerState.CLOSED or calls < self.min_calls:
+            return
+        failures = sum(failed for failed, _ in self._outcomes)
+        slow = sum(slow for _, slow in self._outcomes)
+        if failures / calls >= self.error_rate:
+            self._trip(f"error rate {failures / calls:.0%}")
+        elif self.slow_call_seconds is not None and slow / calls >= self.slow_call_rate:
+            self._trip(f"slow-call rate {slow / calls:.0%}")
+
+    def _trip(self, reason: str) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        self.logger.warning(f"Circuit {self.name} opened ({reason})")
+
+
+class _Claim:
+    """
+    One call's permission from a breaker, settled exactly once.
+
+    A call that ends any other way than success or failure (cancelled,
+    interrupted, or a stream that is abandoned) gives its probe back, so a
+    half-open breaker is never left waiting on a probe that will not report.
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def succeeded(self, latency: float) -> None:
+        if self._settle():
+            self.breaker.record_success(latency)
+
+    def failed(self) -> None:
+        if self._settle():
+            self.breaker.record_failure()
+
+    def release(self) -> None:
+        if self._settle():
+            self.breaker.release()
+
+    def _settle(self) -> bool:
+        with self._lock:
+            settled, self._settled = self._settled, True
+            return not settled
+
+
+class BackendsUnavailable(RuntimeError):
+    """Every backend failed or has an open circuit."""
+
+
+def _is_caller_error(exc: Exception) -> bool:
+    # A bad request fails on every backend, so it says nothing about health
+    status = status_code(exc)
+    return status is not None and 400 <= status < 500 and status not in (408, 409, 429)
+
+
+class FailoverModel(AbstractModel):
+    """
+    An AbstractModel that fails over between backends with circuit breakers.
+    """
+
+    records_metrics = False  # each backend call is measured
+
+    def __init__(self, backends: Sequence[AbstractModel],
+                 breakers: Optional[Sequence[CircuitBreaker]] = None, **breaker_options):
+        """
+        Initialize the composite.
+
+        :param backends: Backends in order of preference.
+        :param breakers: One breaker per backend; built from breaker_options if None.
+        :param breaker_options: CircuitBreaker arguments for the default breakers.
+        """
+        if not backends:
+            raise ValueError("FailoverModel needs at least one backend")
+        primary = backends[0]
+        # The backends cache, coalesce and rate limit their own calls
+        super().__init__(temperature=primary.temperature, model=primary.model,
+                         embedding_model=primary.embedding_model, coalesce=False)
+        self.backends = list(backends)
+        self.breakers = list(breakers) if breakers is not None else [
+            CircuitBreaker(name=f"{i}:{backend.model}", **breaker_options) for i, backend in enumerate(backends)
+        ]
+        if len(self.breakers) != len(self.backends):
+            raise ValueError("FailoverModel needs one circuit breaker per backend")
+        self.logger = logging.getLogger(__name__)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """Breaker state and recent error/slow-call rates per backend."""
+        return [breaker.health() for breaker in self.breakers]
+
+    def _limiter(self):
+        return None
+
+    def _generate_response(self, messages) -> ModelResponse:
+        errors = []
+        for index, backend, claim in self._available():
+            started = time.monotonic()
+            try:
+                response = backend.generate_response(messages)
+            except Exception as e:
+                self._failed(claim, e, errors)
+                continue
+            except BaseException:
+                claim.release()
+                raise
+            return self._succeeded(index, claim, response, started)
+        raise BackendsUnavailable(self._summary(errors))
+
+    async def _agenerate_response(self, messages) -> ModelResponse:
+        errors = []
+        for index, backend, claim in self._available():
+            started = time.monotonic()
+            try:
+                response = await backend.agenerate_response(messages)
+            except Exception as e:
+                self._failed(claim, e, errors)
+                continue
+            except BaseException:  # cancelled, e.g. by a hedge or an unused speculative draft
+                claim.release()
+                raise
+            return self._succeeded(index, claim, response, started)
+        raise BackendsUnavailable(self._summary(errors))
+
+    def _stream_response(self, messages) -> ModelResponseStream:
+        # Only opening the stream fails over; the breaker learns how the stream ended
+        errors = []
+        for index, backend, claim in self._available():
+            started = time.monotonic()
+            try:
+                stream = backend.stream_response(messages)
+            except Exception as e:
+                self._failed(claim, e, errors)
+                continue
+            except BaseException:
+                claim.release()
+                raise
+            watched = ModelResponseStream(
+                self._watched(stream, claim),
+                finalize=lambda _output, stream=stream, index=index, claim=claim, started=started:
+                    self._succeeded(index, claim, stream.response, started),
+            )
+            # A stream that is dropped without ever being iterated gives its probe back too
+            weakref.finalize(watched, claim.release)
+            return watched
+        raise BackendsUnavailable(self._summary(errors))
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        # Backends embed into different vector spaces, so embeddings never fail over
+        return self.backends[0].generate_embeddings(texts, model)
+
+    def _available(self):
+        for index, (backend, breaker) in enumerate(zip(self.backends, self.breakers)):
+            if breaker.allow():
+                yield index, backend, _Claim(breaker)
+
+    def _watched(self, stream: ModelResponseStream, claim: _Claim):
+        try:
+            yield from stream
+        except Exception:
+            claim.failed()
+            raise
+        except BaseException:  # GeneratorExit when the consumer abandons the stream
+            claim.release()
+            stream.close()
+            raise
+
+    def _succeeded(self, index: int, claim: _Claim, response: ModelResponse, started: float) -> ModelResponse:
+        claim.succeeded(time.monotonic() - started)
+        response.metadata["backend"] = claim.breaker.name
+        if index:
+            response.metadata["failover"] = True
+        return response
+
+    def _failed(self, claim: _Claim, error: Exception, errors: List[str]) -> None:
+        name = claim.breaker.name
+        if _is_caller_error(error):
+            claim.release()
+            raise error
+        claim.failed()
+        errors.append(f"{name}: {error}")
+        self.logger.warning(f"Backend {name} failed ({error}); failing over")
+
+    def _summary(self, errors: List[str]) -> str:
+        if errors:
+            return f"All backends failed: {'; '.join(errors)}"
+        return "All backends have open circuits"
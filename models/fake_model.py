@@ -0,0 +1,170 @@
+"""
+A deterministic, offline stand-in for a remote LLM backend.
+
+FakeModel replays scripted responses or answers from regex rules, sleeps for a
+simulated latency drawn from a configurable distribution, reports token usage
+like a real provider, and can stream its output token by token. It needs no
+network or API key, which makes it suitable for tests and for benchmarking
+the framework itself (AgentLoop, thinking styles, tool selection) under load.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse, ModelResponseStream, Usage
+from models.token_counter import estimate_message_tokens, estimate_tokens
+
+Responder = Union[str, Callable[[list], str]]
+
+
+@dataclass
+class LatencyDistribution:
+    """
+    A simulated latency distribution, in seconds.
+
+    kind is one of:
+        constant     always `mean`
+        uniform      uniform on [mean - spread, mean + spread]
+        exponential  exponential with the given mean
+        lognormal    lognormal with the given mean and sigma = spread (heavy tail)
+    """
+    kind: str = "constant"
+    mean: float = 0.0
+    spread: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "constant":
+            return self.mean
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.kind == "exponential":
+            return rng.expovariate(1.0 / self.mean)
+        if self.kind == "lognormal":
+            # Pick mu so the distribution's mean is self.mean
+            mu = np.log(self.mean) - self.spread ** 2 / 2
+            return rng.lognormvariate(mu, self.spread)
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+
+class FakeModel(AbstractModel):
+    """
+    A scripted or rule-based AbstractModel implementation.
+
+    Responses are chosen in this order: the first rule whose pattern matches
+    the last message, then the next scripted response (cycling), then the
+    default, which echoes the last message.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Sequence[str]] = None,
+        rules: Optional[Sequence[Tuple[str, Responder]]] = None,
+        default: Optional[Responder] = None,
+        latency: Optional[LatencyDistribution] = None,
+        token_interval: float = 0.0,
+        embedding_dim: int = 64,
+        seed: int = 0,
+        temperature: float = 0.7,
+        model: str = "fake-model",
+        **kwargs,
+    ):
+        """
+        Initialize the fake backend.
+
+        :param responses: Scripted outputs, replayed in order and then cycled.
+        :param rules: (regex, response) pairs matched against the last message;
+            a response may be a callable taking the message list.
+        :param default: Output when nothing else applies; echoes by default.
+        :param latency: Time to first token for every call.
+        :param token_interval: Delay between streamed tokens, in seconds.
+        :param embedding_dim: Size of the (hash-seeded) fake embeddings.
+        :param seed: Seed for latency sampling.
+        """
+        super().__init__(temperature=temperature, model=model, **kwargs)
+        self.responses = list(responses or [])
+        self.rules = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), responder) for pattern, responder in rules or []]
+        self.default = default
+        self.latency = latency or LatencyDistribution()
+        self.token_interval = token_interval
+        self.embedding_dim = embedding_dim
+        self.calls = 0
+        self._script_index = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _generate_response(self, messages) -> ModelResponse:
+        output, delay = self._next(messages)
+        time.sleep(delay + self.token_interval * len(self._tokens(output)))
+        return self._response(messages, output, delay)
+
+    async def _agenerate_response(self, messages) -> ModelResponse:
+        output, delay = self._next(messages)
+        await asyncio.sleep(delay + self.token_interval * len(self._tokens(output)))
+        return self._response(messages, output, delay)
+
+    def _stream_response(self, messages) -> ModelResponseStream:
+        output, delay = self._next(messages)
+
+        def deltas():
+            time.sleep(delay)
+            for token in self._tokens(output):
+                yield token
+                if self.token_interval:
+                    time.sleep(self.token_interval)
+
+        return ModelResponseStream(deltas(), finalize=lambda text: self._response(messages, text, delay))
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        # Seed each vector from the text so equal texts embed identically
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.embedding_dim).astype(np.float32)
+            rows.append(vector / np.linalg.norm(vector))
+        return np.asarray(rows, dtype=np.float32).reshape(len(texts), self.embedding_dim)
+
+    def _next(self, messages) -> Tuple[str, float]:
+        last = str(messages[-1].get("content", "")) if messages else ""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency.sample(self._rng)
+            for pattern, responder in self.rules:
+                if pattern.search(last):
+                    return self._render(responder, messages), delay
+            if self.responses:
+                output = self.responses[self._script_index % len(self.responses)]
+                self._script_index += 1
+                return output, delay
+        if self.default is not None:
+            return self._render(self.default, messages), delay
+        return f"echo: {last}", delay
+
+    @staticmethod
+    def _render(responder: Responder, messages) -> str:
+        return responder(messages) if callable(responder) else responder
+
+    @staticmethod
+    def _tokens(output: str) -> List[str]:
+        # Whitespace-delimited chunks, keeping the whitespace so they rejoin exactly
+        return re.findall(r"\S+\s*|\s+", output)
+
+    def _response(self, messages, output: str, delay: float) -> ModelResponse:
+        input_tokens = estimate_message_tokens(messages, self.model)
+        output_tokens = estimate_tokens(output, self.model)
+        return ModelResponse(
+            output=output,
+            usage=Usage(input_tokens, output_tokens),
+            finish_reason="stop",
+            latency=delay,
+        )
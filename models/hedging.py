@@ -0,0 +1,224 @@
+"""
+Hedged requests for cutting tail latency.
+
+If a call has not returned after a high percentile of the model's recently
+observed latency, a Hedger sends a duplicate and takes whichever finishes
+first. Only deterministic calls may be hedged (AbstractModel only hedges at
+temperature 0), since either copy's answer has to be acceptable.
+
+Hedges are capped at a fraction of all calls so a slow provider is not hit
+with double traffic. Coroutine losers are cancelled; a blocking loser cannot
+be interrupted, so it finishes in the background and its result is dropped.
+
+A blocking call that cannot be hedged (too few samples, or no hedge budget
+left) runs on the caller's thread. Only calls holding a hedge reservation use
+the shared pool, and at most max_watched of them at a time, so the pool never
+queues and never caps the throughput of ordinary calls.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+_POOL_SIZE = 32
+_executor = ThreadPoolExecutor(max_workers=_POOL_SIZE, thread_name_prefix="hedge")
+
+
+class LatencyHistogram:
+    """The most recent call latencies of one model."""
+
+    def __init__(self, window: int = 512):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class Hedger:
+    """
+    Sends a backup request when a call is slower than usual.
+
+    One Hedger may be shared by several model instances; latencies are kept
+    per model name.
+    """
+
+    def __init__(self, percentile: float = 0.95, max_fraction: float = 0.05,
+                 min_samples: int = 20, min_delay: float = 0.0, window: int = 512,
+                 max_watched: int = _POOL_SIZE // 2):
+        """
+        Initialize the hedger.
+
+        :param percentile: Hedge once a call has taken longer than this
+            percentile of recent latency.
+        :param max_fraction: Most hedges allowed, as a fraction of calls.
+        :param min_samples: Calls observed for a model before it is hedged.
+        :param min_delay: Never hedge sooner than this, in seconds.
+        :param window: Latencies kept per model.
+        :param max_watched: Blocking calls that may wait for a hedge at once;
+            each holds up to two pool threads.
+        """
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self.max_watched = max_watched
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._watched = 0
+        self._lock = threading.Lock()
+
+    def histogram(self, model: str) -> LatencyHistogram:
+        with self._lock:
+            if model not in self._histograms:
+                self._histograms[model] = LatencyHistogram(self.window)
+            return self._histograms[model]
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None if it should not be hedged."""
+        histogram = self.histogram(model)
+        if len(histogram) < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def call(self, model: str, fn: Callable[[], Any]) -> Any:
+        """
+        Make a blocking call, hedging it if it runs long.
+
+        :param model: Name whose latency history to use.
+        :param fn: The call; it may be made twice.
+        """
+        self._count_call()
+        delay = self.hedge_delay(model)
+        if delay is None or not self._watch():
+            return self._timed(model, fn)
+
+        # Copies run in the caller's context so per-call metrics still see them
+        primary = _executor.submit(contextvars.copy_context().run, self._timed, model, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge():
+            primary.add_done_callback(self._unwatch)
+            return primary.result()
+
+        backup = _executor.submit(contextvars.copy_context().run, self._timed, model, fn)
+        pending = {primary, backup}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = self._winner(done, pending, backup)
+            if winner is not None:
+                # The watch slot is given back once the loser's thread is free too
+                loser = next(iter(pending), winner)
+                loser.cancel()
+                loser.add_done_callback(self._unwatch)
+                return winner.result()
+
+    async def acall(self, model: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Coroutine version of call(); fn is a zero-argument coroutine function.
+        The slower copy is cancelled.
+        """
+        self._count_call()
+        delay = self.hedge_delay(model)
+        if delay is None:
+            return await self._atimed(model, fn)
+
+        primary = asyncio.ensure_future(self._atimed(model, fn))
+        backup = None
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not self._take_hedge():
+                return await primary
+
+            backup = asyncio.ensure_future(self._atimed(model, fn))
+            pending = {primary, backup}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = self._winner(done, pending, backup)
+                if winner is not None:
+                    for loser in pending:
+                        loser.cancel()
+                    return winner.result()
+        except asyncio.CancelledError:
+            for task in (primary, backup):
+                if task is not None:
+                    task.cancel()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Hedge counters and the hedge threshold per model."""
+        with self._lock:
+            models = list(self._histograms)
+            stats = {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            }
+        stats["thresholds"] = {model: self.hedge_delay(model) for model in models}
+        return stats
+
+    def _winner(self, done, pending, backup):
+        """The first successful copy, the last failure if none is left running, else None."""
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    self._count_win()
+                return future
+        return None if pending else next(iter(done))
+
+    def _timed(self, model: str, fn: Callable[[], Any]) -> Any:
+        started = time.monotonic()
+        result = fn()
+        self.histogram(model).record(time.monotonic() - started)
+        return result
+
+    async def _atimed(self, model: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        result = await fn()
+        self.histogram(model).record(time.monotonic() - started)
+        return result
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _watch(self) -> bool:
+        """Reserve a slot to watch a blocking call for a hedge, if one could fire."""
+        with self._lock:
+            if self._watched >= self.max_watched or self.hedged + 1 > self.max_fraction * self.calls:
+                return False
+            self._watched += 1
+            return True
+
+    def _unwatch(self, _future=None) -> None:
+        with self._lock:
+            self._watched -= 1
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.max_fraction * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _count_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
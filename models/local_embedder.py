@@ -0,0 +1,137 @@
+"""
+A local, CPU-only embedding backend.
+
+HashedNgramEmbedder embeds text with the hashing trick: the UTF-8 character
+n-grams of a (lower-cased, space-padded) text are hashed into a fixed number
+of buckets with a random sign, counts are damped with log1p and the vector is
+L2-normalized. Similar wording gives similar vectors, which is enough for
+internal recall indexes, and it needs no network, quota or model weights.
+
+A whole batch is hashed at once with NumPy; corpora larger than
+parallel_threshold are split into chunks and embedded on a process pool.
+Vectors are deterministic across processes and restarts, but live in their
+own vector space, so never mix them with a remote model's embeddings in one
+index.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse
+
+# 64-bit FNV-1a
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # Worker processes are expensive to start, so one pool serves every embedder
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def hashed_ngram_matrix(texts: List[str], dim: int, ngram_range: Tuple[int, int] = (3, 5),
+                        seed: int = 0) -> np.ndarray:
+    """
+    Embed a batch of texts as normalized, signed hashed n-gram counts.
+
+    :param texts: The texts to embed.
+    :param dim: Number of hash buckets (the vector size).
+    :param ngram_range: Smallest and largest n-gram length, in bytes.
+    :param seed: Varies the hash function; vectors with different seeds are unrelated.
+    :return: A float32 matrix with one L2-normalized row per text.
+    """
+    count = len(texts)
+    encoded = [f" {text.lower()} ".encode("utf-8") for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=count)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    row_of = np.repeat(np.arange(count, dtype=np.int64), lengths)
+    counts = np.zeros(count * dim, dtype=np.float64)
+
+    with np.errstate(over="ignore"):  # FNV relies on wrapping 64-bit multiplication
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            starts = len(data) - n + 1
+            if starts <= 0:
+                continue
+            hashes = np.full(starts, _FNV_OFFSET ^ np.uint64(seed * 0x9E3779B1 + n), dtype=np.uint64)
+            for offset in range(n):
+                hashes ^= data[offset:offset + starts]
+                hashes *= _FNV_PRIME
+            # Drop n-grams that run across the boundary between two texts
+            within = row_of[:starts] == row_of[n - 1:n - 1 + starts]
+            hashes = hashes[within]
+            hashes ^= hashes >> np.uint64(29)
+            buckets = (hashes % np.uint64(dim)).astype(np.int64)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+            counts += np.bincount(row_of[:starts][within] * dim + buckets, weights=signs, minlength=count * dim)
+
+    matrix = counts.reshape(count, dim)
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix.astype(np.float32)
+
+
+class HashedNgramEmbedder(AbstractModel):
+    """
+    An embeddings-only AbstractModel that runs locally on the CPU.
+    """
+
+    def __init__(
+        self,
+        dim: int = 512,
+        ngram_range: Tuple[int, int] = (3, 5),
+        seed: int = 0,
+        workers: Optional[int] = None,
+        parallel_threshold: int = 8192,
+        chunk_size: int = 2048,
+        **kwargs,
+    ):
+        """
+        Initialize the embedder.
+
+        :param dim: Size of the embedding vectors.
+        :param ngram_range: Smallest and largest character n-gram, in bytes.
+        :param seed: Hash seed; indexes must be built and queried with the same one.
+        :param workers: Processes for large batches (the CPU count if None; 1 disables the pool).
+        :param parallel_threshold: Batches at least this large use the process pool.
+        :param chunk_size: Texts per task sent to a worker process.
+        """
+        kwargs.setdefault("model", "hashed-ngram")
+        kwargs.setdefault("embedding_model", f"hashed-ngram-{dim}-{ngram_range[0]}-{ngram_range[1]}-s{seed}")
+        super().__init__(**kwargs)
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.seed = seed
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+
+    def _generate_response(self, messages) -> ModelResponse:
+        raise NotImplementedError(f"{type(self).__name__} only generates embeddings")
+
+    def _limiter(self):
+        return None  # no remote quota to respect
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        embed = partial(hashed_ngram_matrix, dim=self.dim, ngram_range=self.ngram_range, seed=self.seed)
+        if self.workers <= 1 or len(texts) < self.parallel_threshold:
+            return embed(texts)
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        return np.concatenate(list(_get_pool(self.workers).map(embed, chunks)))
@@ -0,0 +1,228 @@
+"""
+Per-call usage and latency metrics for model calls.
+
+Every call made through an AbstractModel gets a standard metrics block in
+`response.metadata["metrics"]`:
+
+    component       who made the call, from the enclosing component() tags
+    model, kind     the backend model and the kind of call (generate, stream, embed)
+    input_tokens, output_tokens, total_tokens
+                    reported usage, or local estimates if usage_estimated is True
+    ttfb, latency   seconds to the first byte/delta and to the complete response
+    retries         rate-limited or failed attempts that were retried
+    cached, coalesced, finish_reason, error, timestamp
+
+The block is also sent to every sink installed with configure_metrics(), such
+as InMemoryMetrics (histograms per component) or JsonlMetricsSink.
+
+Tag calls with the component that makes them:
+
+    with component("ToolSelectionAgent"):
+        model.generate_response(messages)
+
+Tags nest ("SophiaAgent/reflective.critique") and follow the code through
+coroutines and asyncio.to_thread, since they are kept in a context variable.
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from models.hedging import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+_components: ContextVar[Tuple[str, ...]] = ContextVar("metrics_components", default=())
+_current_call: ContextVar[Optional["CallRecord"]] = ContextVar("metrics_call", default=None)
+
+
+@contextmanager
+def component(name: str) -> Iterator[None]:
+    """Tag the model calls made inside the block with a component name."""
+    token = _components.set(_components.get() + (name,))
+    try:
+        yield
+    finally:
+        _components.reset(token)
+
+
+def current_component() -> str:
+    return "/".join(_components.get()) or "untagged"
+
+
+def note_retry() -> None:
+    """Count a retry against the model call in progress, if any."""
+    record = _current_call.get()
+    if record is not None:
+        record.retries += 1
+
+
+class CallRecord:
+    """Measurements for one model call while it is in progress."""
+
+    __slots__ = ("model", "kind", "component", "started", "retries")
+
+    def __init__(self, model: str, kind: str):
+        self.model = model
+        self.kind = kind
+        self.component = current_component()
+        self.started = time.monotonic()
+        self.retries = 0
+
+    def finish(self, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+              usage_estimated: bool = False, ttfb: Optional[float] = None, cached: bool = False,
+              coalesced: bool = False, finish_reason: Optional[str] = None,
+              error: Optional[str] = None) -> Dict[str, Any]:
+        """Build the metrics block and send it to the configured sinks."""
+        latency = time.monotonic() - self.started
+        metrics = {
+            "component": self.component,
+            "model": self.model,
+            "kind": self.kind,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": (input_tokens or 0) + (output_tokens or 0),
+            "usage_estimated": usage_estimated,
+            "ttfb": ttfb if ttfb is not None else latency,
+            "latency": latency,
+            "retries": self.retries,
+            "cached": cached,
+            "coalesced": coalesced,
+            "finish_reason": finish_reason,
+            "error": error,
+            "timestamp": time.time(),
+        }
+        emit(metrics)
+        return metrics
+
+
+@contextmanager
+def track_call(model: str, kind: str) -> Iterator[CallRecord]:
+    """
+    Measure a model call; failures are reported with the exception's type.
+
+    The caller reports success with record.finish(...).
+    """
+    record = CallRecord(model, kind)
+    token = _current_call.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record.finish(error=type(e).__name__)
+        raise
+    finally:
+        _current_call.reset(token)
+
+
+class MetricsSink(ABC):
+    """Receives the metrics block of every model call."""
+
+    @abstractmethod
+    def record(self, metrics: Dict[str, Any]) -> None:
+        pass
+
+
+class ComponentStats:
+    """Totals and latency histograms for one component."""
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency = LatencyHistogram(window)
+        self.ttfb = LatencyHistogram(window)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_p50": self.latency.percentile(0.50),
+            "latency_p95": self.latency.percentile(0.95),
+            "ttfb_p50": self.ttfb.percentile(0.50),
+            "ttfb_p95": self.ttfb.percentile(0.95),
+        }
+
+
+class InMemoryMetrics(MetricsSink):
+    """Per-component totals and latency histograms over recent calls."""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._stats: Dict[str, ComponentStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics: Dict[str, Any]) -> None:
+        with self._lock:
+            stats = self._stats.get(metrics["component"])
+            if stats is None:
+                stats = self._stats[metrics["component"]] = ComponentStats(self.window)
+            stats.calls += 1
+            stats.retries += metrics["retries"]
+            if metrics["error"]:
+                stats.errors += 1
+                return
+            stats.input_tokens += metrics["input_tokens"] or 0
+            stats.output_tokens += metrics["output_tokens"] or 0
+        stats.latency.record(metrics["latency"])
+        stats.ttfb.record(metrics["ttfb"])
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Totals and latency percentiles per component."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {name: component_stats.summary() for name, component_stats in sorted(stats.items())}
+
+
+class JsonlMetricsSink(MetricsSink):
+    """Appends each metrics block as a JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, metrics: Dict[str, Any]) -> None:
+        line = json.dumps(metrics, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_sinks: List[MetricsSink] = []
+
+
+def configure_metrics(*sinks: MetricsSink) -> None:
+    """Install the process-wide metrics sinks, replacing any previous ones."""
+    global _sinks
+    _sinks = list(sinks)
+
+
+def get_metrics_sinks() -> List[MetricsSink]:
+    return list(_sinks)
+
+
+def reset_metrics() -> None:
+    configure_metrics()
+
+
+def emit(metrics: Dict[str, Any]) -> None:
+    """Send a metrics block to every sink; a failing sink never fails the call."""
+    for sink in _sinks:
+        try:
+            sink.record(metrics)
+        except Exception as e:
+            logger.warning(f"Metrics sink {type(sink).__name__} failed: {e}")
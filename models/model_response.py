@@ -1,21 +1,167 @@
 """
 Defines a model response class that encapsulates the response from a model.
 """
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+class Usage(NamedTuple):
+    """Token counts reported for a call."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
 class ModelResponse:
     """
     A class to represent a response from a model.
 
+    Responses are kept in agent state for the life of a session, so only the
+    fields the framework uses are stored, in slots. The raw provider payload
+    is opt-in: a backend may attach it, or a loader that fetches it on first
+    access, as `raw`.
+
     Attributes:
-        data (Dict[str, Any]): The data returned by the model.
-        metadata (Optional[Dict[str, Any]]): Optional metadata about the response.
+        output (Optional[str]): The generated text.
+        usage (Optional[Usage]): Token counts, if the backend reported them.
+        finish_reason (Optional[str]): Why generation stopped, if known.
+        latency (Optional[float]): Seconds the backend call took.
+        metadata (Dict[str, Any]): Annotations added by the model layer.
     """
 
-    def __init__(self, data: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None, output: Optional[Any] = None):
-        self.data = data
+    __slots__ = ("output", "usage", "finish_reason", "latency", "_metadata", "_raw")
+
+    def __init__(
+        self,
+        data: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        output: Optional[Any] = None,
+        usage: Optional[Usage] = None,
+        finish_reason: Optional[str] = None,
+        latency: Optional[float] = None,
+        raw: Any = None,
+    ):
+        """
+        Args:
+            data: Deprecated alias for raw
+            raw: The provider payload, or a zero-argument callable returning it
+        """
         self.output = output
-        self.metadata = metadata if metadata is not None else {}
+        self.usage = usage
+        self.finish_reason = finish_reason
+        self.latency = latency
+        self._metadata = metadata or None
+        self._raw = raw if raw is not None else data
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        # Allocated on first use; most responses never carry any
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]) -> None:
+        self._metadata = value
+
+    @property
+    def raw(self) -> Any:
+        """The raw provider payload if one was attached, loading it on first access."""
+        if callable(self._raw):
+            self._raw = self._raw()
+        return self._raw
+
+    @property
+    def data(self) -> Any:
+        """Deprecated alias for raw."""
+        return self.raw
+
+    def copy(self) -> "ModelResponse":
+        """A shallow copy with its own metadata dict."""
+        return ModelResponse(
+            metadata=dict(self._metadata) if self._metadata else None,
+            output=self.output,
+            usage=self.usage,
+            finish_reason=self.finish_reason,
+            latency=self.latency,
+            raw=self._raw,
+        )
 
     def __repr__(self) -> str:
-        return f"ModelResponse(data={self.data}, metadata={self.metadata})"
+        return (f"ModelResponse(output={self.output!r}, usage={self.usage}, "
+                f"finish_reason={self.finish_reason!r}, metadata={self._metadata or {}})")
+
+
+class ModelResponseStream:
+    """
+    An iterable of text deltas from a streaming model call.
+
+    Iterating yields each delta as it arrives. The deltas are read once:
+    iterating again (or calling get_response()) after a partial read resumes
+    where it stopped. Once the stream is exhausted the assembled ModelResponse
+    is available as `response`, and any callbacks registered with
+    add_done_callback have run. An error from the source is raised to the
+    reader and again by get_response(). A reader that stops early should
+    call close(), which closes the source (and with it the connection).
+    """
+
+    def __init__(self, deltas: Iterable[str], finalize: Optional[Callable[[str], ModelResponse]] = None):
+        self._deltas = iter(deltas)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._finalize = finalize
+        self._parts: List[str] = []
+        self._callbacks: List[Callable[[ModelResponse], None]] = []
+        self.response: Optional[ModelResponse] = None
+        self.first_delta_at: Optional[float] = None  # time.monotonic() of the first delta
+
+    @classmethod
+    def of(cls, text: str) -> "ModelResponseStream":
+        """Wrap an already complete output as a single-delta stream."""
+        return cls([text])
+
+    def add_done_callback(self, callback: Callable[[ModelResponse], None]) -> None:
+        self._callbacks.append(callback)
+
+    def close(self) -> None:
+        """Stop reading the stream; the response is not assembled."""
+        self._closed = True
+        close = getattr(self._deltas, "close", None)
+        if close is not None:
+            close()
+
+    def __iter__(self) -> Iterator[str]:
+        if self.response is not None or self._closed:
+            return
+        if self._error is not None:
+            raise self._error
+        try:
+            for delta in self._deltas:
+                if delta:
+                    if self.first_delta_at is None:
+                        self.first_delta_at = time.monotonic()
+                    self._parts.append(delta)
+                    yield delta
+        except Exception as e:
+            self._error = e
+            raise
+        if self.response is None and not self._closed:  # another reader may have finished it
+            self._complete()
+
+    def get_response(self) -> Optional[ModelResponse]:
+        """Drain whatever is left of the stream and return the assembled response (None once closed)."""
+        for _ in self:
+            pass
+        return self.response
 
+    def _complete(self) -> None:
+        output = "".join(self._parts)
+        if self._finalize is not None:
+            self.response = self._finalize(output)
+        else:
+            self.response = ModelResponse(output=output)
+        for callback in self._callbacks:
+            callback(self.response)
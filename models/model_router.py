@@ -0,0 +1,291 @@
+"""
+Cost- and latency-aware routing of calls across backend models.
+
+A ModelRouter is an AbstractModel that picks a backend model for every call.
+The choice depends on:
+
+    - the call's purpose (tool selection, reflex answer, critique, ...),
+    - the prompt size, which rules out models with a small context window,
+    - the purpose's latency budget and an optional per-call cost budget.
+
+Routing calls (tool selection, critique, summaries) go to the cheapest
+capable model; only final answers need the top quality tier. If the chosen
+backend fails, the call falls back to the next candidate in rank order.
+
+Call router.for_purpose(...) to get a view of the router for one kind of
+call; views share the router's backends and latency observations. Latency
+is observed per model and purpose, since a purpose's replies (and so its
+latency) differ in size from another's.
+"""
+
+import copy
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse, ModelResponseStream
+from models.token_counter import estimate_message_tokens
+
+
+class Purpose(str, Enum):
+    TOOL_SELECTION = "tool_selection"
+    REFLEX_ANSWER = "reflex_answer"
+    REACT_STEP = "react_step"
+    DRAFT = "draft"
+    CRITIQUE = "critique"
+    REVISION = "revision"
+    CYPHER_GENERATION = "cypher_generation"
+    SUMMARY = "summary"
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """What a backend model costs and how fast and capable it is."""
+    name: str
+    tier: int  # relative answer quality; higher is better
+    input_cost: float  # USD per million input tokens
+    output_cost: float  # USD per million output tokens
+    first_token_latency: float  # typical seconds to the first token
+    tokens_per_second: float  # typical output speed
+    context_window: int
+
+    def estimated_cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.input_cost + output_tokens * self.output_cost) / 1_000_000
+
+    def estimated_latency(self, output_tokens: int) -> float:
+        return self.first_token_latency + output_tokens / self.tokens_per_second
+
+
+@dataclass(frozen=True)
+class PurposePolicy:
+    """Routing requirements for one kind of call."""
+    min_tier: int
+    output_tokens: int  # expected size of the reply
+    latency_budget: float  # seconds
+    honors_preference: bool = False  # whether ThinkingConfig.model_name applies
+
+
+DEFAULT_PROFILES: Tuple[ModelProfile, ...] = (
+    ModelProfile("gpt-4o-mini", tier=2, input_cost=0.15, output_cost=0.60,
+                 first_token_latency=0.35, tokens_per_second=90, context_window=128_000),
+    ModelProfile("gpt-3.5-turbo", tier=1, input_cost=0.50, output_cost=1.50,
+                 first_token_latency=0.40, tokens_per_second=80, context_window=16_385),
+    ModelProfile("gpt-4o", tier=3, input_cost=2.50, output_cost=10.00,
+                 first_token_latency=0.60, tokens_per_second=60, context_window=128_000),
+)
+
+DEFAULT_POLICIES: Dict[Purpose, PurposePolicy] = {
+    Purpose.TOOL_SELECTION: PurposePolicy(min_tier=1, output_tokens=30, latency_budget=1.0),
+    Purpose.CRITIQUE: PurposePolicy(min_tier=1, output_tokens=200, latency_budget=4.0),
+    Purpose.SUMMARY: PurposePolicy(min_tier=1, output_tokens=300, latency_budget=10.0),
+    Purpose.CYPHER_GENERATION: PurposePolicy(min_tier=2, output_tokens=150, latency_budget=4.0),
+    Purpose.REACT_STEP: PurposePolicy(min_tier=2, output_tokens=200, latency_budget=5.0),
+    Purpose.DRAFT: PurposePolicy(min_tier=2, output_tokens=500, latency_budget=10.0),
+    Purpose.REFLEX_ANSWER: PurposePolicy(min_tier=3, output_tokens=400, latency_budget=10.0, honors_preference=True),
+    Purpose.REVISION: PurposePolicy(min_tier=3, output_tokens=500, latency_budget=10.0, honors_preference=True),
+}
+
+# Signs that a question needs the strongest model
+_COMPLEX = re.compile(
+    r"```|\b(why|how|explain|compare|analy[sz]e|prove|derive|design|debug|step[- ]by[- ]step)\b",
+    re.IGNORECASE,
+)
+
+# Weight of the newest observation in the per-model, per-purpose latency average
+LATENCY_SMOOTHING = 0.2
+
+
+def required_tier(purpose: Purpose, messages: Sequence[dict], policy: PurposePolicy) -> int:
+    """
+    Classify a call by how capable a model it needs.
+
+    Answers to short, simple questions (greetings, one-line facts) do not need
+    the top tier; everything else gets the purpose's minimum tier. The last
+    user message is the question, not the system prompt or tool output after it.
+    """
+    question = next((message for message in reversed(messages) if message.get("role") == "user"), None)
+    if not policy.honors_preference or question is None:
+        return policy.min_tier
+    last = str(question.get("content", ""))
+    if len(last) < 80 and not _COMPLEX.search(last):
+        return max(1, policy.min_tier - 1)
+    return policy.min_tier
+
+
+def _default_backend(name: str, temperature: float) -> AbstractModel:
+    from models.openai_wrapper import OpenAIModel
+    return OpenAIModel(model=name, temperature=temperature)
+
+
+class ModelRouter(AbstractModel):
+    """
+    An AbstractModel that routes each call to one of several backend models.
+    """
+
+    records_metrics = False  # the backend call is measured
+
+    def __init__(
+        self,
+        profiles: Sequence[ModelProfile] = DEFAULT_PROFILES,
+        policies: Optional[Dict[Purpose, PurposePolicy]] = None,
+        backend_factory: Callable[[str, float], AbstractModel] = _default_backend,
+        purpose: Purpose = Purpose.REFLEX_ANSWER,
+        preferred: Optional[str] = None,
+        max_cost: Optional[float] = None,
+        temperature: float = 0.7,
+    ):
+        """
+        Initialize the router.
+
+        :param profiles: The backend models to route between.
+        :param policies: Requirements per purpose (DEFAULT_POLICIES if None).
+        :param backend_factory: Builds the backend for a model name and temperature.
+        :param purpose: Purpose of calls made directly on this router.
+        :param preferred: Model to try first for final answers, if it fits.
+        :param max_cost: Per-call cost budget in USD, or None for no budget.
+        :param temperature: Sampling temperature passed to the backends.
+        """
+        # The backends cache, coalesce and rate limit their own calls
+        super().__init__(temperature=temperature, model="router", coalesce=False)
+        self.profiles = {profile.name: profile for profile in profiles}
+        self.policies = policies if policies is not None else DEFAULT_POLICIES
+        self.backend_factory = backend_factory
+        self.purpose = purpose
+        self.preferred = preferred
+        self.max_cost = max_cost
+        self.logger = logging.getLogger(__name__)
+        self._backends: Dict[Tuple[str, float], AbstractModel] = {}
+        self._latency: Dict[Tuple[str, Purpose], float] = {}
+        self._lock = threading.Lock()
+
+    def for_purpose(self, purpose: Purpose, preferred: Optional[str] = None,
+                    temperature: Optional[float] = None) -> "ModelRouter":
+        """
+        A view of this router for one kind of call.
+
+        :param purpose: What the calls are for.
+        :param preferred: Model to try first when the purpose allows it
+            (typically ThinkingConfig.model_name).
+        :param temperature: Temperature for the calls; the router's if None.
+        """
+        view = copy.copy(self)  # shares backends, observations and lock
+        view.purpose = purpose
+        view.preferred = preferred if preferred is not None else self.preferred
+        if temperature is not None:
+            view.temperature = temperature
+        return view
+
+    def route(self, messages) -> List[ModelProfile]:
+        """
+        Rank the candidate models for a call, best first.
+
+        Models that fit the context, reach the required tier and meet the
+        latency and cost budgets are ranked cheapest first; the rest follow as
+        fallbacks, closest to the required tier first.
+        """
+        policy = self.policies[self.purpose]
+        input_tokens = estimate_message_tokens(messages)
+        tier = required_tier(self.purpose, messages, policy)
+        fitting = [profile for profile in self.profiles.values()
+                   if profile.context_window >= input_tokens + policy.output_tokens]
+
+        def within_budget(profile: ModelProfile) -> bool:
+            cost = profile.estimated_cost(input_tokens, policy.output_tokens)
+            return (profile.tier >= tier
+                    and self._expected_latency(profile, policy.output_tokens) <= policy.latency_budget
+                    and (self.max_cost is None or cost <= self.max_cost))
+
+        ranked = sorted(fitting, key=lambda profile: (
+            not within_budget(profile),
+            profile.estimated_cost(input_tokens, policy.output_tokens) if within_budget(profile)
+            else abs(profile.tier - tier),
+        ))
+        if policy.honors_preference and self.preferred in self.profiles:
+            ranked.sort(key=lambda profile: profile.name != self.preferred)
+        return ranked
+
+    def backend(self, name: str) -> AbstractModel:
+        """The (shared) backend for a model at this view's temperature."""
+        key = (name, self.temperature)
+        with self._lock:
+            if key not in self._backends:
+                self._backends[key] = self.backend_factory(name, self.temperature)
+            return self._backends[key]
+
+    def latency_snapshot(self) -> Dict[Tuple[str, str], float]:
+        """Smoothed observed latency per (model, purpose), in seconds."""
+        with self._lock:
+            return {(name, purpose.value): seconds for (name, purpose), seconds in self._latency.items()}
+
+    def _limiter(self):
+        return None  # each backend call is limited on its own
+
+    def _generate_response(self, messages) -> ModelResponse:
+        return self._with_fallback(messages, lambda backend: backend.generate_response(messages))
+
+    async def _agenerate_response(self, messages) -> ModelResponse:
+        errors = []
+        for profile in self._candidates(messages):
+            started = time.monotonic()
+            try:
+                response = await self.backend(profile.name).agenerate_response(messages)
+            except Exception as e:
+                errors.append(self._failed(profile, e))
+                continue
+            return self._routed(profile, response, started)
+        raise RuntimeError(f"All routed models failed: {'; '.join(errors)}")
+
+    def _stream_response(self, messages) -> ModelResponseStream:
+        # Only opening the stream can fall back; mid-stream errors reach the consumer
+        return self._with_fallback(messages, lambda backend: backend.stream_response(messages), timed=False)
+
+    def _generate_embeddings(self, texts: List[str], model: str) -> np.ndarray:
+        profile = next(iter(self.profiles.values()))
+        return self.backend(profile.name).generate_embeddings(texts, model)
+
+    def _with_fallback(self, messages, call, timed: bool = True):
+        errors = []
+        for profile in self._candidates(messages):
+            started = time.monotonic()
+            try:
+                result = call(self.backend(profile.name))
+            except Exception as e:
+                errors.append(self._failed(profile, e))
+                continue
+            return self._routed(profile, result, started) if timed else result
+        raise RuntimeError(f"All routed models failed: {'; '.join(errors)}")
+
+    def _candidates(self, messages) -> List[ModelProfile]:
+        candidates = self.route(messages)
+        if not candidates:
+            raise ValueError(f"No routed model can hold a {estimate_message_tokens(messages)}-token prompt")
+        self.logger.debug(f"Routing {self.purpose.value} call to {[profile.name for profile in candidates]}")
+        return candidates
+
+    def _failed(self, profile: ModelProfile, error: Exception) -> str:
+        self.logger.warning(f"Routed model {profile.name} failed ({error}); falling back")
+        return f"{profile.name}: {error}"
+
+    def _routed(self, profile: ModelProfile, response: ModelResponse, started: float) -> ModelResponse:
+        elapsed = time.monotonic() - started
+        if not response.metadata.get("cached"):
+            key = (profile.name, self.purpose)
+            with self._lock:
+                previous = self._latency.get(key)
+                self._latency[key] = elapsed if previous is None else (
+                    LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * previous)
+        response.metadata["routed_model"] = profile.name
+        response.metadata["purpose"] = self.purpose.value
+        return response
+
+    def _expected_latency(self, profile: ModelProfile, output_tokens: int) -> float:
+        # Prefer what we have observed over the profile's typical figure
+        observed = self._latency.get((profile.name, self.purpose))
+        return observed if observed is not None else profile.estimated_latency(output_tokens)
@@ -1,21 +1,10 @@
-import os
-import openai
-import sys
-from pathlib import Path
-
-# Add the config directory to sys.path to import the config module
-config_dir = Path(__file__).parent.parent / 'config'
-sys.path.insert(0, str(config_dir))
-from config import get_config
+from models.client_registry import get_client
 
 class OpenAIModel:
     def __init__(self, prompt_template="{input_text}"):
-        # Use centralized config for OpenAI API key
-        self._config = get_config()
-        self.api_key = self._config.get("openai_api_key") or os.environ.get("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OpenAI API key not found in config or environment variables")
-        openai.api_key = self.api_key
+        # Credentials and connection pooling come from the shared client
+        # registry rather than the global openai.api_key
+        self.client = get_client()
         self.prompt_template = prompt_template
 
     def generate_response(self, messages=None):
@@ -26,7 +15,7 @@ class OpenAIModel:
         #if past_interactions:
         #    messages.extend(past_interactions)
 
-        response_obj = openai.ChatCompletion.create(
+        response_obj = self.client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=messages,
         )
@@ -35,7 +24,7 @@ class OpenAIModel:
         return response
 
     def generate_embedding(self, text):
-        response = openai.Embedding.create(model="text-embedding-ada-002", input=text)
+        response = self.client.embeddings.create(model="text-embedding-ada-002", input=text)
         embedding = response.data[0].embedding
         #return embedding
-        return embedding
\ No newline at end of file
+        return embedding
@@ -1,30 +1,126 @@
-import openai
+import asyncio
+import numpy as np
 import config
 from models.abstract_model import AbstractModel
-from models.model_response import ModelResponse
+from models.client_registry import get_async_client, get_client
+from models.model_response import ModelResponse, ModelResponseStream, Usage
+from models.token_counter import batch_by_tokens
 
 """
      This is a simple static wrapper class for the OpenAI API.
      ChatCompletion and Embedding are offered.
 """
+
+# Provider limits for a single embeddings request
+EMBEDDING_MAX_BATCH_SIZE = 2048
+EMBEDDING_MAX_BATCH_TOKENS = 300_000
+
+def _embedding_matrix(count, batches, responses) -> np.ndarray:
+    """Scatter batched embedding responses back into input order."""
+    matrix = None
+    for batch, response in zip(batches, responses):
+        rows = sorted(response.data, key=lambda item: item.index)
+        rows = np.asarray([row.embedding for row in rows], dtype=np.float32)
+        if matrix is None:
+            matrix = np.empty((count, rows.shape[1]), dtype=np.float32)
+        matrix[batch] = rows
+    return matrix if matrix is not None else np.empty((0, 0), dtype=np.float32)
+
 class OpenAIModel(AbstractModel):
-    def __init__(self, temperature=0.7, model="gpt-3.5-turbo"):
-        super().__init__(temperature=temperature, model=model)
+    def __init__(self, temperature=0.7, model="gpt-3.5-turbo", response_cache=None,
+                 embedding_model="text-embedding-3-small", embedding_cache=None, timeout=None,
+                 rate_limiter=None, coalesce=True, hedger=None, keep_raw=False):
+        super().__init__(temperature=temperature, model=model, response_cache=response_cache,
+                         embedding_model=embedding_model, embedding_cache=embedding_cache,
+                         rate_limiter=rate_limiter, coalesce=coalesce, hedger=hedger)
+        # Attach a loader for the full provider response to every ModelResponse
+        self.keep_raw = keep_raw
+        # Per-call timeout in seconds; None uses the shared client's default
+        self.timeout = timeout
+
+    def _client(self):
+        # A rate limiter retries 429s and 5xx itself; SDK retries underneath
+        # it would multiply attempts and hide the 429s it backs off on
+        return get_client(retries=self._limiter() is None)
+
+    def _async_client(self):
+        return get_async_client(retries=self._limiter() is None)
+
+    def _call_options(self):
+        return {} if self.timeout is None else {"timeout": self.timeout}
+
+    def _response(self, response_obj, output):
+        """Keep only what the framework uses; the raw response is re-fetched on demand."""
+        if response_obj is None:
+            return ModelResponse(output=output)
+        usage = response_obj.usage
+        details = response_obj.incomplete_details
+        raw = None
+        if self.keep_raw:
+            response_id = response_obj.id
+            raw = lambda: get_client().responses.retrieve(response_id)
+        return ModelResponse(
+            output=output,
+            usage=Usage(usage.input_tokens, usage.output_tokens) if usage else None,
+            finish_reason=details.reason if details else response_obj.status,
+            raw=raw,
+        )
+
+    def _generate_response(self, messages):
+        response_obj = self._client().responses.create(
+            model=self.model,
+            input=messages,
+            temperature=self.temperature,
+            **self._call_options(),
+        )
+
+        return self._response(response_obj, response_obj.output_text)
+
+    async def _agenerate_response(self, messages):
+        response_obj = await self._async_client().responses.create(
+            model=self.model,
+            input=messages,
+            temperature=self.temperature,
+            **self._call_options(),
+        )
+
+        return self._response(response_obj, response_obj.output_text)
 
-    def generate_response(self, messages):
-        response_obj = openai.responses.create(
+    def _stream_response(self, messages):
+        events = get_client().responses.create(
             model=self.model,
             input=messages,
+            temperature=self.temperature,
+            stream=True,
+            **self._call_options(),
         )
+        completed = {}
 
-        response = ModelResponse(
-                    data = response_obj,
-                    output = response_obj.output_text,
-                )
+        def deltas():
+            with events:  # closing the stream early closes the connection
+                for event in events:
+                    if event.type == "response.output_text.delta":
+                        yield event.delta
+                    elif event.type == "response.completed":
+                        completed["response"] = event.response
+
+        return ModelResponseStream(
+            deltas(),
+            finalize=lambda output: self._response(completed.get("response"), output),
+        )
 
-        return response
+    def _generate_embeddings(self, texts, model):
+        batches = list(batch_by_tokens(texts, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_BATCH_TOKENS, model))
+        responses = [
+            self._client().embeddings.create(model=model, input=[texts[i] for i in batch], **self._call_options())
+            for batch in batches
+        ]
+        return _embedding_matrix(len(texts), batches, responses)
 
-    def generate_embedding(self, text, model="text-embedding-3-small"):
-        response = openai.Embedding.create(model=model, input=text)
-        embedding = response.data[0].embedding
-        return embedding
+    async def _agenerate_embeddings(self, texts, model):
+        batches = list(batch_by_tokens(texts, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_BATCH_TOKENS, model))
+        responses = await asyncio.gather(*[
+            self._async_client().embeddings.create(model=model, input=[texts[i] for i in batch], **self._call_options())
+            for batch in batches
+        ])
+        return _embedding_matrix(len(texts), batches, responses)
@@ -0,0 +1,363 @@
+"""
+Client-side rate limiting for model calls.
+
+A RateLimiter combines:
+    - token buckets for requests per minute and tokens per minute,
+    - an AIMD adaptive concurrency limit that grows by one slot per window of
+      successful calls and halves when the provider throttles us,
+    - jittered exponential backoff retries on 429 and 5xx responses, and
+    - queue-time statistics so we can see how long calls wait for capacity.
+
+One limiter is shared by every model instance in the process (see
+configure_rate_limiter); until one is configured, calls go straight through.
+Both blocking and asyncio callers are supported and queue fairly together.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from models.metrics import note_retry
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at `rate_per_minute`.
+
+    reserve() takes tokens immediately, letting the balance go negative, and
+    returns how long the caller must wait before the reservation is covered.
+    Callers therefore queue in reservation order without polling.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Correct an earlier reservation (positive amounts take more tokens)."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An AIMD limit on the number of calls in flight.
+
+    Every successful call grows the limit by increase/limit (about one slot
+    per window of calls); a throttled call multiplies it by `decrease`.
+    Waiting threads and coroutines are granted slots in FIFO order.
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 256,
+                 increase: float = 1.0, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self._waiters: Deque[Any] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._has_free_slot():
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._has_free_slot():
+                self.in_flight += 1
+                return
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # A slot was granted just as we were cancelled. If the grant has
+            # not run yet, _grant sees the cancelled future and hands it back.
+            if not future.cancelled():
+                self.release(None)
+            raise
+
+    def release(self, throttled: Optional[bool] = False) -> None:
+        """
+        Free a slot and adapt the limit.
+
+        :param throttled: True if the provider throttled the call, False on
+            success, None to release without adapting.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            elif throttled is not None:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._wake()
+
+    def _has_free_slot(self) -> bool:
+        return not self._waiters and self.in_flight < int(self.limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release(None)
+        else:
+            future.set_result(None)
+
+
+class QueueStats:
+    """Queue-time and retry counters for a RateLimiter."""
+
+    def __init__(self, window: int = 1024):
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._recent.append(seconds)
+
+    def record_retry(self, throttled: bool) -> None:
+        with self._lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "mean_wait": self.total_wait / self.calls if self.calls else 0.0,
+                "max_wait": self.max_wait,
+                "p50_wait": _percentile(recent, 0.50),
+                "p95_wait": _percentile(recent, 0.95),
+            }
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """The HTTP status carried by a provider exception, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_code(exc)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Request/token budgets, adaptive concurrency and retries for model calls.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        """
+        Initialize the limiter.
+
+        :param requests_per_minute: Request quota, or None for no request bucket.
+        :param tokens_per_minute: Token quota, or None for no token bucket.
+        :param concurrency: In-flight limit (a default AIMD limiter if None).
+        :param max_retries: Retries on 429/5xx before the error is raised.
+        :param base_delay: First backoff delay in seconds; doubles per retry.
+        :param max_delay: Upper bound on a single backoff delay.
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency if concurrency is not None else AdaptiveConcurrencyLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = QueueStats()
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 0,
+             usage_of: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """
+        Run a blocking call within the limits, retrying throttled attempts.
+
+        :param fn: The call to make.
+        :param estimated_tokens: Tokens to reserve before calling.
+        :param usage_of: Returns the actual tokens used by a result, so the
+            token bucket can be corrected.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            time.sleep(self._reserve(estimated_tokens))
+            self.concurrency.acquire()
+            self.stats.record_wait(time.monotonic() - started)
+            try:
+                result = fn()
+            except Exception as exc:
+                delay = self._on_error(exc, attempt)
+                time.sleep(delay)
+                continue
+            self.concurrency.release(False)
+            self._settle(result, estimated_tokens, usage_of)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int = 0,
+                    usage_of: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """
+        Coroutine version of call(); fn is a zero-argument coroutine function.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            await asyncio.sleep(self._reserve(estimated_tokens))
+            await self.concurrency.aacquire()
+            self.stats.record_wait(time.monotonic() - started)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.concurrency.release(None)
+                raise
+            except Exception as exc:
+                delay = self._on_error(exc, attempt)
+                await asyncio.sleep(delay)
+                continue
+            self.concurrency.release(False)
+            self._settle(result, estimated_tokens, usage_of)
+            return result
+
+    def wait_for_capacity(self, estimated_tokens: int = 0) -> None:
+        """
+        Wait for request/token budget without taking a concurrency slot.
+
+        Used for streams, whose lifetime is controlled by the consumer.
+        """
+        started = time.monotonic()
+        time.sleep(self._reserve(estimated_tokens))
+        self.stats.record_wait(time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Queue-time statistics plus the current concurrency state."""
+        stats = self.stats.snapshot()
+        stats["concurrency_limit"] = self.concurrency.limit
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    def _on_error(self, exc: Exception, attempt: int) -> float:
+        """Release the slot for a failed attempt; return the backoff or re-raise."""
+        throttled = status_code(exc) == 429
+        self.concurrency.release(throttled if is_retryable(exc) else None)
+        if not is_retryable(exc) or attempt >= self.max_retries:
+            raise exc
+        self.stats.record_retry(throttled)
+        note_retry()
+        return self._backoff(attempt, _retry_after(exc))
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter: uniform on [0, base * 2^attempt], but never below Retry-After
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def _settle(self, result: Any, estimated_tokens: int, usage_of) -> None:
+        if self.tokens is None or usage_of is None:
+            return
+        actual = usage_of(result)
+        if actual is not None:
+            self.tokens.adjust(actual - estimated_tokens)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def configure_rate_limiter(**kwargs) -> RateLimiter:
+    """
+    Install the process-wide rate limiter used by every model instance.
+
+    Accepts the RateLimiter constructor arguments.
+    """
+    global _rate_limiter
+    _rate_limiter = RateLimiter(**kwargs)
+    return _rate_limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    return _rate_limiter
+
+
+def reset_rate_limiter() -> None:
+    global _rate_limiter
+    _rate_limiter = None
@@ -0,0 +1,129 @@
+"""
+Content-addressed cache for model responses.
+
+Responses are keyed on a hash of (model, temperature, messages). A bounded
+in-memory LRU sits in front of an optional SQLite store so that hits survive
+restarts. Only the output text and metadata are kept; raw provider payloads
+are not cached.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from models.model_response import ModelResponse, Usage
+
+
+class ResponseCache:
+    """
+    An LRU response cache with optional on-disk persistence.
+
+    A single instance is safe to share between model instances and threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        :param path: SQLite file to persist entries to; memory only if None.
+        :param max_entries: Number of entries kept in the in-memory LRU.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[ModelResponse]:
+        """
+        Look up a response, promoting persisted entries into the LRU.
+
+        :param key: The request key.
+        :return: The cached response, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = json.loads(row[0])
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        metadata = dict(entry["metadata"])
+        metadata["cached"] = True
+        usage = entry.get("usage")
+        return ModelResponse(
+            output=entry["output"],
+            usage=Usage(*usage) if usage else None,
+            finish_reason=entry.get("finish_reason"),
+            metadata=metadata,
+        )
+
+    def put(self, key: str, response: ModelResponse) -> None:
+        """
+        Store a response.
+
+        :param key: The request key.
+        :param response: The response to cache.
+        """
+        entry = {
+            "output": response.output,
+            "usage": response.usage,
+            "finish_reason": response.finish_reason,
+            "metadata": response.metadata,
+        }
+        value = json.dumps(entry, default=str)
+        with self._lock:
+            # Round-trip through JSON so memory and disk hits look the same
+            self._remember(key, json.loads(value))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value)
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,110 @@
+"""
+Single-flight deduplication of identical in-flight calls.
+
+When several callers make the same deterministic request at the same time,
+only the first (the leader) runs it; the rest wait for the leader's result.
+A flight ends when its call returns, so this never serves stale results --
+that is the response cache's job.
+
+A flight is a concurrent.futures.Future, which lets blocking threads and
+coroutines (on any event loop) join the same flight.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """A group of keyed in-flight calls."""
+
+    def __init__(self):
+        self.flights = 0  # calls actually made
+        self.coalesced = 0  # calls answered by another caller's flight
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn, unless a call with the same key is already in flight.
+
+        :param key: Identifies calls that are interchangeable.
+        :param fn: The call to make if this caller leads the flight.
+        :return: The result and whether it was shared from another caller's flight.
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                self._run(key, future, fn)
+                return future.result(), False
+            try:
+                return future.result(), True
+            except CancelledError:
+                continue  # the leader gave up; try to lead a new flight
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Coroutine version of do(); fn is a zero-argument coroutine function.
+
+        A cancelled follower leaves the flight running for the others; a
+        cancelled leader ends the flight and its followers start a new one.
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = await fn()
+                except BaseException as exc:
+                    self._finish(key, future, exception=exc)
+                    raise
+                self._finish(key, future, result=result)
+                return result, False
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future)), True
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"flights": self.flights, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.flights += 1
+            return future, True
+
+    def _run(self, key: str, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._finish(key, future, exception=exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        self._finish(key, future, result=result)
+
+    def _finish(self, key: str, future: Future, result: Any = None, exception: BaseException = None) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if exception is None:
+            future.set_result(result)
+        elif isinstance(exception, (asyncio.CancelledError, KeyboardInterrupt, SystemExit)):
+            future.cancel()
+        else:
+            future.set_exception(exception)
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """The process-wide group shared by every model instance."""
+    return _single_flight
@@ -0,0 +1,89 @@
+"""
+Local token estimates for prompts and embedding inputs.
+
+Uses tiktoken when it is installed and its vocabulary can be loaded, and falls
+back to a characters-per-token heuristic otherwise, so budgeting never fails
+or retries a network round trip.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Rough average for English text with OpenAI's BPE vocabularies
+CHARS_PER_TOKEN = 4
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        name = tiktoken.encoding_name_for_model(model) if model else DEFAULT_ENCODING
+    except KeyError:
+        name = DEFAULT_ENCODING
+    return _named_encoding(name)
+
+
+@lru_cache(maxsize=None)
+def _named_encoding(name: str):
+    # tiktoken downloads a vocabulary on first use; without network (or with a
+    # broken cache) fall back to the heuristic once rather than on every call
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    :param text: The text to measure.
+    :param model: Model whose tokenizer to use when tiktoken is available.
+    :return: The (estimated) token count.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+
+def estimate_message_tokens(messages: Iterable[dict], model: Optional[str] = None) -> int:
+    """
+    Estimate the prompt size of a chat message list.
+
+    Each message carries a few tokens of framing on top of its content.
+    """
+    return sum(4 + estimate_tokens(str(message.get("content", "")), model) for message in messages)
+
+
+def batch_by_tokens(texts: List[str], max_items: int, max_tokens: int, model: Optional[str] = None) -> Iterator[List[int]]:
+    """
+    Split texts into request-sized batches.
+
+    Batches preserve input order and hold at most max_items texts and, where
+    possible, max_tokens tokens. A single text larger than max_tokens is sent
+    in a batch of its own.
+
+    :return: An iterator of index lists into texts.
+    """
+    batch: List[int] = []
+    batch_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text, model)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
@@ -77,6 +77,18 @@ SUMMARY_PROMPT = """
         conversation up to the point of the user's confirmation.
 """
 
+FEEDBACK_AGENT_PROMPT = """
+        You are reviewing whether an assistant completed the user's request.
+
+        Conversation so far:
+        {conversation_history}
+
+        User request: {query}
+        Assistant response: {response}
+
+        Does the response fully complete the request? Reply with "yes" or "no" followed by a one-sentence reason.
+"""
+
 KG_QUERY_PROMPT = """
 Generate a Cypher query to retrieve entities and their relationships from the knowledge graph related to the topic of interest. The query should identify nodes and edges that are directly and indirectly associated with this topic, providing a comprehensive overview of the existing data landscape. This will inform the integration of new information related to the topic, ensuring relevance and preventing duplication. Consider including entities of various types and their connections that could be pertinent.
 
@@ -199,12 +211,13 @@ You are a Tool Selector sub‐agent.  Whenever you’re invoked, you will receiv
 PERMITTED TOOLS:
 {tools}
 
-Your job: decide, *in JSON format only*, which single tool to run (or None).  You must produce ONE AND ONLY ONE JSON object that matches exactly this schema:
+Your job: decide, *in JSON format only*, which tools to run (or None).  Each tool call is a JSON object that matches exactly this schema:
 {{
   \"tool\":  string,       // either one of the tool’s names or None
   \"input\":   string|null   // the argument string to pass into that tool
 }}
-You must not output any commentary, explanation, or extra fields—nothing except that 1 JSON object (and no leading/trailing whitespace, no markdown fences). If you think no tool is needed, output:
+If one tool call is enough, output that single JSON object. If the question needs several independent calls (for example a search and fetching two pages), output a JSON array of up to {max_calls} such objects, most important first; they run at the same time, so no call may depend on another's result.
+You must not output any commentary, explanation, or extra fields—nothing except that JSON (and no leading/trailing whitespace, no markdown fences). If you think no tool is needed, output:
   {{ \"tool": \"none", \"input\": null }}
   
 If you stray even a little bit (e.g. add extra text or send back invalid JSON), the orchestrator will treat it as a parsing failure and retry the call.
@@ -0,0 +1,195 @@
+"""
+Tests for the coroutine methods of AgentLoop.
+"""
+
+import asyncio
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+from agents.abstract_agent import AbstractAgent
+from agents.agent_interfaces import AgentState
+from agents.agent_loop import AgentLoop
+from agents.stateful_conversational_agent import StatefulConversationalAgent
+from communication.generic_request import GenericRequest
+from communication.generic_response import GenericResponse
+from config import Configurator
+from models.fake_model import FakeModel, LatencyDistribution
+from models.model_response import ModelResponseStream
+
+
+class CountingAgent(AbstractAgent):
+    """An async agent that records how many steps overlap and what it saw."""
+
+    def __init__(self, delay=0.05, done_after=None):
+        super().__init__(Configurator())
+        self.delay = delay
+        self.done_after = done_after
+        self.active = 0
+        self.peak = 0
+        self.seen = []
+
+    def start(self, input_content, **metadata):
+        raise AssertionError("the loop should use astart")
+
+    def step(self, state):
+        raise AssertionError("the loop should use astep")
+
+    async def astart(self, input_content, **metadata):
+        state = AgentState(input=GenericRequest(content=input_content))
+        return await self.astep(state)
+
+    async def astep(self, state):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        self.seen.append(state.input.content)
+        state.add_message("assistant", f"re: {state.input.content}")
+        turns = sum(message.role == "assistant" for message in state.history)
+        return GenericResponse(state=state, output=f"re: {state.input.content}",
+                               is_done=self.done_after is not None and turns >= self.done_after)
+
+
+class BlockingAgent(AbstractAgent):
+    """A legacy agent with only the blocking methods."""
+
+    def __init__(self, delay=0.1):
+        super().__init__(Configurator())
+        self.delay = delay
+        self.threads = set()
+
+    def start(self, input_content, **metadata):
+        return self.step(AgentState(input=GenericRequest(content=input_content)))
+
+    def step(self, state):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return GenericResponse(state=state, output="done", is_done=True)
+
+
+class DroppingModel(FakeModel):
+    """A fake whose streams break after the first token."""
+
+    def _stream_response(self, messages):
+        def deltas():
+            yield "partial"
+            raise ConnectionError("connection reset")
+
+        return ModelResponseStream(deltas())
+
+
+class TestStreaming(unittest.TestCase):
+    """Tests for streamed agent answers."""
+
+    def test_step_streams_the_answer(self):
+        agent = StatefulConversationalAgent(model=FakeModel(default="the sky is blue"))
+        response = agent.start("Why is the sky blue?", stream=True)
+        self.assertEqual(response.output, "")
+        self.assertEqual(response.state.get_last_message().role, "user")
+        self.assertEqual("".join(response.stream), "the sky is blue")
+        self.assertEqual(response.output, "the sky is blue")
+        self.assertEqual(response.state.get_last_message().content, "the sky is blue")
+
+    def test_error_mid_stream_ends_the_conversation(self):
+        agent = StatefulConversationalAgent(model=DroppingModel())
+        response = agent.start("hi", stream=True)
+        self.assertEqual(list(response.stream), ["partial"])
+        self.assertTrue(response.is_done)
+        self.assertIn("connection reset", response.output)
+        self.assertEqual(response.state.get_last_message().role, "system")
+
+    def test_loop_prints_deltas(self):
+        loop = AgentLoop(StatefulConversationalAgent(model=FakeModel(default="one two three")))
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            loop._print_response(loop.start("hi", stream=True))
+        self.assertEqual(printed.getvalue(), "Agent: one two three\n")
+
+
+class TestAsyncAgentLoop(unittest.TestCase):
+    """Tests for serving many conversations on one event loop."""
+
+    def test_concurrency_limit(self):
+        agent = CountingAgent()
+        loop = AgentLoop(agent, max_concurrency=3)
+
+        async def main():
+            await asyncio.gather(*[loop.astart(f"hi {i}") for i in range(10)])
+
+        asyncio.run(main())
+        self.assertEqual(agent.peak, 3)
+        self.assertEqual(len(agent.seen), 10)
+
+    def test_turns_of_one_session_run_in_order(self):
+        agent = CountingAgent(delay=0.01)
+        loop = AgentLoop(agent)
+
+        async def main():
+            response = await loop.astart("first", session_id="alice")
+            await asyncio.gather(*[loop.arun_turn(response.state, f"message {i}") for i in range(5)])
+            return response.state
+
+        state = asyncio.run(main())
+        self.assertEqual(agent.peak, 1)
+        self.assertEqual(agent.seen, ["first"] + [f"message {i}" for i in range(5)])
+        self.assertEqual([m.content for m in state.history if m.role == "user"], [f"message {i}" for i in range(5)])
+        self.assertEqual(loop.stats(), {"running": 0, "sessions": 0})
+
+    def test_sessions_run_concurrently(self):
+        agent = CountingAgent(delay=0.1)
+        loop = AgentLoop(agent)
+
+        async def main():
+            starts = await asyncio.gather(*[loop.astart("hi", session_id=i) for i in range(5)])
+            began = time.monotonic()
+            await asyncio.gather(*[loop.arun_step(response.state) for response in starts])
+            return time.monotonic() - began
+
+        self.assertLess(asyncio.run(main()), 0.3)
+
+    def test_run_until_done(self):
+        loop = AgentLoop(CountingAgent(delay=0, done_after=3))
+        response = asyncio.run(loop.arun_until_done("hi"))
+        self.assertTrue(response.is_done)
+        self.assertEqual(len(response.state.history), 3)
+
+    def test_max_turns(self):
+        loop = AgentLoop(CountingAgent(delay=0), max_turns=2)
+        response = asyncio.run(loop.arun_until_done("hi"))
+        self.assertTrue(response.is_done)
+        self.assertIn("maximum of 2 turns", response.state.get_last_message().content)
+
+    def test_blocking_agents_run_in_the_executor(self):
+        agent = BlockingAgent(delay=0.1)
+        loop = AgentLoop(agent, max_concurrency=8)
+
+        async def main():
+            began = time.monotonic()
+            await asyncio.gather(*[loop.astart("hi") for _ in range(8)])
+            return time.monotonic() - began
+
+        try:
+            self.assertLess(asyncio.run(main()), 0.3)
+        finally:
+            loop.close()
+        self.assertNotIn(threading.get_ident(), agent.threads)
+
+    def test_async_model_agent(self):
+        model = FakeModel(default="answer", latency=LatencyDistribution("constant", 0.05))
+        loop = AgentLoop(StatefulConversationalAgent(model=model), max_concurrency=50)
+
+        async def main():
+            return await asyncio.gather(*[loop.astart(f"hi {i}", session_id=i) for i in range(50)])
+
+        responses = asyncio.run(main())
+        self.assertEqual({response.output for response in responses}, {"answer"})
+        self.assertEqual(responses[7].state.metadata["session_id"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
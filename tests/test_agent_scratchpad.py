@@ -0,0 +1,76 @@
+"""
+Tests for the token-budgeted scratchpad.
+"""
+
+import unittest
+
+from agents.agent_scratchpad import Scratchpad, extract
+from config import Configurator
+
+PAGE = ("Paris is the capital of France. It has a population of about two million. "
+        "The Eiffel Tower was completed in 1889. Rents in the city are high. "
+        "The Seine flows through the centre of Paris. ") * 4
+
+
+class TestExtract(unittest.TestCase):
+    """Tests for local extraction."""
+
+    def test_keeps_relevant_sentences_in_order(self):
+        text = "Rents are high. The Eiffel Tower opened in 1889. The tower is 330 metres tall. Bread is cheap."
+        result = extract(text, "How tall is the Eiffel Tower?", max_tokens=18)
+        self.assertEqual(result, "The Eiffel Tower opened in 1889. … The tower is 330 metres tall.")
+
+    def test_leading_sentences_without_a_question(self):
+        self.assertTrue(extract(PAGE, None, max_tokens=10).startswith("Paris is the capital of France."))
+
+    def test_long_sentence_is_cut(self):
+        self.assertEqual(len(extract("word " * 500, None, max_tokens=10)), 40)
+
+
+class TestScratchpad(unittest.TestCase):
+    """Tests for deduplication and compaction."""
+
+    def setUp(self):
+        self.scratchpad = Scratchpad(Configurator(), max_tokens=400, extract_tokens=40)
+
+    def test_small_results_are_kept_verbatim(self):
+        self.scratchpad.add_tool_result("WebSearch", "paris", "Paris is the capital of France.")
+        self.scratchpad.add_tool_result("WebSearch", "rome", "Rome is the capital of Italy.")
+        self.assertEqual([r["compacted"] for r in self.scratchpad.tool_results], [False, False])
+        self.assertIn("Result:\nRome is the capital of Italy.", self.scratchpad.to_prompt_summary())
+
+    def test_identical_calls_are_deduplicated(self):
+        self.scratchpad.add_tool_result("WebSearch", "paris", "old")
+        self.scratchpad.add_tool_result("WebSearch", "rome", "Rome")
+        self.scratchpad.add_tool_result("WebSearch", "paris", "new")
+        self.assertEqual([(r["input"], r["output"]) for r in self.scratchpad.tool_results],
+                         [("rome", "Rome"), ("paris", "new")])
+        self.assertEqual(self.scratchpad.counts["deduplicated"], 1)
+
+    def test_stays_within_budget(self):
+        for page in range(10):
+            self.scratchpad.add_tool_result("WebBrowsingTool", f"https://example.com/{page}", PAGE)
+            self.assertLessEqual(self.scratchpad.token_count(), 400)
+        self.assertGreater(self.scratchpad.counts["compacted"], 0)
+        self.assertFalse(self.scratchpad.tool_results[-1]["compacted"])  # the newest stays verbatim
+        self.assertIn("Result (excerpt):", self.scratchpad.to_prompt_summary())
+
+    def test_relevant_results_outrank_recent_ones(self):
+        self.scratchpad.user_question = "When was the Eiffel Tower built?"
+        self.scratchpad.add_tool_result("WebBrowsingTool", "eiffel", "The Eiffel Tower was completed in 1889. " * 30)
+        self.scratchpad.add_tool_result("WebBrowsingTool", "rents", "Rents in the city are high. " * 30)
+        self.scratchpad.add_tool_result("WebBrowsingTool", "bread", "Bread is cheap in the city. " * 30)
+        kept = {r["input"]: r["compacted"] for r in self.scratchpad.tool_results}
+        self.assertFalse(kept.pop("eiffel"))
+        self.assertTrue(all(kept.values()))
+        self.assertEqual(self.scratchpad.counts["dropped"], 1)  # three do not fit, even compacted
+
+    def test_oversized_single_result_is_compacted(self):
+        self.scratchpad.add_tool_result("WebBrowsingTool", "huge", PAGE * 10)
+        self.assertEqual(len(self.scratchpad.tool_results), 1)
+        self.assertTrue(self.scratchpad.tool_results[0]["compacted"])
+        self.assertLessEqual(self.scratchpad.token_count(), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
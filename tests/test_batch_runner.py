@@ -0,0 +1,138 @@
+"""
+Tests for the offline JSONL batch runner.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from models.batch_runner import (BatchRequest, BatchRunner, Checkpoint, LocalBatchBackend, ModelBackend,
+                                 read_requests)
+from models import client_registry
+from models.fake_model import FakeModel
+
+
+class FailingOnModel(FakeModel):
+    """A FakeModel that fails on messages containing "boom"."""
+
+    async def _agenerate_response(self, messages):
+        if "boom" in messages[-1]["content"]:
+            raise ValueError("boom")
+        return await super()._agenerate_response(messages)
+
+
+class ClientRecordingModel(FakeModel):
+    """A FakeModel that records the async client each call would use."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.clients = []
+        self._clients_lock = threading.Lock()
+
+    async def _agenerate_response(self, messages):
+        with self._clients_lock:
+            self.clients.append(client_registry.get_async_client())
+        return await super()._agenerate_response(messages)
+
+
+def requests(count):
+    return [BatchRequest(f"r{i}", [{"role": "user", "content": f"question {i}"}]) for i in range(count)]
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Tests for BatchRunner with the in-process and local upload backends."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "results.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_runs_every_request(self):
+        counts = BatchRunner(ModelBackend(FakeModel(), concurrency=3), self.output).run(requests(10))
+        self.assertEqual(counts, {"skipped": 0, "succeeded": 10, "failed": 0})
+        results = {record["custom_id"]: record for record in read_output(self.output)}
+        self.assertEqual(results["r4"]["output"], "echo: question 4")
+        self.assertIsNotNone(results["r4"]["usage"])
+
+    def test_errors_are_recorded(self):
+        batch = requests(2) + [BatchRequest("bad", [{"role": "user", "content": "boom"}])]
+        counts = BatchRunner(ModelBackend(FailingOnModel()), self.output).run(batch)
+        self.assertEqual(counts["failed"], 1)
+        errors = [record["error"] for record in read_output(self.output) if record["custom_id"] == "bad"]
+        self.assertEqual(errors, ["ValueError: boom"])
+
+    def test_resumes_after_partial_run(self):
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"custom_id": "r0", "output": "earlier"}) + "\n")
+            f.write('{"custom_id": "r1", "outp')  # cut short by a kill
+        model = FakeModel()
+        counts = BatchRunner(ModelBackend(model), self.output).run(requests(4))
+        self.assertEqual(counts, {"skipped": 1, "succeeded": 3, "failed": 0})
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(sorted(record["custom_id"] for record in read_output(self.output)), ["r0", "r1", "r2", "r3"])
+
+    def test_failed_requests_run_again(self):
+        batch = requests(2) + [BatchRequest("bad", [{"role": "user", "content": "boom"}])]
+        BatchRunner(ModelBackend(FailingOnModel()), self.output).run(batch)
+        model = FakeModel()
+        counts = BatchRunner(ModelBackend(model), self.output).run(batch)
+        self.assertEqual(counts, {"skipped": 2, "succeeded": 1, "failed": 0})
+        self.assertEqual(model.calls, 1)
+        records = {record["custom_id"]: record for record in read_output(self.output)}
+        self.assertEqual(len(read_output(self.output)), 3)
+        self.assertIsNone(records["bad"]["error"])
+
+    def test_each_run_gets_its_own_async_client(self):
+        settings = client_registry.get_settings()
+        self.addCleanup(client_registry.reset_clients)
+        self.addCleanup(setattr, client_registry, "_settings", settings)
+        client_registry.configure_clients(api_key="test-key", base_url="http://127.0.0.1:9/v1")
+
+        model = ClientRecordingModel()
+        backend = LocalBatchBackend(model, os.path.join(self.directory.name, "jobs"), max_requests=2)
+        BatchRunner(backend, self.output).run(requests(6))
+        clients = {id(client): client for client in model.clients}
+        self.assertEqual(len(clients), 3)  # one per job, each on its own worker thread and loop
+        self.assertTrue(all(client.is_closed() for client in clients.values()))
+        self.assertNotIn(id(client_registry.get_async_client()), clients)
+
+    def test_local_upload_backend(self):
+        backend = LocalBatchBackend(FakeModel(), os.path.join(self.directory.name, "jobs"), max_requests=4)
+        counts = BatchRunner(backend, self.output).run(requests(10))
+        self.assertEqual(counts["succeeded"], 10)
+        self.assertFalse(os.path.exists(self.output + ".state.json"))
+
+    def test_upload_backend_polls_submitted_jobs_after_restart(self):
+        jobs = os.path.join(self.directory.name, "jobs")
+        first = LocalBatchBackend(FakeModel(), jobs)
+        job_id = first.submit(requests(3))
+        checkpoint = Checkpoint(self.output + ".state.json")
+        checkpoint.data["jobs"] = {job_id: ["r0", "r1", "r2"]}
+        checkpoint.save()
+
+        model = FakeModel()
+        counts = BatchRunner(LocalBatchBackend(model, jobs), self.output).run(requests(3))
+        self.assertEqual(counts["succeeded"], 3)
+        self.assertLessEqual(model.calls, 3)  # nothing was submitted twice
+        self.assertEqual(len([name for name in os.listdir(jobs) if name.endswith(".input.jsonl")]), 1)
+
+    def test_task_builds_requests(self):
+        path = os.path.join(self.directory.name, "input.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"custom_id": "s1", "messages": [{"role": "user", "content": "hi"}]}) + "\n")
+        (request,) = read_requests(path, task="summary")
+        self.assertEqual(request.custom_id, "s1")
+        self.assertEqual(request.messages[-1]["role"], "system")
+
+
+if __name__ == "__main__":
+    unittest.main()
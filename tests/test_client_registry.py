@@ -0,0 +1,76 @@
+"""
+Tests for the shared API client registry.
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from models import client_registry
+from models.openai_wrapper import OpenAIModel
+from models.rate_limiter import RateLimiter
+
+
+class TestClientRegistry(unittest.TestCase):
+    """Tests for reuse, reconfiguration and lazy creation of the shared clients."""
+
+    def setUp(self):
+        self.addCleanup(client_registry.reset_clients)
+        settings = client_registry.get_settings()
+        self.addCleanup(setattr, client_registry, "_settings", settings)
+        client_registry.configure_clients(api_key="test-key", base_url="http://127.0.0.1:9/v1")
+
+    def test_clients_are_reused(self):
+        self.assertIs(client_registry.get_client(), client_registry.get_client())
+        self.assertIs(client_registry.get_async_client(), client_registry.get_async_client())
+
+    def test_settings_are_applied(self):
+        client_registry.configure_clients(timeout=12.0, max_retries=1, http2=False)
+        client = client_registry.get_client()
+        self.assertEqual(client.timeout.read, 12.0)
+        self.assertEqual(client.max_retries, 1)
+        self.assertEqual(client_registry.get_settings().api_key, "test-key")
+
+    def test_no_retry_clients_share_the_pool(self):
+        client = client_registry.get_client()
+        no_retry = client_registry.get_client(retries=False)
+        self.assertEqual(no_retry.max_retries, 0)
+        self.assertIs(no_retry._client, client._client)
+        self.assertIs(client_registry.get_client(retries=False), no_retry)
+        self.assertEqual(client_registry.get_async_client(retries=False).max_retries, 0)
+
+    def test_rate_limited_models_leave_retries_to_the_limiter(self):
+        self.assertGreater(OpenAIModel()._client().max_retries, 0)
+        self.assertEqual(OpenAIModel(rate_limiter=RateLimiter())._client().max_retries, 0)
+        self.assertEqual(OpenAIModel(rate_limiter=RateLimiter())._async_client().max_retries, 0)
+
+    def test_configure_replaces_clients(self):
+        client = client_registry.get_client()
+        async_client = client_registry.get_async_client()
+        client_registry.configure_clients(max_connections=10)
+        self.assertTrue(client.is_closed())
+        self.assertIsNot(client_registry.get_client(), client)
+        self.assertIsNot(client_registry.get_async_client(), async_client)
+        self.assertEqual(client_registry.get_settings().max_connections, 10)
+
+    def test_concurrent_first_use_builds_one_client(self):
+        real = client_registry.openai.OpenAI
+        barrier = threading.Barrier(8)
+        clients = []
+
+        def first_use():
+            barrier.wait()
+            clients.append(client_registry.get_client())
+
+        with mock.patch.object(client_registry.openai, "OpenAI", side_effect=real) as build:
+            threads = [threading.Thread(target=first_use) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
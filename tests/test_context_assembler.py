@@ -0,0 +1,78 @@
+"""
+Tests for token-budgeted context assembly.
+"""
+
+import unittest
+
+from agents.agent_interfaces import AgentState
+from agents.context_assembler import SUMMARY_PREFIX, ContextAssembler, extractive_summary
+from models.token_counter import estimate_message_tokens
+
+
+def conversation(turns, context=None):
+    state = AgentState(context=context)
+    state.add_message("system", "You are a helpful assistant.")
+    for i in range(turns):
+        state.add_message("user", f"Question number {i}. " + "padding " * 20)
+        state.add_message("assistant", f"Answer number {i}. " + "padding " * 20)
+    return state
+
+
+class TestContextAssembler(unittest.TestCase):
+    """Tests for the ContextAssembler class."""
+
+    def test_small_history_is_unchanged(self):
+        state = conversation(2, ContextAssembler(max_tokens=10_000))
+        self.assertEqual(state.get_messages_for_llm(), conversation(2).get_messages_for_llm())
+
+    def test_long_history_fits_budget(self):
+        """Test that the system prompt and latest turns survive and the budget holds."""
+        state = conversation(50, ContextAssembler(max_tokens=400, background=False))
+        messages = state.get_messages_for_llm()
+        self.assertEqual(messages[0]["content"], "You are a helpful assistant.")
+        self.assertEqual(messages[-1], state.get_messages_for_llm()[-1])
+        self.assertTrue(messages[-1]["content"].startswith("Answer number 49."))
+        self.assertLessEqual(estimate_message_tokens(messages), 400)
+
+    def test_older_turns_are_summarized(self):
+        context = ContextAssembler(max_tokens=400)
+        state = conversation(50, context)
+        state.get_messages_for_llm()
+        context.wait(5)
+        messages = state.get_messages_for_llm()
+        self.assertTrue(messages[1]["content"].startswith(SUMMARY_PREFIX))
+        self.assertIn("Question number", messages[1]["content"])
+        self.assertLessEqual(estimate_message_tokens(messages), 400)
+
+    def test_keep_recent_overrides_budget(self):
+        state = conversation(3, ContextAssembler(max_tokens=10, keep_recent=2, background=False))
+        messages = state.get_messages_for_llm()
+        self.assertEqual([message["role"] for message in messages], ["system", "user", "assistant"])
+
+    def test_token_counts_are_cached(self):
+        context = ContextAssembler(max_tokens=10_000)
+        state = conversation(1, context)
+        state.get_messages_for_llm()
+        message = state.history[1]
+        self.assertEqual(message.token_cache[0], message.content)
+        message.content = "changed"
+        self.assertEqual(context.message_tokens(message), 4 + 2)
+
+
+class TestExtractiveSummary(unittest.TestCase):
+    """Tests for the local summarizer."""
+
+    def test_keeps_first_sentences_within_budget(self):
+        summary = extractive_summary("", [
+            {"role": "user", "content": "Where is Paris? I was wondering."},
+            {"role": "assistant", "content": "Paris is in France. It is the capital."},
+        ], 100)
+        self.assertEqual(summary, "user: Where is Paris?\nassistant: Paris is in France.")
+
+    def test_drops_oldest_lines_first(self):
+        summary = extractive_summary("user: old line", [{"role": "user", "content": "new line"}], 4)
+        self.assertEqual(summary, "user: new line")
+
+
+if __name__ == "__main__":
+    unittest.main()
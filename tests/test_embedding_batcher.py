@@ -0,0 +1,109 @@
+"""
+Tests for micro-batching of embedding requests.
+"""
+
+import asyncio
+import threading
+import unittest
+
+import numpy as np
+
+from models.embedding_batcher import EmbeddingBatcher
+from models.fake_model import FakeModel
+
+
+class CountingModel(FakeModel):
+    """A FakeModel that records the batches it is asked to embed."""
+
+    def __init__(self, fail=False, **kwargs):
+        super().__init__(**kwargs)
+        self.fail = fail
+        self.batches = []
+
+    def _generate_embeddings(self, texts, model):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise ConnectionError("backend down")
+        return super()._generate_embeddings(texts, model)
+
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    """Tests for the EmbeddingBatcher class."""
+
+    def setUp(self):
+        self.inner = CountingModel()
+        self.batcher = EmbeddingBatcher(self.inner, max_batch=8, max_delay=0.05)
+
+    def tearDown(self):
+        self.batcher.close()
+
+    def _concurrently(self, texts):
+        results = {}
+        start = threading.Barrier(len(texts))
+
+        def embed(text):
+            start.wait()
+            results[text] = self.batcher.generate_embedding(text)
+
+        threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_merges_concurrent_requests(self):
+        texts = [f"text {i}" for i in range(6)]
+        results = self._concurrently(texts)
+        self.assertEqual(len(self.inner.batches), 1)
+        for text in texts:
+            np.testing.assert_array_equal(results[text], self.inner.generate_embedding(text))
+
+    def test_full_batch_is_sent_early(self):
+        texts = [f"text {i}" for i in range(16)]
+        self.batcher.max_delay = 5.0
+        self._concurrently(texts)
+        self.assertEqual(sorted(len(batch) for batch in self.inner.batches), [8, 8])
+
+    def test_duplicate_texts_embedded_once(self):
+        futures = [self.batcher.submit(["same"]) for _ in range(3)]
+        rows = [future.result() for future in futures]
+        self.assertEqual(self.inner.batches, [["same"]])
+        np.testing.assert_array_equal(rows[0], rows[2])
+
+    def test_large_requests_bypass_batching(self):
+        matrix = self.batcher.generate_embeddings([f"t{i}" for i in range(10)])
+        self.assertEqual(matrix.shape[0], 10)
+        self.assertEqual(self.batcher.stats()["requests"], 0)
+
+    def test_failure_reaches_every_caller(self):
+        batcher = EmbeddingBatcher(CountingModel(fail=True), max_delay=0.05)
+        futures = [batcher.submit([f"t{i}"]) for i in range(3)]
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result()
+        batcher.close()
+
+    def test_async_callers(self):
+        async def main():
+            return await asyncio.gather(*(self.batcher.agenerate_embedding(f"t{i}") for i in range(5)))
+
+        rows = asyncio.run(main())
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(self.batcher.stats()["batches"], 1)
+
+    def test_cancelled_caller_does_not_strand_the_batch(self):
+        async def main():
+            cancelled = asyncio.ensure_future(self.batcher.agenerate_embedding("dropped"))
+            waiting = asyncio.ensure_future(self.batcher.agenerate_embedding("kept"))
+            await asyncio.sleep(0.01)  # both are queued in the same batch
+            cancelled.cancel()
+            return await asyncio.wait_for(waiting, timeout=2.0)
+
+        row = asyncio.run(main())
+        np.testing.assert_array_equal(row, self.inner.generate_embedding("kept"))
+        self.assertEqual(self.inner.batches[0], ["kept"])
+
+
+if __name__ == "__main__":
+    unittest.main()
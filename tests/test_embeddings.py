@@ -0,0 +1,162 @@
+"""
+Tests for batched embedding support in the model layer.
+"""
+
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from models.abstract_model import AbstractModel
+from models.embedding_cache import EmbeddingCache
+from models import token_counter
+from models.token_counter import batch_by_tokens, estimate_tokens
+
+
+class LengthEmbeddingModel(AbstractModel):
+    """A model that embeds a text as [len(text), 1.0] and records what it embedded."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.embedded = []
+
+    def _generate_response(self, messages):
+        raise NotImplementedError
+
+    def _generate_embeddings(self, texts, model):
+        self.embedded.extend(texts)
+        return np.asarray([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+class TestBatchByTokens(unittest.TestCase):
+    """Tests for request-sized batching."""
+
+    def test_respects_item_limit(self):
+        """Test that no batch exceeds max_items."""
+        batches = list(batch_by_tokens(["a"] * 5, max_items=2, max_tokens=100))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_respects_token_limit(self):
+        """Test that batches are split on the token budget, in order."""
+        texts = ["x" * 40, "x" * 40, "x" * 40]  # ~10 tokens each
+        batches = list(batch_by_tokens(texts, max_items=10, max_tokens=25))
+        self.assertEqual(batches, [[0, 1], [2]])
+
+    def test_oversized_text_gets_own_batch(self):
+        """Test that a text larger than the budget is still sent."""
+        batches = list(batch_by_tokens(["x" * 400, "y"], max_items=10, max_tokens=10))
+        self.assertEqual(batches, [[0], [1]])
+
+
+class TestEstimateTokens(unittest.TestCase):
+    """Tests for the tokenizer fallback."""
+
+    def setUp(self):
+        token_counter._encoding.cache_clear()
+        token_counter._named_encoding.cache_clear()
+        self.addCleanup(token_counter._encoding.cache_clear)
+        self.addCleanup(token_counter._named_encoding.cache_clear)
+
+    def test_unloadable_vocabulary_falls_back_once(self):
+        tiktoken = mock.Mock()
+        tiktoken.encoding_name_for_model.return_value = "o200k_base"
+        tiktoken.get_encoding.side_effect = ConnectionError("offline")
+        with mock.patch.object(token_counter, "tiktoken", tiktoken):
+            self.assertEqual(estimate_tokens("x" * 40, "gpt-4o"), 10)
+            self.assertEqual(estimate_tokens("x" * 40, "gpt-4o-mini"), 10)
+        tiktoken.get_encoding.assert_called_once_with("o200k_base")
+
+
+class TestGenerateEmbeddings(unittest.TestCase):
+    """Tests for AbstractModel.generate_embeddings."""
+
+    def test_returns_float32_rows_in_order(self):
+        """Test that rows come back in input order."""
+        model = LengthEmbeddingModel()
+        matrix = model.generate_embeddings(["a", "bbb", "cc"])
+
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_array_equal(matrix[:, 0], [1.0, 3.0, 2.0])
+
+    def test_single_embedding(self):
+        """Test that generate_embedding returns one vector."""
+        model = LengthEmbeddingModel()
+        np.testing.assert_array_equal(model.generate_embedding("abcd"), [4.0, 1.0])
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Tests for the memory-mapped EmbeddingCache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_only_misses_reach_backend(self):
+        """Test that cached texts are served locally and merged in order."""
+        model = LengthEmbeddingModel(embedding_cache=EmbeddingCache(self.temp_dir.name))
+        model.generate_embeddings(["a", "bb"])
+        matrix = model.generate_embeddings(["bb", "ccc", "a"])
+
+        self.assertEqual(model.embedded, ["a", "bb", "ccc"])
+        np.testing.assert_array_equal(matrix[:, 0], [2.0, 3.0, 1.0])
+
+    def test_key_includes_model(self):
+        """Test that the same text under another model is a miss."""
+        cache = EmbeddingCache(self.temp_dir.name)
+        cache.put("small", "text", [1.0, 2.0])
+
+        self.assertIsNone(cache.get("large", "text"))
+        np.testing.assert_array_equal(cache.get("small", "text"), [1.0, 2.0])
+
+    def test_survives_reopen_and_growth(self):
+        """Test that vectors written across several resizes are mapped back on reopen."""
+        cache = EmbeddingCache(self.temp_dir.name, initial_capacity=2)
+        texts = [f"text {i}" for i in range(10)]
+        cache.put_many("m", texts, np.arange(20, dtype=np.float32).reshape(10, 2))
+        cache.close()
+
+        reopened = EmbeddingCache(self.temp_dir.name)
+        matrix, hits = reopened.get_many("m", texts)
+
+        self.assertTrue(hits.all())
+        np.testing.assert_array_equal(matrix[9], [18.0, 19.0])
+
+    def test_eviction_is_size_bounded(self):
+        """Test that a full cache replaces entries, sparing recently hit ones."""
+        cache = EmbeddingCache(self.temp_dir.name, max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertIsNotNone(cache.get("m", "a"))
+        self.assertIsNone(cache.get("m", "b"))
+
+    def test_dimension_mismatch(self):
+        """Test that vectors of a different size from the same model are rejected."""
+        cache = EmbeddingCache(self.temp_dir.name)
+        cache.put("m", "a", [1.0, 2.0])
+        with self.assertRaises(ValueError):
+            cache.put("m", "b", [1.0, 2.0, 3.0])
+
+    def test_models_of_different_dimensions_share_a_cache(self):
+        """Test that each model keeps its own dimension, across evictions and a reopen."""
+        cache = EmbeddingCache(self.temp_dir.name, max_entries=3)
+        cache.put("small", "a", [1.0, 2.0])
+        cache.put("large", "a", [1.0, 2.0, 3.0])
+        cache.put("large", "b", [4.0, 5.0, 6.0])
+        cache.put("small", "b", [3.0, 4.0])  # evicts small/a
+        cache.close()
+
+        reopened = EmbeddingCache(self.temp_dir.name)
+        self.assertEqual(reopened.dims, {"small": 2, "large": 3})
+        self.assertIsNone(reopened.get("small", "a"))
+        np.testing.assert_array_equal(reopened.get("small", "b"), [3.0, 4.0])
+        np.testing.assert_array_equal(reopened.get("large", "a"), [1.0, 2.0, 3.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
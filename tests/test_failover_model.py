@@ -0,0 +1,175 @@
+"""
+Tests for multi-backend failover with circuit breakers.
+"""
+
+import asyncio
+import time
+import unittest
+
+from models.failover_model import BackendsUnavailable, BreakerState, CircuitBreaker, FailoverModel
+from models.fake_model import FakeModel, LatencyDistribution
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class FlakyModel(FakeModel):
+    """A FakeModel that fails while `down` is set."""
+
+    def __init__(self, *args, error=ConnectionError("backend down"), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.down = True
+        self.error = error
+        self.calls = 0
+
+    def _generate_response(self, messages):
+        self.calls += 1
+        if self.down:
+            raise self.error
+        return super()._generate_response(messages)
+
+    async def _agenerate_response(self, messages):
+        self.calls += 1
+        if self.down:
+            raise self.error
+        return await super()._agenerate_response(messages)
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the CircuitBreaker class."""
+
+    def test_opens_on_error_rate(self):
+        breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5)
+        for _ in range(2):
+            breaker.record_success(0.1)
+        breaker.record_failure()
+        self.assertIs(breaker.state, BreakerState.CLOSED)
+        breaker.record_failure()
+        self.assertIs(breaker.state, BreakerState.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker(min_calls=3, slow_call_seconds=1.0, slow_call_rate=0.6)
+        for latency in (0.1, 2.0, 3.0):
+            breaker.record_success(latency)
+        self.assertIs(breaker.state, BreakerState.OPEN)
+
+    def test_half_open_probes_close_the_breaker(self):
+        breaker = CircuitBreaker(min_calls=1, open_seconds=0.0, half_open_probes=2)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertIs(breaker.state, BreakerState.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # both probes are in flight
+        breaker.record_success(0.1)
+        breaker.record_success(0.1)
+        self.assertIs(breaker.state, BreakerState.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(min_calls=1, open_seconds=0.0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertIs(breaker.state, BreakerState.OPEN)
+        self.assertEqual(breaker.health()["times_opened"], 2)
+
+
+class TestFailoverModel(unittest.TestCase):
+    """Tests for the FailoverModel class."""
+
+    def setUp(self):
+        self.primary = FlakyModel(default="primary", model="primary")
+        self.standby = FakeModel(default="standby", model="standby")
+        self.model = FailoverModel([self.primary, self.standby], min_calls=3, open_seconds=60.0)
+
+    def test_uses_primary_when_healthy(self):
+        self.primary.down = False
+        response = self.model.generate_response(user("hi"))
+        self.assertEqual(response.output, "primary")
+        self.assertEqual(response.metadata["backend"], "0:primary")
+        self.assertNotIn("failover", response.metadata)
+
+    def test_fails_over_and_stops_calling_open_backend(self):
+        for _ in range(5):
+            response = self.model.generate_response(user("hi"))
+            self.assertEqual(response.output, "standby")
+            self.assertTrue(response.metadata["failover"])
+        self.assertEqual(self.primary.calls, 3)  # the breaker opened after min_calls
+        self.assertEqual(self.model.health()[0]["state"], "open")
+
+    def test_recovers_through_half_open_probes(self):
+        model = FailoverModel([self.primary, self.standby], min_calls=1, open_seconds=0.05, half_open_probes=1)
+        model.generate_response(user("hi"))
+        self.assertEqual(model.health()[0]["state"], "open")
+        self.primary.down = False
+        time.sleep(0.06)
+        self.assertEqual(model.generate_response(user("hi")).output, "primary")
+        self.assertEqual(model.health()[0]["state"], "closed")
+
+    def test_all_backends_down(self):
+        model = FailoverModel([self.primary, FlakyModel(model="other")])
+        with self.assertRaises(BackendsUnavailable):
+            model.generate_response(user("hi"))
+
+    def test_caller_errors_do_not_fail_over(self):
+        self.primary.error = BadRequest("malformed")
+        with self.assertRaises(BadRequest):
+            self.model.generate_response(user("hi"))
+        self.assertEqual(self.model.health()[0]["calls"], 0)
+
+    def test_async_failover(self):
+        response = asyncio.run(self.model.agenerate_response(user("hi")))
+        self.assertEqual(response.output, "standby")
+
+    def test_stream_records_backend(self):
+        self.primary.down = False
+        stream = self.model.stream_response(user("hi"))
+        self.assertEqual("".join(stream), "primary")
+        self.assertEqual(stream.response.metadata["backend"], "0:primary")
+        self.assertEqual(self.model.health()[0]["calls"], 1)
+
+    def tripped(self, **kwargs):
+        model = FailoverModel([self.primary, self.standby], min_calls=1, open_seconds=0.05, half_open_probes=1)
+        model.generate_response(user("hi"))
+        self.primary.down = False
+        time.sleep(0.06)
+        return model
+
+    def test_cancelled_probe_is_given_back(self):
+        model = self.tripped()
+        self.primary.latency = LatencyDistribution("constant", 1.0)
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(model.agenerate_response(user("hi")))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_probe())
+        self.assertEqual(model.health()[0]["state"], "half_open")
+        self.primary.latency = LatencyDistribution()
+        self.assertEqual(model.generate_response(user("hi")).output, "primary")
+        self.assertEqual(model.health()[0]["state"], "closed")
+
+    def test_abandoned_stream_probe_is_given_back(self):
+        self.primary.default = "several words from the primary"
+        model = self.tripped()
+        stream = iter(model.stream_response(user("hi")))
+        next(stream)
+        stream.close()
+        self.assertTrue(model.breakers[0].allow())
+
+    def test_unread_stream_probe_is_given_back(self):
+        model = self.tripped()
+        model.stream_response(user("hi"))  # dropped without being iterated
+        self.assertTrue(model.breakers[0].allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
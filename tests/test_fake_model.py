@@ -0,0 +1,100 @@
+"""
+Tests for the offline fake model backend.
+"""
+
+import asyncio
+import random
+import unittest
+
+import numpy as np
+
+from models.fake_model import FakeModel, LatencyDistribution
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class TestFakeModel(unittest.TestCase):
+    """Tests for the FakeModel class."""
+
+    def test_scripted_responses_cycle(self):
+        """Test that scripted responses are replayed in order and then cycled."""
+        model = FakeModel(responses=["one", "two"])
+        outputs = [model.generate_response(user("hi")).output for _ in range(3)]
+        self.assertEqual(outputs, ["one", "two", "one"])
+
+    def test_rules_take_precedence(self):
+        """Test that a matching rule wins over the script."""
+        model = FakeModel(
+            responses=["scripted"],
+            rules=[(r"https?://", '{"tool": "WebBrowsingTool"}'), (r"weather", lambda messages: "sunny")],
+        )
+        self.assertEqual(model.generate_response(user("read https://example.com")).output, '{"tool": "WebBrowsingTool"}')
+        self.assertEqual(model.generate_response(user("the WEATHER today")).output, "sunny")
+        self.assertEqual(model.generate_response(user("hello")).output, "scripted")
+
+    def test_default_echoes(self):
+        """Test that the default response echoes the last message."""
+        model = FakeModel()
+        self.assertEqual(model.generate_response(user("ping")).output, "echo: ping")
+
+    def test_usage_is_reported(self):
+        """Test that token counts are reported."""
+        response = FakeModel(responses=["a short answer"]).generate_response(user("question"))
+        usage = response.usage
+        self.assertGreater(usage.input_tokens, 0)
+        self.assertGreater(usage.output_tokens, 0)
+        self.assertEqual(usage.total_tokens, usage.input_tokens + usage.output_tokens)
+
+    def test_streaming_rejoins_output(self):
+        """Test that streamed deltas rejoin into the full output."""
+        model = FakeModel(responses=["several words  of   output"])
+        stream = model.stream_response(user("hi"))
+        deltas = list(stream)
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas), "several words  of   output")
+        self.assertEqual(stream.response.output, "several words  of   output")
+
+    def test_async_generation(self):
+        """Test the coroutine path."""
+        model = FakeModel(responses=["async"])
+        response = asyncio.run(model.agenerate_response(user("hi")))
+        self.assertEqual(response.output, "async")
+
+    def test_embeddings_are_deterministic(self):
+        """Test that equal texts embed identically and vectors are unit length."""
+        model = FakeModel(embedding_dim=16)
+        matrix = model.generate_embeddings(["a", "b", "a"])
+        self.assertEqual(matrix.shape, (3, 16))
+        np.testing.assert_array_equal(matrix[0], matrix[2])
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+
+class TestLatencyDistribution(unittest.TestCase):
+    """Tests for simulated latency sampling."""
+
+    def test_constant(self):
+        self.assertEqual(LatencyDistribution("constant", 0.25).sample(random.Random(0)), 0.25)
+
+    def test_seeded_samples_repeat(self):
+        """Test that a seeded distribution is reproducible."""
+        distribution = LatencyDistribution("lognormal", 0.1, 0.5)
+        first = [distribution.sample(random.Random(7)) for _ in range(3)]
+        second = [distribution.sample(random.Random(7)) for _ in range(3)]
+        self.assertEqual(first, second)
+
+    def test_lognormal_mean(self):
+        """Test that the lognormal distribution is centred on the requested mean."""
+        rng = random.Random(1)
+        distribution = LatencyDistribution("lognormal", 0.2, 0.5)
+        samples = [distribution.sample(rng) for _ in range(20000)]
+        self.assertAlmostEqual(sum(samples) / len(samples), 0.2, delta=0.01)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            LatencyDistribution("bimodal", 0.1).sample(random.Random(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Tests for hedged model requests.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from models.fake_model import FakeModel
+from models.hedging import Hedger, LatencyHistogram
+from models.rate_limiter import RateLimiter
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class ScriptedLatency:
+    """Latencies replayed in order, then `rest` forever."""
+
+    def __init__(self, delays, rest=0.0):
+        self.delays = list(delays)
+        self.rest = rest
+
+    def sample(self, rng):
+        return self.delays.pop(0) if self.delays else self.rest
+
+
+def warmed_hedger(model, samples=20, seconds=0.01):
+    hedger = Hedger(percentile=0.9, max_fraction=0.5, min_samples=samples)
+    for _ in range(samples):
+        hedger.histogram(model).record(seconds)
+    hedger.calls = samples  # let the warm-up count towards the hedge budget
+    return hedger
+
+
+class SlowAdmission(RateLimiter):
+    """A limiter that keeps every call queued for `wait` seconds."""
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+    def call(self, fn, estimated_tokens=0, usage_of=None):
+        time.sleep(self.wait)
+        return super().call(fn, estimated_tokens, usage_of)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for i in range(100):
+            histogram.record(i / 100)
+        self.assertAlmostEqual(histogram.percentile(0.95), 0.95)
+        self.assertIsNone(LatencyHistogram().percentile(0.5))
+
+    def test_window_forgets_old_samples(self):
+        histogram = LatencyHistogram(window=2)
+        for seconds in (5.0, 0.1, 0.2):
+            histogram.record(seconds)
+        self.assertEqual(histogram.percentile(0.99), 0.2)
+
+
+class TestHedging(unittest.TestCase):
+    """Tests for hedging in AbstractModel."""
+
+    def test_slow_call_is_hedged(self):
+        model = FakeModel(responses=["answer"], temperature=0.0, latency=ScriptedLatency([1.0]))
+        model.hedger = warmed_hedger(model.model)
+        started = time.monotonic()
+        self.assertEqual(model.generate_response(user("q")).output, "answer")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(model.hedger.hedged, 1)
+        self.assertEqual(model.hedger.hedge_wins, 1)
+
+    def test_async_loser_is_cancelled(self):
+        model = FakeModel(responses=["answer"], temperature=0.0, latency=ScriptedLatency([1.0]))
+        model.hedger = warmed_hedger(model.model)
+
+        async def scenario():
+            started = time.monotonic()
+            response = await model.agenerate_response(user("q"))
+            await asyncio.sleep(0)
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            return response, time.monotonic() - started, pending
+
+        response, elapsed, pending = asyncio.run(scenario())
+        self.assertEqual(response.output, "answer")
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(pending, [])
+
+    def test_sampled_calls_are_not_hedged(self):
+        model = FakeModel(responses=["answer"], temperature=0.7, latency=ScriptedLatency([0.2]))
+        model.hedger = warmed_hedger(model.model)
+        model.generate_response(user("q"))
+        self.assertEqual(model.hedger.hedged, 0)
+        self.assertEqual(model.calls, 1)
+
+    def test_hedge_volume_is_capped(self):
+        hedger = warmed_hedger("m")
+        hedger.max_fraction = 0.0
+        self.assertEqual(hedger.call("m", lambda: time.sleep(0.05) or "slow"), "slow")
+        self.assertEqual(hedger.hedged, 0)
+
+    def test_unhedgeable_calls_stay_on_the_callers_thread(self):
+        hedger = warmed_hedger("m")
+        hedger.max_fraction = 0.0
+        caller = threading.get_ident()
+        self.assertEqual(hedger.call("m", threading.get_ident), caller)
+
+        threads = [threading.Thread(target=hedger.call, args=("m", lambda: time.sleep(0.2))) for _ in range(96)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_watched_calls_are_bounded(self):
+        hedger = warmed_hedger("m", seconds=1.0)
+        hedger.max_watched = 1
+        seen = []
+        barrier = threading.Barrier(2)
+
+        def fn():
+            seen.append(threading.current_thread().name)
+            barrier.wait(timeout=1)
+
+        threads = [threading.Thread(target=hedger.call, args=("m", fn), name=f"caller-{i}") for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(name.startswith("hedge") for name in seen), 1)
+
+    def test_limiter_wait_does_not_trigger_hedges(self):
+        model = FakeModel(responses=["answer"], temperature=0.0, rate_limiter=SlowAdmission(0.2))
+        model.hedger = warmed_hedger(model.model)
+        self.assertEqual(model.generate_response(user("q")).output, "answer")
+        self.assertEqual(model.hedger.hedged, 0)
+        self.assertLess(model.hedger.histogram(model.model).percentile(1.0), 0.1)
+
+    def test_no_hedging_before_enough_samples(self):
+        hedger = Hedger(min_samples=5)
+        self.assertIsNone(hedger.hedge_delay("m"))
+        hedger.call("m", lambda: None)
+        self.assertEqual(len(hedger.histogram("m")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests for the local hashed n-gram embedder.
+"""
+
+import unittest
+
+import numpy as np
+
+from models.local_embedder import HashedNgramEmbedder, hashed_ngram_matrix
+
+
+class TestHashedNgramMatrix(unittest.TestCase):
+    """Tests for hashed_ngram_matrix."""
+
+    def test_rows_are_unit_vectors(self):
+        matrix = hashed_ngram_matrix(["alpha beta", "gamma"], dim=64)
+        self.assertEqual(matrix.shape, (2, 64))
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+    def test_similar_texts_are_closer(self):
+        a, b, c = hashed_ngram_matrix(
+            ["the cat sat on the mat", "a cat sat on the mat", "quarterly revenue grew"], dim=256)
+        self.assertGreater(a @ b, a @ c + 0.3)
+
+    def test_batch_does_not_leak_between_texts(self):
+        texts = ["first text", "second", "third one here"]
+        batched = hashed_ngram_matrix(texts, dim=128)
+        alone = np.vstack([hashed_ngram_matrix([text], dim=128) for text in texts])
+        np.testing.assert_array_equal(batched, alone)
+
+    def test_empty_inputs(self):
+        self.assertEqual(hashed_ngram_matrix([], dim=32).shape, (0, 32))
+        np.testing.assert_array_equal(hashed_ngram_matrix([""], dim=32), np.zeros((1, 32), dtype=np.float32))
+
+    def test_seed_changes_vectors(self):
+        a = hashed_ngram_matrix(["same text"], dim=64, seed=0)
+        b = hashed_ngram_matrix(["same text"], dim=64, seed=1)
+        self.assertFalse(np.array_equal(a, b))
+
+
+class TestHashedNgramEmbedder(unittest.TestCase):
+    """Tests for the HashedNgramEmbedder model."""
+
+    def test_embeddings_through_model_interface(self):
+        embedder = HashedNgramEmbedder(dim=64)
+        vector = embedder.generate_embedding("hello world")
+        self.assertEqual(vector.shape, (64,))
+        self.assertEqual(embedder.embedding_model, "hashed-ngram-64-3-5-s0")
+
+    def test_chunked_path_matches_single_batch(self):
+        texts = [f"message {i} about topic {i % 7}" for i in range(50)]
+        embedder = HashedNgramEmbedder(dim=64, workers=1)
+        chunked = HashedNgramEmbedder(dim=64, workers=2, parallel_threshold=10, chunk_size=16)
+        np.testing.assert_array_equal(chunked.generate_embeddings(texts), embedder.generate_embeddings(texts))
+
+    def test_does_not_generate_text(self):
+        with self.assertRaises(NotImplementedError):
+            HashedNgramEmbedder().generate_response([{"role": "user", "content": "hi"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
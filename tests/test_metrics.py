@@ -0,0 +1,179 @@
+"""
+Tests for per-call model metrics.
+"""
+
+import asyncio
+import gc
+import json
+import os
+import tempfile
+import unittest
+
+from agents.agent_interfaces import AgentState
+from agents.thinking_styles import ThinkingConfig, ThinkStyle, think
+from communication.generic_request import GenericRequest
+from models.fake_model import FakeModel
+from models.metrics import (InMemoryMetrics, JsonlMetricsSink, MetricsSink, component, configure_metrics,
+                            reset_metrics)
+from models.model_response import ModelResponseStream
+from models.rate_limiter import RateLimiter
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class FlakyModel(FakeModel):
+    """Throttled on the first call."""
+
+    def _generate_response(self, messages):
+        if self.calls == 0:
+            self.calls += 1
+            raise Throttled()
+        return super()._generate_response(messages)
+
+
+class BreakingStreamModel(FakeModel):
+    """Streams break after the first token."""
+
+    def _stream_response(self, messages):
+        def deltas():
+            yield "partial"
+            raise ConnectionError("reset")
+
+        return ModelResponseStream(deltas())
+
+
+class ListSink(MetricsSink):
+    def __init__(self):
+        self.blocks = []
+
+    def record(self, metrics):
+        self.blocks.append(metrics)
+
+
+class TestStreamMetrics(unittest.TestCase):
+    """Tests that streams are measured once their consumer is done with them."""
+
+    def setUp(self):
+        self.sink = ListSink()
+        configure_metrics(self.sink)
+        self.addCleanup(reset_metrics)
+
+    def errors(self):
+        return [block["error"] for block in self.sink.blocks]
+
+    def test_drained_stream_is_recorded_once(self):
+        stream = FakeModel(responses=["a few words"]).stream_response(user("q"))
+        self.assertEqual(self.sink.blocks, [])
+        stream.get_response()
+        del stream
+        gc.collect()
+        self.assertEqual(self.errors(), [None])
+
+    def test_failure_mid_stream_is_recorded(self):
+        stream = BreakingStreamModel().stream_response(user("q"))
+        with self.assertRaises(ConnectionError):
+            list(stream)
+        self.assertEqual(self.errors(), ["ConnectionError"])
+
+    def test_closed_stream_is_recorded(self):
+        model = FakeModel(responses=["a few words here"], token_interval=0.05)
+        stream = model.stream_response(user("q"))
+        next(iter(stream))
+        self.assertEqual(self.sink.blocks, [])  # the rest may still be read
+        stream.close()
+        self.assertEqual(self.errors(), ["abandoned"])
+        self.assertIsNone(stream.get_response())
+        self.assertGreater(self.sink.blocks[0]["latency"], 0.0)
+
+    def test_unread_stream_is_recorded(self):
+        FakeModel().stream_response(user("q"))
+        gc.collect()
+        self.assertEqual(self.errors(), ["abandoned"])
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for metrics blocks and sinks."""
+
+    def setUp(self):
+        self.sink = InMemoryMetrics()
+        configure_metrics(self.sink)
+
+    def tearDown(self):
+        reset_metrics()
+
+    def test_block_is_attached(self):
+        with component("ToolSelectionAgent"):
+            response = FakeModel(responses=["an answer"]).generate_response(user("question"))
+        metrics = response.metadata["metrics"]
+        self.assertEqual(metrics["component"], "ToolSelectionAgent")
+        self.assertEqual(metrics["kind"], "generate")
+        self.assertEqual(metrics["total_tokens"], response.usage.total_tokens)
+        self.assertFalse(metrics["usage_estimated"])
+        self.assertEqual(metrics["retries"], 0)
+        self.assertGreaterEqual(metrics["latency"], metrics["ttfb"])
+
+    def test_components_nest_and_follow_coroutines(self):
+        model = FakeModel()
+
+        async def call():
+            with component("inner"):
+                return await model.agenerate_response(user("q"))
+
+        with component("outer"):
+            response = asyncio.run(call())
+        self.assertEqual(response.metadata["metrics"]["component"], "outer/inner")
+
+    def test_retries_are_counted(self):
+        model = FlakyModel(rate_limiter=RateLimiter(base_delay=0.001))
+        response = model.generate_response(user("q"))
+        self.assertEqual(response.metadata["metrics"]["retries"], 1)
+
+    def test_stream_reports_time_to_first_delta(self):
+        stream = FakeModel(responses=["a few words here"], token_interval=0.01).stream_response(user("q"))
+        list(stream)
+        metrics = stream.response.metadata["metrics"]
+        self.assertEqual(metrics["kind"], "stream")
+        self.assertLess(metrics["ttfb"], metrics["latency"])
+
+    def test_thinking_stages_are_tagged(self):
+        state = AgentState(input=GenericRequest(content="question"))
+        think(FakeModel(responses=["draft ⧉ANSWER⧉ answer", "NONE"]), state,
+              ThinkingConfig(style=ThinkStyle.REFLECTIVE), None)
+        self.assertEqual(set(self.sink.summary()), {"reflective.draft", "reflective.critique"})
+
+    def test_histograms_per_component(self):
+        model = FakeModel()
+        for name in ("a", "a", "b"):
+            with component(name):
+                model.generate_response(user("q"))
+        summary = self.sink.summary()
+        self.assertEqual(summary["a"]["calls"], 2)
+        self.assertEqual(summary["b"]["calls"], 1)
+        self.assertIsNotNone(summary["a"]["latency_p95"])
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(Throttled):
+            FlakyModel().generate_response(user("q"))
+        self.assertEqual(self.sink.summary()["untagged"]["errors"], 1)
+
+    def test_jsonl_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            sink = JsonlMetricsSink(path)
+            configure_metrics(sink)
+            FakeModel().generate_response(user("q"))
+            FakeModel().generate_embeddings(["a", "b"])
+            sink.close()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["kind"] for line in lines], ["generate", "embed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
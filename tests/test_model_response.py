@@ -0,0 +1,110 @@
+"""
+Tests for the compact ModelResponse.
+"""
+
+import unittest
+
+from models.model_response import ModelResponse, ModelResponseStream, Usage
+from models.response_cache import ResponseCache
+
+
+class TestModelResponse(unittest.TestCase):
+    """Tests for the ModelResponse class."""
+
+    def test_has_no_instance_dict(self):
+        response = ModelResponse(output="hi")
+        self.assertFalse(hasattr(response, "__dict__"))
+        with self.assertRaises(AttributeError):
+            response.payload = {}
+
+    def test_raw_loader_runs_once_on_access(self):
+        calls = []
+        response = ModelResponse(output="hi", raw=lambda: calls.append(1) or {"id": "resp_1"})
+        self.assertEqual(calls, [])
+        self.assertEqual(response.raw, {"id": "resp_1"})
+        self.assertEqual(response.data, {"id": "resp_1"})
+        self.assertEqual(calls, [1])
+
+    def test_data_keyword_is_still_accepted(self):
+        self.assertEqual(ModelResponse(data={"id": 1}, output="hi").raw, {"id": 1})
+
+    def test_usage_total(self):
+        self.assertEqual(Usage(3, 4).total_tokens, 7)
+
+    def test_copy_has_its_own_metadata(self):
+        original = ModelResponse(output="hi", usage=Usage(1, 2), metadata={"a": 1})
+        copy = original.copy()
+        copy.metadata["b"] = 2
+        self.assertEqual(original.metadata, {"a": 1})
+        self.assertEqual(copy.usage, original.usage)
+
+    def test_cache_round_trip_keeps_usage(self):
+        cache = ResponseCache()
+        cache.put("key", ModelResponse(output="hi", usage=Usage(5, 6), finish_reason="stop"))
+        cached = cache.get("key")
+        self.assertEqual(cached.usage, Usage(5, 6))
+        self.assertEqual(cached.finish_reason, "stop")
+
+
+def broken(deltas, error):
+    yield from deltas
+    raise error
+
+
+class TestModelResponseStream(unittest.TestCase):
+    """Tests for the ModelResponseStream class."""
+
+    def test_deltas_arrive_in_order(self):
+        done = []
+        stream = ModelResponseStream(iter(["Hel", "", "lo", " world"]))
+        stream.add_done_callback(done.append)
+        self.assertEqual(list(stream), ["Hel", "lo", " world"])
+        self.assertEqual(stream.response.output, "Hello world")
+        self.assertEqual([response.output for response in done], ["Hello world"])
+        self.assertIsNotNone(stream.first_delta_at)
+
+    def test_get_response_after_partial_read(self):
+        for source in (["a", "b", "c"], iter(["a", "b", "c"])):
+            stream = ModelResponseStream(source)
+            self.assertEqual(next(iter(stream)), "a")
+            self.assertEqual(stream.get_response().output, "abc")
+
+    def test_list_source_is_read_once(self):
+        done = []
+        stream = ModelResponseStream.of("whole answer")
+        stream.add_done_callback(done.append)
+        self.assertEqual(list(stream), ["whole answer"])
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.get_response().output, "whole answer")
+        self.assertEqual(len(done), 1)
+
+    def test_close_stops_the_source(self):
+        closed = []
+
+        def source():
+            try:
+                yield from ["a", "b", "c"]
+            finally:
+                closed.append(True)
+
+        stream = ModelResponseStream(source())
+        self.assertEqual(next(iter(stream)), "a")
+        stream.close()
+        self.assertEqual(closed, [True])
+        self.assertEqual(list(stream), [])
+        self.assertIsNone(stream.get_response())
+
+    def test_error_mid_stream(self):
+        stream = ModelResponseStream(broken(["a", "b"], ConnectionError("reset")))
+        seen = []
+        with self.assertRaises(ConnectionError):
+            for delta in stream:
+                seen.append(delta)
+        self.assertEqual(seen, ["a", "b"])
+        self.assertIsNone(stream.response)
+        with self.assertRaises(ConnectionError):
+            stream.get_response()
+
+
+if __name__ == "__main__":
+    unittest.main()
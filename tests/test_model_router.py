@@ -0,0 +1,102 @@
+"""
+Tests for cost/latency-aware model routing.
+"""
+
+import unittest
+
+from models.fake_model import FakeModel, LatencyDistribution
+from models.model_router import DEFAULT_PROFILES, ModelProfile, ModelRouter, Purpose, PurposePolicy
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class FailingModel(FakeModel):
+    def _generate_response(self, messages):
+        raise ConnectionError("backend down")
+
+
+def fake_backends(failing=()):
+    def factory(name, temperature):
+        model_class = FailingModel if name in failing else FakeModel
+        return model_class(default=f"answer from {name}", model=name, temperature=temperature)
+    return factory
+
+
+class TestModelRouter(unittest.TestCase):
+    """Tests for the ModelRouter class."""
+
+    def setUp(self):
+        self.router = ModelRouter(backend_factory=fake_backends())
+
+    def test_routing_calls_use_cheapest_model(self):
+        selector = self.router.for_purpose(Purpose.TOOL_SELECTION, temperature=0.0)
+        self.assertEqual(selector.route(user("What's new in Python?"))[0].name, "gpt-4o-mini")
+
+    def test_complex_answers_use_top_tier(self):
+        answer = self.router.for_purpose(Purpose.REFLEX_ANSWER)
+        response = answer.generate_response(user("Explain how a B-tree rebalances after deletion, step by step."))
+        self.assertEqual(response.output, "answer from gpt-4o")
+        self.assertEqual(response.metadata["routed_model"], "gpt-4o")
+        self.assertEqual(response.metadata["purpose"], "reflex_answer")
+
+    def test_simple_question_after_a_long_system_prompt(self):
+        answer = self.router.for_purpose(Purpose.REFLEX_ANSWER)
+        messages = [{"role": "system", "content": "You are a careful assistant. Explain your reasoning. " * 20}]
+        self.assertEqual(answer.route(messages + user("Hi there!"))[0].name, "gpt-4o-mini")
+        self.assertEqual(answer.route(messages)[0].name, "gpt-4o")
+
+    def test_latency_is_kept_per_purpose(self):
+        cheap = ModelProfile("cheap", tier=3, input_cost=0.1, output_cost=0.1,
+                             first_token_latency=0.01, tokens_per_second=1000, context_window=10_000)
+        pricey = ModelProfile("pricey", tier=3, input_cost=1.0, output_cost=1.0,
+                              first_token_latency=0.01, tokens_per_second=1000, context_window=10_000)
+        slow = FakeModel(default="answer", latency=LatencyDistribution("constant", 0.3))
+        router = ModelRouter(profiles=[cheap, pricey], backend_factory=lambda name, temperature: slow)
+        router.policies = {**router.policies,
+                           Purpose.TOOL_SELECTION: PurposePolicy(min_tier=1, output_tokens=30, latency_budget=0.2)}
+        router.for_purpose(Purpose.SUMMARY).generate_response(user("hi"))
+        self.assertIn(("cheap", "summary"), router.latency_snapshot())
+
+        selector = router.for_purpose(Purpose.TOOL_SELECTION)
+        self.assertEqual(selector.route(user("hi"))[0].name, "cheap")
+        selector.generate_response(user("hi"))
+        self.assertEqual(selector.route(user("hi"))[0].name, "pricey")
+
+    def test_preferred_model_wins_for_answers_only(self):
+        messages = user("Explain why the sky is blue.")
+        self.assertEqual(self.router.for_purpose(Purpose.REFLEX_ANSWER, preferred="gpt-3.5-turbo").route(messages)[0].name,
+                         "gpt-3.5-turbo")
+        self.assertEqual(self.router.for_purpose(Purpose.CRITIQUE, preferred="gpt-4o").route(messages)[0].name,
+                         "gpt-4o-mini")
+
+    def test_large_prompts_skip_small_context_models(self):
+        router = ModelRouter(profiles=[p for p in DEFAULT_PROFILES if p.name != "gpt-4o-mini"],
+                             backend_factory=fake_backends())
+        selector = router.for_purpose(Purpose.TOOL_SELECTION)
+        names = [profile.name for profile in selector.route(user("word " * 20_000))]
+        self.assertEqual(names, ["gpt-4o"])
+
+    def test_falls_back_when_backend_fails(self):
+        router = ModelRouter(backend_factory=fake_backends(failing={"gpt-4o"}))
+        response = router.generate_response(user("Explain how TLS works."))
+        self.assertNotEqual(response.metadata["routed_model"], "gpt-4o")
+
+    def test_all_backends_failing_raises(self):
+        router = ModelRouter(profiles=[DEFAULT_PROFILES[0]],
+                             backend_factory=fake_backends(failing={"gpt-4o-mini"}))
+        with self.assertRaises(RuntimeError):
+            router.generate_response(user("hi"))
+
+    def test_cost_budget(self):
+        expensive = ModelProfile("big", tier=3, input_cost=100.0, output_cost=100.0,
+                                 first_token_latency=0.1, tokens_per_second=100, context_window=10_000)
+        cheap = ModelProfile("small", tier=3, input_cost=0.1, output_cost=0.1,
+                             first_token_latency=0.1, tokens_per_second=100, context_window=10_000)
+        router = ModelRouter(profiles=[expensive, cheap], max_cost=0.001, backend_factory=fake_backends())
+        self.assertEqual(router.route(user("Explain quantum tunnelling."))[0].name, "small")
+
+
+if __name__ == "__main__":
+    unittest.main()
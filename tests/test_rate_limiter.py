@@ -0,0 +1,126 @@
+"""
+Tests for the client-side rate limiter.
+"""
+
+import asyncio
+import unittest
+
+from models.fake_model import FakeModel
+from models.rate_limiter import AdaptiveConcurrencyLimiter, RateLimiter, TokenBucket
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def failing(status_codes, result="ok"):
+    """A callable that raises the given statuses in turn, then returns result."""
+    remaining = list(status_codes)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if remaining:
+            raise ProviderError(remaining.pop(0))
+        return result
+
+    return fn, calls
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for the TokenBucket class."""
+
+    def test_reserve_within_capacity(self):
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.reserve(60), 0.0)
+
+    def test_reserve_beyond_capacity_waits(self):
+        """Test that overdrawing the bucket returns the time to refill the debt."""
+        bucket = TokenBucket(60)  # one token per second
+        bucket.reserve(60)
+        self.assertAlmostEqual(bucket.reserve(2), 2.0, delta=0.05)
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    """Tests for the AIMD concurrency limit."""
+
+    def test_success_grows_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4)
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release(False)
+        self.assertGreater(limiter.limit, 4.9)
+
+    def test_throttle_halves_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=8)
+        limiter.acquire()
+        limiter.release(True)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_async_waiter_is_granted_on_release(self):
+        """Test that a queued coroutine gets the slot a thread releases."""
+        limiter = AdaptiveConcurrencyLimiter(initial=1)
+
+        async def scenario():
+            limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            limiter.release(None)
+            await asyncio.wait_for(waiter, 1)
+            self.assertEqual(limiter.in_flight, 1)
+
+        asyncio.run(scenario())
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Tests for retries and statistics."""
+
+    def test_retries_throttled_calls(self):
+        limiter = RateLimiter(base_delay=0.001)
+        fn, calls = failing([429, 503])
+        self.assertEqual(limiter.call(fn), "ok")
+        self.assertEqual(len(calls), 3)
+        stats = limiter.snapshot()
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_client_errors_are_not_retried(self):
+        limiter = RateLimiter(base_delay=0.001)
+        fn, calls = failing([400])
+        with self.assertRaises(ProviderError):
+            limiter.call(fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+    def test_gives_up_after_max_retries(self):
+        limiter = RateLimiter(max_retries=2, base_delay=0.001)
+        fn, calls = failing([429] * 5)
+        with self.assertRaises(ProviderError):
+            limiter.call(fn)
+        self.assertEqual(len(calls), 3)
+
+    def test_async_retries(self):
+        limiter = RateLimiter(base_delay=0.001)
+        fn, calls = failing([500])
+
+        async def coroutine():
+            return fn()
+
+        self.assertEqual(asyncio.run(limiter.acall(coroutine)), "ok")
+        self.assertEqual(len(calls), 2)
+
+    def test_model_calls_go_through_limiter(self):
+        """Test that a model's calls are counted and usage settles the token bucket."""
+        limiter = RateLimiter(tokens_per_minute=100_000)
+        model = FakeModel(responses=["answer"], rate_limiter=limiter)
+        model.generate_response([{"role": "user", "content": "question"}])
+        model.generate_embeddings(["a", "b"])
+        self.assertEqual(limiter.snapshot()["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
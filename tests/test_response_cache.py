@@ -0,0 +1,120 @@
+"""
+Tests for the model response cache.
+"""
+
+import os
+import tempfile
+import unittest
+
+from models.abstract_model import AbstractModel
+from models.model_response import ModelResponse
+from models.response_cache import ResponseCache
+
+
+class CountingModel(AbstractModel):
+    """A model that echoes the last message and counts backend calls."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def _generate_response(self, messages):
+        self.calls += 1
+        return ModelResponse(data=None, output=f"echo: {messages[-1]['content']}")
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for the ResponseCache class."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", ModelResponse(data=None, output="A"))
+        cache.put("b", ModelResponse(data=None, output="B"))
+        cache.get("a")
+        cache.put("c", ModelResponse(data=None, output="C"))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_hit_miss_counters(self):
+        """Test that lookups are counted."""
+        cache = ResponseCache()
+        cache.get("missing")
+        cache.put("key", ModelResponse(data=None, output="value"))
+        cache.get("key")
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_persistence(self):
+        """Test that entries survive reopening the store."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "responses.db")
+            cache = ResponseCache(path=path)
+            cache.put("key", ModelResponse(data=None, output="value", metadata={"usage": 3}))
+            cache.close()
+
+            reopened = ResponseCache(path=path)
+            response = reopened.get("key")
+            reopened.close()
+
+        self.assertEqual(response.output, "value")
+        self.assertEqual(response.metadata["usage"], 3)
+        self.assertTrue(response.metadata["cached"])
+
+
+class TestCachedModel(unittest.TestCase):
+    """Tests for caching through AbstractModel.generate_response."""
+
+    def test_repeated_request_hits_cache(self):
+        """Test that an identical request does not reach the backend twice."""
+        model = CountingModel(temperature=0.0, response_cache=ResponseCache())
+        messages = [{"role": "user", "content": "hello"}]
+
+        first = model.generate_response(messages)
+        second = model.generate_response(messages)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(first.output, second.output)
+
+    def test_key_includes_temperature(self):
+        """Test that models at different temperatures do not share entries."""
+        cache = ResponseCache()
+        messages = [{"role": "user", "content": "hello"}]
+        cold = CountingModel(temperature=0.0, response_cache=cache)
+        warm = CountingModel(temperature=0.7, response_cache=cache)
+
+        cold.generate_response(messages)
+        warm.generate_response(messages)
+
+        self.assertEqual(cold.calls, 1)
+        self.assertEqual(warm.calls, 1)
+
+    def test_uncached_model(self):
+        """Test that caching is opt-in."""
+        model = CountingModel()
+        messages = [{"role": "user", "content": "hello"}]
+
+        model.generate_response(messages)
+        model.generate_response(messages)
+
+        self.assertEqual(model.calls, 2)
+
+    def test_stream_populates_cache(self):
+        """Test that a drained stream is cached for later calls."""
+        model = CountingModel(temperature=0.0, response_cache=ResponseCache())
+        messages = [{"role": "user", "content": "hello"}]
+
+        streamed = "".join(model.stream_response(messages))
+        response = model.generate_response(messages)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(streamed, response.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
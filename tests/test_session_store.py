@@ -0,0 +1,139 @@
+"""
+Tests for the spilling session store.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from agents.agent_interfaces import AgentState, SessionContext
+from agents.agent_loop import AgentLoop
+from agents.agent_scratchpad import Scratchpad
+from agents.context_assembler import ContextAssembler
+from agents.session_store import SessionStore, state_from_dict, state_to_dict
+from agents.stateful_conversational_agent import StatefulConversationalAgent
+from communication.generic_request import GenericRequest
+from config import Configurator
+from models.fake_model import FakeModel
+
+
+def conversation(turns=3, size=100):
+    cfg = Configurator()
+    state = AgentState(input=GenericRequest(content="latest question", metadata={"user": "ada"}),
+                       context=ContextAssembler(2000, model="gpt-4o", background=False),
+                       session=SessionContext(user_question="latest question", scratchpad=Scratchpad(cfg)))
+    state.add_message("system", "You are helpful.")
+    for turn in range(turns):
+        state.add_message("user", f"question {turn} " + "x" * size)
+        state.add_message("assistant", f"answer {turn}", model="fake")
+    state.session.scratchpad.add_tool_result("WebSearch", "sky", "the sky is blue")
+    state.context.summary, state.context.summarized = "user: hello", 2
+    return state
+
+
+class TestSessionStore(unittest.TestCase):
+    """Tests for keeping, spilling and rehydrating sessions."""
+
+    def setUp(self):
+        self.cfg = Configurator()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "sessions.db")
+
+    def store(self, **kwargs):
+        store = SessionStore(self.cfg, self.path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_round_trip(self):
+        state = conversation()
+        restored = state_from_dict(state_to_dict(state), self.cfg)
+        self.assertEqual(restored.history, state.history)
+        self.assertEqual(restored.input.metadata, {"user": "ada"})
+        self.assertEqual((restored.context.summary, restored.context.summarized), ("user: hello", 2))
+        self.assertEqual(restored.context.max_tokens, 2000)
+        self.assertEqual(restored.session.user_question, "latest question")
+        self.assertEqual(restored.session.scratchpad.tool_results, state.session.scratchpad.tool_results)
+        self.assertEqual(restored.get_messages_for_llm(), state.get_messages_for_llm())
+
+    def test_resident_sessions_are_the_live_objects(self):
+        store = self.store()
+        state = conversation()
+        store.put("a", state)
+        self.assertIs(store.get("a"), state)
+        self.assertIsNone(store.get("b"))
+        stats = store.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["resident"]), (1, 1, 1))
+
+    def test_least_recently_used_sessions_spill_and_come_back(self):
+        size = len(json.dumps(state_to_dict(conversation())))
+        store = self.store(max_bytes=int(size * 3.5))  # room for three
+        for name in "abc":
+            store.put(name, conversation())
+        store.get("a")
+        store.put("d", conversation())
+
+        stats = store.stats()
+        self.assertLessEqual(stats["resident_bytes"], size * 3.5)
+        self.assertEqual((stats["resident"], stats["spilled"], stats["on_disk"]), (3, 1, 1))
+
+        restored = store.get("b")
+        self.assertEqual(restored.history, conversation().history)
+        self.assertEqual(store.stats()["loads"], 1)
+
+    def test_idle_sessions_spill(self):
+        store = self.store(idle_seconds=60)
+        with mock.patch("agents.session_store.time.time", return_value=1000.0):
+            store.put("a", conversation())
+        with mock.patch("agents.session_store.time.time", return_value=1100.0):
+            self.assertIsNotNone(store.get("a"))
+        stats = store.stats()
+        self.assertEqual((stats["spilled"], stats["loads"], stats["resident"]), (1, 1, 1))
+
+    def test_expired_sessions_are_deleted(self):
+        store = self.store(expire_seconds=60)
+        with mock.patch("agents.session_store.time.time", return_value=1000.0):
+            store.put("a", conversation())
+            store.put("b", conversation())
+        with mock.patch("agents.session_store.time.time", return_value=1030.0):
+            store.get("b")
+        with mock.patch("agents.session_store.time.time", return_value=1070.0):
+            self.assertIsNone(store.get("a"))
+            self.assertIsNotNone(store.get("b"))
+        self.assertEqual(store.stats()["expired"], 1)
+
+    def test_sessions_survive_a_restart(self):
+        store = SessionStore(self.cfg, self.path)
+        store.put("a", conversation())
+        store.close()
+        self.assertEqual(self.store().get("a").history, conversation().history)
+
+
+class TestAgentLoopChat(unittest.TestCase):
+    """Tests for AgentLoop conversations backed by a SessionStore."""
+
+    def test_conversations_resume_after_spilling(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SessionStore(Configurator(), os.path.join(directory, "sessions.db"), max_bytes=1)
+            agent = StatefulConversationalAgent(model=FakeModel(default="answer"))
+            loop = AgentLoop(agent, session_store=store)
+
+            async def main():
+                for turn in range(3):
+                    await asyncio.gather(*[loop.achat(user, f"{user} turn {turn}") for user in ("ada", "bob")])
+
+            asyncio.run(main())
+            ada = store.get("ada")
+            stats = store.stats()
+            store.close()
+
+        self.assertEqual([m.content for m in ada.history if m.role == "user"], ["ada turn 0", "ada turn 1", "ada turn 2"])
+        self.assertGreater(stats["loads"], 0)
+        self.assertEqual(stats["resident"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
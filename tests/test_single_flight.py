@@ -0,0 +1,96 @@
+"""
+Tests for single-flight coalescing of identical in-flight calls.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from models.fake_model import FakeModel, LatencyDistribution
+from models.single_flight import SingleFlight
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for the SingleFlight class."""
+
+    def test_concurrent_threads_share_one_call(self):
+        group = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fn():
+            calls.append(1)
+            release.wait(1)
+            return "result"
+
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(group.do, "key", fn) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], ["result"] * 4)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True])
+
+    def test_errors_reach_every_caller(self):
+        group = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def scenario():
+            return await asyncio.gather(*[group.ado("key", fail) for _ in range(3)], return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(group.stats()["flights"], 1)
+
+    def test_cancelled_follower_leaves_flight_running(self):
+        group = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def scenario():
+            leader = asyncio.ensure_future(group.ado("key", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(group.ado("key", slow))
+            await asyncio.sleep(0)
+            follower.cancel()
+            return await leader
+
+        self.assertEqual(asyncio.run(scenario()), ("done", False))
+
+
+class TestModelCoalescing(unittest.TestCase):
+    """Tests for coalescing in AbstractModel."""
+
+    def test_deterministic_async_calls_are_coalesced(self):
+        model = FakeModel(responses=["answer"], temperature=0.0, latency=LatencyDistribution("constant", 0.02))
+
+        async def scenario():
+            return await asyncio.gather(*[model.agenerate_response(user("trending?")) for _ in range(5)])
+
+        responses = asyncio.run(scenario())
+        self.assertEqual(model.calls, 1)
+        self.assertEqual({response.output for response in responses}, {"answer"})
+        self.assertEqual(sum(bool(response.metadata.get("coalesced")) for response in responses), 4)
+
+    def test_sampled_calls_are_not_coalesced(self):
+        model = FakeModel(responses=["answer"], temperature=0.7, latency=LatencyDistribution("constant", 0.02))
+        with ThreadPoolExecutor(3) as pool:
+            list(pool.map(lambda _: model.generate_response(user("trending?")), range(3)))
+        self.assertEqual(model.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+"""
+Tests for SophiaAgent on offline fake models.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+import unittest
+
+from agents.sophia_agent import SophiaAgent
+from communication.generic_request import GenericRequest
+from communication.generic_response import GenericResponse
+from config import Configurator
+from models.fake_model import FakeModel, LatencyDistribution
+from tools.abstract_tool import AbstractTool
+
+NO_TOOL = '{"tool": "none", "input": null}'
+LOOKUP = '{"tool": "lookup", "input": "sky"}'
+
+
+class LookupTool(AbstractTool):
+    def __init__(self):
+        super().__init__("lookup", "Looks things up")
+        self.calls = 0
+
+    def run(self, request: GenericRequest) -> GenericResponse:
+        self.calls += 1
+        return GenericResponse(output=f"facts about {request.content}")
+
+
+class SlowTool(AbstractTool):
+    def __init__(self, name, delay):
+        super().__init__(name, "Takes a while")
+        self.delay = delay
+        self.threads = set()
+
+    def run(self, request: GenericRequest) -> GenericResponse:
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return GenericResponse(output=f"{self.name} done")
+
+
+def sophia(selection, latency=0.0, **kwargs):
+    agent = SophiaAgent(
+        Configurator(),
+        model=FakeModel(default="answer", latency=LatencyDistribution("constant", latency)),
+        tool_selection_model=FakeModel(default=selection, latency=LatencyDistribution("constant", latency),
+                                       temperature=0.0),
+        **kwargs,
+    )
+    agent.lookup = LookupTool()
+    agent.tool_registry.register_tool(agent.lookup)
+    return agent
+
+
+class TestSpeculativeStep(unittest.TestCase):
+    """Tests for drafting the answer while the tool selector runs."""
+
+    def test_draft_used_when_no_tool_selected(self):
+        agent = sophia(NO_TOOL, latency=0.2, speculative=True)
+        started = time.monotonic()
+        response = agent.start("Hello there")
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(response.output, "answer")
+        self.assertFalse(response.is_done)
+        self.assertLess(elapsed, 0.35)  # one round trip, not two
+        self.assertEqual(agent.speculation, {"used": 1, "discarded": 0})
+
+    def test_draft_discarded_when_tool_selected(self):
+        agent = sophia(LOOKUP, speculative=True)
+        response = agent.start("Why is the sky blue?")
+
+        self.assertEqual(response.output, "answer")
+        self.assertEqual(agent.lookup.calls, 1)
+        self.assertEqual(agent.speculation, {"used": 0, "discarded": 1})
+
+    def test_draft_does_not_read_state_after_selection(self):
+        agent = sophia(LOOKUP, speculative=True)
+        drafting, release, drafted = threading.Event(), threading.Event(), threading.Event()
+        answer, select = agent.model._generate_response, agent.tool_selector.model._generate_response
+
+        def blocked_draft(messages):
+            if not threading.current_thread().name.startswith("speculative-draft"):
+                return answer(messages)
+            drafting.set()
+            release.wait(5)
+            try:
+                return answer(messages)
+            finally:
+                drafted.set()
+
+        def select_once_drafting(messages):
+            drafting.wait(5)
+            return select(messages)
+
+        agent.model._generate_response = blocked_draft
+        agent.tool_selector.model._generate_response = select_once_drafting
+        state = agent._new_state("Why is the sky blue?", {})
+        readers = []
+        read = state.get_messages_for_llm
+        state.get_messages_for_llm = lambda: readers.append(threading.current_thread().name) or read()
+
+        response = agent.step(state)  # answered while the draft is still blocked
+        release.set()
+        self.assertTrue(drafted.wait(5))
+
+        self.assertEqual(response.output, "answer")
+        self.assertEqual(agent.lookup.calls, 1)
+        self.assertEqual(set(readers), {threading.current_thread().name})
+
+    def test_async_draft(self):
+        agent = sophia(NO_TOOL, latency=0.2, speculative=True)
+        started = time.monotonic()
+        response = asyncio.run(agent.astart("Hello there"))
+
+        self.assertEqual(response.output, "answer")
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_serial_by_default(self):
+        agent = sophia(NO_TOOL)
+        self.assertEqual(agent.start("Hello there").output, "answer")
+        self.assertEqual(agent.speculation, {"used": 0, "discarded": 0})
+
+
+class TestParallelTools(unittest.TestCase):
+    """Tests for running several tool calls from one selection."""
+
+    def setUp(self):
+        self.calls = ('[{"tool": "slow", "input": "a"}, {"tool": "none", "input": null}, '
+                      '{"tool": "fast", "input": "b"}, {"tool": "lookup", "input": "sky"}]')
+
+    def agent(self, **kwargs):
+        agent = sophia(self.calls, **kwargs)
+        agent.tool_registry.register_tool(SlowTool("slow", 0.2))
+        agent.tool_registry.register_tool(SlowTool("fast", 0.1))
+        return agent
+
+    @staticmethod
+    def tool_outputs(response):
+        return [(result['tool'], result['output']) for result in response.state.session.scratchpad.tool_results]
+
+    def test_calls_run_concurrently_in_selection_order(self):
+        agent = self.agent()
+        started = time.monotonic()
+        response = agent.start("Compare a and b")
+        self.assertLess(time.monotonic() - started, 0.28)  # 0.2 + 0.1 serially
+        self.assertEqual(self.tool_outputs(response),
+                         [("slow", "slow done"), ("fast", "fast done"), ("lookup", "facts about sky")])
+
+    def test_timed_out_and_unknown_tools_are_recorded_as_errors(self):
+        self.calls = '[{"tool": "slow", "input": "a"}, {"tool": "missing", "input": "x"}, {"tool": "lookup", "input": "sky"}]'
+        agent = self.agent(tool_timeout=0.05)
+        response = agent.start("Compare a and b")
+        outputs = self.tool_outputs(response)
+        self.assertEqual(response.output, "answer")
+        self.assertIn("timed out", outputs[0][1])
+        self.assertIn("not found", outputs[1][1])
+        self.assertEqual(outputs[2], ("lookup", "facts about sky"))
+
+    def test_timeout_counts_from_when_a_tool_starts(self):
+        self.calls = '[{"tool": "fast", "input": "a"}, {"tool": "fast", "input": "b"}, {"tool": "fast", "input": "c"}]'
+        agent = self.agent(tool_timeout=0.15, tool_workers=1)
+        outputs = self.tool_outputs(agent.start("Compare a and b"))
+        self.assertEqual(outputs, [("fast", "fast done")] * 3)  # 0.3s in all, one at a time
+
+    def test_hung_tools_do_not_hold_up_other_agents(self):
+        self.calls = '[{"tool": "hung", "input": "a"}]'
+        stuck = self.agent(tool_timeout=0.05, tool_workers=1)
+        stuck.tool_registry.register_tool(SlowTool("hung", 0.5))
+        self.assertIn("timed out", self.tool_outputs(stuck.start("q"))[0][1])
+
+        self.calls = '[{"tool": "fast", "input": "b"}]'
+        started = time.monotonic()
+        self.assertEqual(self.tool_outputs(self.agent().start("q")), [("fast", "fast done")])
+        self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_async_step(self):
+        agent = self.agent()
+        response = asyncio.run(agent.astart("Compare a and b"))
+        self.assertEqual([name for name, _ in self.tool_outputs(response)], ["slow", "fast", "lookup"])
+
+
+class TestSessions(unittest.TestCase):
+    """Tests for serving several conversations from one agent."""
+
+    def test_tool_results_stay_in_their_conversation(self):
+        agent = sophia(LOOKUP)
+        first = agent.start("Why is the sky blue?")
+        second = agent.start("Why is the sky blue?")
+
+        self.assertEqual(len(first.state.session.scratchpad.tool_results), 1)
+        self.assertEqual(len(second.state.session.scratchpad.tool_results), 1)
+        self.assertEqual(second.state.session.user_question, "Why is the sky blue?")
+
+        first.state.input = GenericRequest(content="And at sunset?")
+        agent.step(first.state)
+        # The same lookup again replaces the earlier result
+        self.assertEqual(len(first.state.session.scratchpad.tool_results), 1)
+        self.assertEqual(first.state.session.scratchpad.counts["deduplicated"], 1)
+        self.assertEqual(second.state.session.scratchpad.counts["deduplicated"], 0)
+        self.assertIn("And at sunset?", first.state.history[0].content)
+
+    def test_concurrent_conversations_share_one_agent(self):
+        agent = sophia(LOOKUP, latency=0.1)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            started = time.monotonic()
+            responses = list(pool.map(agent.start, [f"question {i}" for i in range(8)]))
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.5)
+        for i, response in enumerate(responses):
+            self.assertEqual(response.output, "answer")
+            self.assertEqual(response.state.session.user_question, f"question {i}")
+            self.assertEqual(len(response.state.session.scratchpad.tool_results), 1)
+        self.assertEqual(agent.lookup.calls, 8)
+
+    def test_states_without_a_session_get_one(self):
+        agent = sophia(LOOKUP)
+        state = agent.start("Why is the sky blue?").state
+        state.session = None
+        response = agent.step(state)
+        self.assertEqual(len(response.state.session.scratchpad.tool_results), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests for the sync and coroutine thinking strategies on offline fake models.
+"""
+
+import asyncio
+import logging
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agents.agent_interfaces import AgentState
+from agents.stateful_conversational_agent import StatefulConversationalAgent
+from agents.thinking_styles import ThinkingConfig, ThinkStyle, athink, think
+from communication.generic_request import GenericRequest
+from models.fake_model import FakeModel, LatencyDistribution
+from models.openai_wrapper import OpenAIModel
+
+LOGGER = logging.getLogger(__name__)
+
+ACTION = 'THOUGHT: look it up\nACTION: {"name": "lookup", "arguments": {"topic": "sky"}}'
+
+
+def reactive_model(latency=0.0):
+    return FakeModel(rules=[(r"^OBSERVATION: (.*)", lambda messages: f"FINAL: {messages[-1]['content'][13:]}")],
+                     default=ACTION, latency=LatencyDistribution("constant", latency))
+
+
+def reflective_model(latency=0.0):
+    return FakeModel(rules=[(r"List issues", "Too short."), (r"^Critique:", "A fuller answer.")],
+                     default="Some thinking ⧉ANSWER⧉ A short answer.",
+                     latency=LatencyDistribution("constant", latency))
+
+
+def question(content="Why is the sky blue?"):
+    state = AgentState(input=GenericRequest(content=content))
+    state.tool_runner = lambda name, arguments: f"{name} says {arguments['topic']} scatters blue light"
+    return state
+
+
+class TestThinkParity(unittest.TestCase):
+    """Tests that athink gives the same answers as think."""
+
+    def both(self, model_factory, cfg):
+        sync = think(model_factory(), question(), cfg, LOGGER).output
+        coroutine = asyncio.run(athink(model_factory(), question(), cfg, LOGGER)).output
+        return sync, coroutine
+
+    def test_reflex(self):
+        sync, coroutine = self.both(lambda: FakeModel(default="Rayleigh scattering."), ThinkingConfig())
+        self.assertEqual(sync, "Rayleigh scattering.")
+        self.assertEqual(coroutine, sync)
+
+    def test_reactive(self):
+        sync, coroutine = self.both(reactive_model, ThinkingConfig(style=ThinkStyle.REACTIVE))
+        self.assertEqual(sync, "lookup says sky scatters blue light")
+        self.assertEqual(coroutine, sync)
+
+    def test_reactive_gives_up_after_max_iterations(self):
+        cfg = ThinkingConfig(style=ThinkStyle.REACTIVE, max_iterations=2)
+        sync, coroutine = self.both(lambda: FakeModel(default="THOUGHT: still thinking"), cfg)
+        self.assertIn("couldn't complete", sync)
+        self.assertEqual(coroutine, sync)
+
+    def test_reflective(self):
+        sync, coroutine = self.both(reflective_model, ThinkingConfig(style=ThinkStyle.REFLECTIVE))
+        self.assertEqual(sync, "A fuller answer.")
+        self.assertEqual(coroutine, sync)
+
+    def test_agent_astep_matches_step(self):
+        agent = StatefulConversationalAgent(model=FakeModel(default="answer"))
+        sync = agent.start("hi")
+        coroutine = asyncio.run(agent.astart("hi"))
+        self.assertEqual(coroutine.output, sync.output)
+        self.assertEqual(coroutine.state.history, sync.state.history)
+
+
+class TestConcurrentThinking(unittest.TestCase):
+    """Tests that coroutine strategies overlap on one event loop."""
+
+    def elapsed(self, model, cfg, conversations=10):
+        async def main():
+            began = time.monotonic()
+            responses = await asyncio.gather(*[athink(model, question(), cfg, LOGGER) for _ in range(conversations)])
+            return time.monotonic() - began, responses
+
+        return asyncio.run(main())
+
+    def test_reactive_calls_overlap(self):
+        elapsed, responses = self.elapsed(reactive_model(latency=0.1), ThinkingConfig(style=ThinkStyle.REACTIVE))
+        self.assertLess(elapsed, 0.5)  # two model calls each; 2s serially
+        self.assertEqual({response.output for response in responses}, {"lookup says sky scatters blue light"})
+
+    def test_reflective_calls_overlap(self):
+        elapsed, responses = self.elapsed(reflective_model(latency=0.1), ThinkingConfig(style=ThinkStyle.REFLECTIVE))
+        self.assertLess(elapsed, 0.6)  # three model calls each; 3s serially
+        self.assertEqual({response.output for response in responses}, {"A fuller answer."})
+
+
+class TestOpenAIModelAsync(unittest.TestCase):
+    """Tests that OpenAIModel reads async responses like blocking ones."""
+
+    def test_agenerate_matches_generate(self):
+        reply = SimpleNamespace(output_text="hello", usage=SimpleNamespace(input_tokens=3, output_tokens=1),
+                                incomplete_details=None, status="completed", id="resp_1")
+
+        async def create(**kwargs):
+            return reply
+
+        client = SimpleNamespace(responses=SimpleNamespace(create=lambda **kwargs: reply))
+        async_client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        model = OpenAIModel(temperature=0.0)
+        with mock.patch("models.openai_wrapper.get_client", return_value=client), \
+                mock.patch("models.openai_wrapper.get_async_client", return_value=async_client):
+            sync = model._generate_response([{"role": "user", "content": "hi"}])
+            coroutine = asyncio.run(model._agenerate_response([{"role": "user", "content": "hi"}]))
+        self.assertEqual((coroutine.output, coroutine.usage, coroutine.finish_reason),
+                         (sync.output, sync.usage, sync.finish_reason))
+        self.assertEqual(coroutine.output, "hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Tests for the local tool-selection pre-classifier.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from agents.tool_preclassifier import ToolPreclassifier, ToolSelectionModel, rule_decision
+from agents.tool_selection_agent import ToolSelectionAgent, parse_tool_calls
+from config import Configurator
+from models.fake_model import FakeModel
+from tools.abstract_tool import AbstractTool
+from tools.registry import ToolRegistry
+
+TRAINING = [
+    ("what is a monad", "none"),
+    ("explain recursion to me", "none"),
+    ("write a haiku about autumn", "none"),
+    ("how do I reverse a list in python", "none"),
+    ("tell me a joke", "none"),
+    ("summarize our conversation", "none"),
+    ("who won the election in brazil", "WebSearch"),
+    ("who won the game last night", "WebSearch"),
+    ("who won the championship", "WebSearch"),
+    ("who is the ceo of openai", "WebSearch"),
+    ("who is the prime minister of japan", "WebSearch"),
+    ("who won the world cup", "WebSearch"),
+]
+
+
+class NamedTool(AbstractTool):
+    def run(self, request):
+        raise AssertionError("tools are not run by the selector")
+
+
+def registry():
+    tools = ToolRegistry(Configurator())
+    tools.register_tool(NamedTool("WebSearch", "Search the web"))
+    tools.register_tool(NamedTool("WebBrowsingTool", "Fetch a URL"))
+    return tools
+
+
+class TestRules(unittest.TestCase):
+    """Tests for the built-in rules."""
+
+    def test_url_selects_browsing(self):
+        decision = rule_decision("Can you summarize https://example.com/post?id=3.")
+        self.assertEqual((decision.tool, decision.input), ("WebBrowsingTool", "https://example.com/post?id=3"))
+
+    def test_recency_selects_search(self):
+        self.assertEqual(rule_decision("What's the latest on the Mars mission?").tool, "WebSearch")
+
+    def test_small_talk_needs_no_tool(self):
+        self.assertEqual(rule_decision("Thanks, Sophia!").tool, "none")
+
+    def test_other_questions_defer(self):
+        self.assertIsNone(rule_decision("Explain how a hash map works"))
+
+
+class TestToolSelectionModel(unittest.TestCase):
+    """Tests for the learned model."""
+
+    def test_learns_logged_decisions(self):
+        model = ToolSelectionModel.fit(*zip(*TRAINING), epochs=500)
+        self.assertEqual(model.predict("who won the race")[0], "WebSearch")
+        self.assertEqual(model.predict("explain a monad")[0], "none")
+
+    def test_save_and_load(self):
+        model = ToolSelectionModel.fit(*zip(*TRAINING))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "selector.npz")
+            model.save(path)
+            loaded = ToolSelectionModel.load(path)
+        self.assertEqual(loaded.labels, model.labels)
+        self.assertEqual(loaded.predict("tell me a joke"), model.predict("tell me a joke"))
+
+
+class TestParseToolCalls(unittest.TestCase):
+    """Tests for reading one or several tool calls from the selector."""
+
+    def test_single_call(self):
+        self.assertEqual(parse_tool_calls('{"tool": "WebSearch", "input": "mars"}'), [("WebSearch", "mars")])
+
+    def test_list_keeps_order_and_drops_none(self):
+        selection = '[{"tool": "WebSearch", "input": "a"}, {"tool": "none", "input": null}, {"tool": "WebBrowsingTool", "input": "b"}]'
+        self.assertEqual(parse_tool_calls(selection), [("WebSearch", "a"), ("WebBrowsingTool", "b")])
+
+    def test_no_tool(self):
+        self.assertEqual(parse_tool_calls('{"tool": "none", "input": null}'), [])
+
+
+class TestToolSelectionAgentFastPath(unittest.TestCase):
+    """Tests for ToolSelectionAgent with a pre-classifier."""
+
+    def setUp(self):
+        self.llm = FakeModel(default='{"tool": "none", "input": null}', temperature=0.0)
+
+    def selector(self, preclassifier):
+        return ToolSelectionAgent(Configurator(), registry(), model=self.llm, preclassifier=preclassifier)
+
+    def test_confident_decisions_skip_the_llm(self):
+        preclassifier = ToolPreclassifier()
+        response = self.selector(preclassifier).start("Read https://example.com please")
+        self.assertEqual(json.loads(response.output), {"tool": "WebBrowsingTool", "input": "https://example.com"})
+        self.assertEqual(self.llm.calls, 0)
+        self.assertEqual(preclassifier.stats()["rule"], 1)
+
+    def test_uncertain_questions_defer_and_are_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "decisions.jsonl")
+            preclassifier = ToolPreclassifier(log_path=log)
+            response = self.selector(preclassifier).start("Explain how a hash map works")
+            with open(log, encoding="utf-8") as f:
+                logged = [json.loads(line) for line in f]
+        self.assertEqual(json.loads(response.output)["tool"], "none")
+        self.assertEqual(self.llm.calls, 1)
+        self.assertEqual(logged, [{"question": "Explain how a hash map works", "tool": "none"}])
+        self.assertEqual(preclassifier.stats()["deferral_rate"], 1.0)
+
+    def test_audits_measure_agreement(self):
+        preclassifier = ToolPreclassifier(audit_rate=1.0)
+        selector = self.selector(preclassifier)
+        selector.start("hello")  # rule says none, LLM agrees
+        selector.start("any news about the launch?")  # rule says WebSearch, LLM says none
+        stats = preclassifier.stats()
+        self.assertEqual(self.llm.calls, 2)
+        self.assertEqual((stats["audited"], stats["agreement"]), (2, 0.5))
+
+    def test_first_of_several_calls_is_logged(self):
+        self.llm = FakeModel(default='[{"tool": "WebSearch", "input": "a"}, {"tool": "WebBrowsingTool", "input": "b"}]',
+                             temperature=0.0)
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "decisions.jsonl")
+            self.selector(ToolPreclassifier(log_path=log)).start("Compare a and b")
+            with open(log, encoding="utf-8") as f:
+                self.assertEqual(json.loads(f.readline())["tool"], "WebSearch")
+
+    def test_unregistered_tools_are_not_chosen(self):
+        tools = ToolRegistry(Configurator())
+        selector = ToolSelectionAgent(Configurator(), tools, model=self.llm, preclassifier=ToolPreclassifier())
+        selector.start("Read https://example.com please")
+        self.assertEqual(self.llm.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()